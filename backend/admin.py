@@ -2,9 +2,16 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 import logging
-from database import Session, User, Project, HackathonPost, ResearchPaper, Report
+from identity import get_current_user, invalidate_cached_user
+from matching import mark_project_changed, mark_user_skills_changed
+from autocomplete import mark_user_changed
+from tags import release_paper_tags
+from duplicates import forget_paper
+from related import mark_paper_changed
+from database import Session, User, Project, HackathonPost, ResearchPaper, Report, PaperDuplicate
 from functools import wraps
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 logger = logging.getLogger(__name__)
@@ -15,11 +22,10 @@ def admin_required(fn):
     def wrapper(*args, **kwargs):
         session = Session()
         try:
-            current_user_id = get_jwt_identity()
-            user = session.query(User).filter_by(username=current_user_id).first()
+            user = get_current_user(session)
 
             if not user or not user.is_admin:
-                logger.warning(f"Unauthorized admin access attempt by: {current_user_id}")
+                logger.warning("Unauthorized admin access attempt by: %s", get_jwt_identity())
                 return jsonify({"error": "Admin access required"}), 403
 
             return fn(*args, **kwargs)
@@ -33,7 +39,7 @@ def admin_required(fn):
 def get_all_projects():
     session = Session()
     try:
-        projects = session.query(Project).order_by(Project.created_at.desc()).all()
+        projects = session.query(Project).options(joinedload(Project.owner)).order_by(Project.created_at.desc()).all()
 
         projects_data = []
         for project in projects:
@@ -49,13 +55,16 @@ def get_all_projects():
                     "email": project.owner.email
                 },
                 "created_at": project.created_at.isoformat(),
-                "application_count": len(project.applications)
+                "application_count": project.application_count,
+                "pending_application_count": project.pending_application_count,
+                "bookmark_count": project.bookmark_count,
+                "report_count": project.report_count
             })
 
         return jsonify(projects_data), 200
 
     except Exception as e:
-        logger.error(f"Failed to fetch all projects: {str(e)}")
+        logger.error("Failed to fetch all projects: %s", e)
         return jsonify({"error": "Failed to fetch projects"}), 500
     finally:
         session.close()
@@ -75,13 +84,14 @@ def delete_project(project_id):
 
         session.delete(project)
         session.commit()
+        mark_project_changed(project_id)
 
-        logger.info(f"Admin deleted project: {project_name} (ID: {project_id}) by {owner_username}")
+        logger.info("Admin deleted project: %s (ID: %s) by %s", project_name, project_id, owner_username)
         return jsonify({"message": "Project deleted successfully"}), 200
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to delete project: {str(e)}")
+        logger.error("Failed to delete project: %s", e)
         return jsonify({"error": "Failed to delete project"}), 500
     finally:
         session.close()
@@ -91,7 +101,7 @@ def delete_project(project_id):
 def get_all_hackathons():
     session = Session()
     try:
-        hackathons = session.query(HackathonPost).order_by(HackathonPost.created_at.desc()).all()
+        hackathons = session.query(HackathonPost).options(joinedload(HackathonPost.owner)).order_by(HackathonPost.created_at.desc()).all()
 
         hackathons_data = []
         for hackathon in hackathons:
@@ -108,13 +118,15 @@ def get_all_hackathons():
                     "email": hackathon.owner.email
                 },
                 "created_at": hackathon.created_at.isoformat(),
-                "application_count": len(hackathon.applications)
+                "application_count": hackathon.application_count,
+                "pending_application_count": hackathon.pending_application_count,
+                "report_count": hackathon.report_count
             })
 
         return jsonify(hackathons_data), 200
 
     except Exception as e:
-        logger.error(f"Failed to fetch all hackathons: {str(e)}")
+        logger.error("Failed to fetch all hackathons: %s", e)
         return jsonify({"error": "Failed to fetch hackathons"}), 500
     finally:
         session.close()
@@ -135,12 +147,12 @@ def delete_hackathon(hackathon_id):
         session.delete(hackathon)
         session.commit()
 
-        logger.info(f"Admin deleted hackathon: {hackathon_title} (ID: {hackathon_id}) by {owner_username}")
+        logger.info("Admin deleted hackathon: %s (ID: %s) by %s", hackathon_title, hackathon_id, owner_username)
         return jsonify({"message": "Hackathon deleted successfully"}), 200
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to delete hackathon: {str(e)}")
+        logger.error("Failed to delete hackathon: %s", e)
         return jsonify({"error": "Failed to delete hackathon"}), 500
     finally:
         session.close()
@@ -169,7 +181,7 @@ def get_all_users():
         return jsonify(users_data), 200
 
     except Exception as e:
-        logger.error(f"Failed to fetch all users: {str(e)}")
+        logger.error("Failed to fetch all users: %s", e)
         return jsonify({"error": "Failed to fetch users"}), 500
     finally:
         session.close()
@@ -187,8 +199,13 @@ def toggle_user_active(user_id):
         user.is_active = not user.is_active
         session.commit()
 
+        # Deactivated users must stop resolving from the identity cache
+        invalidate_cached_user(user.username)
+        mark_user_skills_changed(user.id)
+        mark_user_changed(user.id)
+
         status = "activated" if user.is_active else "deactivated"
-        logger.info(f"Admin {status} user: {user.username} (ID: {user_id})")
+        logger.info("Admin %s user: %s (ID: %s)", status, user.username, user_id)
 
         return jsonify({
             "message": f"User {status} successfully",
@@ -197,7 +214,7 @@ def toggle_user_active(user_id):
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to toggle user active status: {str(e)}")
+        logger.error("Failed to toggle user active status: %s", e)
         return jsonify({"error": "Failed to update user"}), 500
     finally:
         session.close()
@@ -249,7 +266,7 @@ def get_stats():
         }), 200
 
     except Exception as e:
-        logger.error(f"Failed to fetch stats: {str(e)}")
+        logger.error("Failed to fetch stats: %s", e)
         return jsonify({"error": "Failed to fetch stats"}), 500
     finally:
         session.close()
@@ -259,15 +276,19 @@ def get_stats():
 def get_all_research_papers():
     session = Session()
     try:
-        papers = session.query(ResearchPaper).order_by(ResearchPaper.created_at.desc()).all()
+        papers = session.query(ResearchPaper).options(joinedload(ResearchPaper.owner)).order_by(ResearchPaper.created_at.desc()).all()
+
+        duplicates = {}
+        flags = session.query(PaperDuplicate).filter_by(status='pending').order_by(PaperDuplicate.similarity.desc()).all()
+        for flag in flags:
+            duplicates.setdefault(flag.paper_id, []).append({
+                "flag_id": flag.id,
+                "paper_id": flag.duplicate_of_id,
+                "similarity": flag.similarity
+            })
 
         papers_data = []
         for paper in papers:
-            report_count = session.query(Report).filter_by(
-                report_type='research_paper',
-                target_id=paper.id
-            ).count()
-
             papers_data.append({
                 "id": paper.id,
                 "title": paper.title,
@@ -282,13 +303,14 @@ def get_all_research_papers():
                     "email": paper.owner.email
                 },
                 "created_at": paper.created_at.isoformat(),
-                "report_count": report_count
+                "report_count": paper.report_count,
+                "possible_duplicates": duplicates.get(paper.id, [])
             })
 
         return jsonify(papers_data), 200
 
     except Exception as e:
-        logger.error(f"Failed to fetch all research papers: {str(e)}")
+        logger.error("Failed to fetch all research papers: %s", e)
         return jsonify({"error": "Failed to fetch research papers"}), 500
     finally:
         session.close()
@@ -306,19 +328,97 @@ def delete_research_paper(paper_id):
         paper_title = paper.title
         owner_username = paper.owner.username
 
+        release_paper_tags(session, paper, remove=True)
+        forget_paper(session, paper.id)
         session.delete(paper)
         session.commit()
+        mark_paper_changed(paper_id)
 
-        logger.info(f"Admin deleted research paper: {paper_title} (ID: {paper_id}) by {owner_username}")
+        logger.info("Admin deleted research paper: %s (ID: %s) by %s", paper_title, paper_id, owner_username)
         return jsonify({"message": "Research paper deleted successfully"}), 200
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to delete research paper: {str(e)}")
+        logger.error("Failed to delete research paper: %s", e)
         return jsonify({"error": "Failed to delete research paper"}), 500
     finally:
         session.close()
 
+@admin_bp.route('/research-papers/duplicates', methods=['GET'])
+@admin_required
+def get_duplicate_research_papers():
+    session = Session()
+    try:
+        status = request.args.get('status', 'pending')
+
+        flags = session.query(PaperDuplicate).options(
+            joinedload(PaperDuplicate.paper),
+            joinedload(PaperDuplicate.duplicate_of)
+        ).filter_by(status=status).order_by(
+            PaperDuplicate.similarity.desc(),
+            PaperDuplicate.id.desc()
+        ).all()
+
+        duplicates_data = []
+        for flag in flags:
+            duplicates_data.append({
+                "id": flag.id,
+                "similarity": flag.similarity,
+                "status": flag.status,
+                "paper": {
+                    "id": flag.paper.id,
+                    "title": flag.paper.title,
+                    "owner_id": flag.paper.owner_id,
+                    "is_active": flag.paper.is_active,
+                    "created_at": flag.paper.created_at.isoformat()
+                },
+                "duplicate_of": {
+                    "id": flag.duplicate_of.id,
+                    "title": flag.duplicate_of.title,
+                    "owner_id": flag.duplicate_of.owner_id,
+                    "is_active": flag.duplicate_of.is_active,
+                    "created_at": flag.duplicate_of.created_at.isoformat()
+                },
+                "created_at": flag.created_at.isoformat()
+            })
+
+        return jsonify(duplicates_data), 200
+
+    except Exception as e:
+        logger.error("Failed to fetch duplicate research papers: %s", e)
+        return jsonify({"error": "Failed to fetch duplicate research papers"}), 500
+    finally:
+        session.close()
+
+@admin_bp.route('/research-papers/duplicates/<int:flag_id>/status', methods=['PUT'])
+@admin_required
+def update_duplicate_status(flag_id):
+    session = Session()
+    try:
+        flag = session.query(PaperDuplicate).filter_by(id=flag_id).first()
+
+        if not flag:
+            return jsonify({"error": "Duplicate flag not found"}), 404
+
+        data = request.get_json()
+        new_status = data.get('status')
+
+        if new_status not in ['pending', 'dismissed', 'confirmed']:
+            return jsonify({"error": "Invalid status"}), 400
+
+        flag.status = new_status
+        session.commit()
+
+        logger.info("Admin updated duplicate flag %s status to %s", flag_id, new_status)
+        return jsonify({"message": "Duplicate flag status updated successfully"}), 200
+
+    except Exception as e:
+        session.rollback()
+        logger.error("Failed to update duplicate flag status: %s", e)
+        return jsonify({"error": "Failed to update duplicate flag status"}), 500
+    finally:
+        session.close()
+
 @admin_bp.route('/reports', methods=['GET'])
 @admin_required
 def get_all_reports():
@@ -359,7 +459,7 @@ def get_all_reports():
         return jsonify(reports_data), 200
 
     except Exception as e:
-        logger.error(f"Failed to fetch reports: {str(e)}")
+        logger.error("Failed to fetch reports: %s", e)
         return jsonify({"error": "Failed to fetch reports"}), 500
     finally:
         session.close()
@@ -383,12 +483,12 @@ def update_report_status(report_id):
         report.status = new_status
         session.commit()
 
-        logger.info(f"Admin updated report {report_id} status to {new_status}")
+        logger.info("Admin updated report %s status to %s", report_id, new_status)
         return jsonify({"message": "Report status updated successfully"}), 200
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to update report status: {str(e)}")
+        logger.error("Failed to update report status: %s", e)
         return jsonify({"error": "Failed to update report status"}), 500
     finally:
         session.close()
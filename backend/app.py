@@ -1,16 +1,31 @@
 import sys
 import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# threading (default) or eventlet. Green threads have to be patched in
+# before anything else is imported; see green.py.
+SOCKETIO_ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading')
+if SOCKETIO_ASYNC_MODE == 'eventlet':
+    from green import patch_for_eventlet
+    patch_for_eventlet()
+
 import logging
 from datetime import datetime
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from flask import Flask, request, jsonify
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from flask_cors import CORS
 from flask_socketio import SocketIO
+from message_queue import socketio_queue_options
 from datetime import timedelta
 import os
-from database import init_db, Session
+from database import Session, ENGINE_PROFILE, describe_engine_profile
+from migrations import migrate, MIGRATE_ON_START
+from email_service import open_smtp_connection, FROM_EMAIL
+from mail_queue import start_mail_dispatcher, get_mail_metrics
+from counters import start_counter_reconciler
+from sqlalchemy import text
+from logging_config import configure_logging, init_request_logging
 from auth import auth_bp
 from projects import projects_bp
 from notifications import notifications_bp
@@ -18,6 +33,7 @@ from hackathons import hackathon_bp
 from chat import chat_bp
 from admin import admin_bp
 from research_papers import research_bp
+from search import search_bp
 
 app = Flask(
     __name__,
@@ -26,17 +42,11 @@ app = Flask(
 )
 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Configure logging (queue-based; see logging_config for presets)
+LOG_SETTINGS = configure_logging()
 
 logger = logging.getLogger(__name__)
+logger.info("Logging preset: %s (level %s, %s format)", LOG_SETTINGS['preset'], LOG_SETTINGS['level'], LOG_SETTINGS['format'])
 
 # Configuration
 app.config['JWT_SECRET_KEY'] = 'your-secret-key-change-in-production'
@@ -45,54 +55,64 @@ app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
 # Initialize extensions
 jwt = JWTManager(app)
 CORS(app, supports_credentials=True)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# With SOCKETIO_MESSAGE_QUEUE set, emits reach room members on every worker
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=SOCKETIO_ASYNC_MODE, **socketio_queue_options())
 
 # Initialize socketio in chat module
 from chat import init_socketio
 init_socketio(socketio)
 
+# Send read-only requests to the read replica, if configured
+from read_routing import init_read_routing
+init_read_routing(app)
+
+@app.teardown_appcontext
+def remove_session(exc):
+    # Return the request's pooled connection even if a handler didn't close
+    # its session; green mode runs each request on a fresh greenlet
+    Session.remove()
+
 # JWT Error Handlers
 @jwt.expired_token_loader
 def expired_token_callback(jwt_header, jwt_payload):
-    logger.warning(f"Expired token accessed: {jwt_payload}")
+    logger.warning("Expired token accessed: %s", jwt_payload)
     return jsonify({"error": "Token has expired", "code": "TOKEN_EXPIRED"}), 401
 
 @jwt.invalid_token_loader
 def invalid_token_callback(error):
-    logger.warning(f"Invalid token: {error}")
+    logger.warning("Invalid token: %s", error)
     return jsonify({"error": "Invalid token", "code": "INVALID_TOKEN"}), 401
 
 @jwt.unauthorized_loader
 def missing_token_callback(error):
-    logger.warning(f"Missing token: {error}")
+    logger.warning("Missing token: %s", error)
     return jsonify({"error": "Authorization token is required", "code": "MISSING_TOKEN"}), 401
 
 # Request logging middleware
-@app.before_request
-def log_request_info():
-    logger.info(f"Request: {request.method} {request.url}")
-    if request.is_json and request.get_json():
-        # Don't log passwords
-        data = request.get_json().copy()
-        if 'password' in data:
-            data['password'] = '[REDACTED]'
-        logger.info(f"Request Body: {data}")
-
-@app.after_request
-def log_response_info(response):
-    logger.info(f"Response: {response.status_code}")
-    return response
+init_request_logging(app, LOG_SETTINGS)
 
 # Initialize database with error handling
 try:
     logger.info("Initializing database...")
-    init_db()
-    logger.info("Database initialized successfully")
+    logger.info("Database engine profile: %s", describe_engine_profile(ENGINE_PROFILE))
+    if MIGRATE_ON_START:
+        # Serialized across workers; see migrations.py
+        migrate()
+        logger.info("Database initialized successfully")
+    else:
+        logger.info("MIGRATE_ON_START is off, expecting `python migrations.py` to have run")
 except Exception as e:
-    logger.error(f"Failed to initialize database: {str(e)}")
-    logger.error(f"Error type: {type(e).__name__}")
+    logger.error("Failed to initialize database: %s", e)
+    logger.error("Error type: %s", type(e).__name__)
     raise
 
+# Deliver queued emails in the background (set MAIL_DISPATCHER=false to run it elsewhere)
+if os.getenv('MAIL_DISPATCHER', 'true').lower() == 'true':
+    start_mail_dispatcher(open_smtp_connection, FROM_EMAIL)
+
+# Repair drifted application/bookmark/report counters (COUNTER_RECONCILE_SECONDS=0 disables)
+start_counter_reconciler()
+
 # Register blueprints with error handling
 try:
     logger.info("Registering blueprints...")
@@ -103,9 +123,10 @@ try:
     app.register_blueprint(chat_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(research_bp)
+    app.register_blueprint(search_bp)
     logger.info("All blueprints registered successfully")
 except Exception as e:
-    logger.error(f"Failed to register blueprints: {str(e)}")
+    logger.error("Failed to register blueprints: %s", e)
     raise
 
 @app.route('/api/health', methods=['GET'])
@@ -113,18 +134,19 @@ def health_check():
     try:
         # Test database connection
         session = Session()
-        session.execute('SELECT 1')
+        session.execute(text('SELECT 1'))
         session.close()
         
-        logger.info("Health check passed")
+        logger.debug("Health check passed")
         return jsonify({
             "status": "healthy", 
             "message": "API is running",
             "timestamp": datetime.now().isoformat(),
-            "database": "connected"
+            "database": "connected",
+            "mail": get_mail_metrics()
         })
     except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
+        logger.error("Health check failed: %s", e)
         return jsonify({
             "status": "unhealthy",
             "message": "Database connection failed",
@@ -133,33 +155,33 @@ def health_check():
 
 @app.errorhandler(400)
 def bad_request(error):
-    logger.error(f"Bad Request (400): {error}")
+    logger.error("Bad Request (400): %s", error)
     return jsonify({"error": "Bad request", "message": str(error)}), 400
 
 @app.errorhandler(401)
 def unauthorized(error):
-    logger.error(f"Unauthorized (401): {error}")
+    logger.error("Unauthorized (401): %s", error)
     return jsonify({"error": "Unauthorized", "message": "Authentication required"}), 401
 
 @app.errorhandler(403)
 def forbidden(error):
-    logger.error(f"Forbidden (403): {error}")
+    logger.error("Forbidden (403): %s", error)
     return jsonify({"error": "Forbidden", "message": "Insufficient permissions"}), 403
 
 @app.errorhandler(404)
 def not_found(error):
-    logger.error(f"Not Found (404): {request.url}")
+    logger.error("Not Found (404): %s", request.url)
     return jsonify({"error": "Endpoint not found", "url": request.url}), 404
 
 @app.errorhandler(405)
 def method_not_allowed(error):
-    logger.error(f"Method Not Allowed (405): {request.method} {request.url}")
+    logger.error("Method Not Allowed (405): %s %s", request.method, request.url)
     return jsonify({"error": "Method not allowed", "method": request.method, "url": request.url}), 405
 
 @app.errorhandler(500)
 def internal_error(error):
-    logger.error(f"Internal Server Error (500): {error}")
-    logger.error(f"Error details: {str(error)}")
+    logger.error("Internal Server Error (500): %s", error)
+    logger.error("Error details: %s", error)
     return jsonify({
         "error": "Internal server error", 
         "message": "An unexpected error occurred",
@@ -168,8 +190,8 @@ def internal_error(error):
 
 @app.errorhandler(Exception)
 def handle_exception(e):
-    logger.error(f"Unhandled Exception: {type(e).__name__}: {str(e)}")
-    logger.error(f"Request: {request.method} {request.url}")
+    logger.error("Unhandled Exception: %s: %s", type(e).__name__, e)
+    logger.error("Request: %s %s", request.method, request.url)
     
     # Return JSON instead of HTML for HTTP errors
     if hasattr(e, 'code'):
@@ -198,12 +220,29 @@ def serve_react(path):
 
 
 if __name__ == '__main__':
+    environment = os.getenv('FLASK_ENV', 'development')
+    debug = os.getenv('FLASK_DEBUG', 'false' if environment == 'production' else 'true').lower() in ('1', 'true')
+    host = os.getenv('HOST', '0.0.0.0')
+    port = int(os.getenv('PORT', 5000))
+
     logger.info("Starting Flask application...")
-    logger.info(f"Debug mode: {app.debug}")
-    logger.info(f"Environment: {os.getenv('FLASK_ENV', 'development')}")
-    
+    logger.info("Debug mode: %s", debug)
+    logger.info("Environment: %s", environment)
+    logger.info("Socket.IO async mode: %s", socketio.async_mode)
+
+    options = {}
+    if socketio.async_mode == 'eventlet':
+        from green import GREEN_MAX_CONNECTIONS
+        # eventlet.wsgi caps simultaneous connections (1024 by default), and
+        # every open socket counts against it
+        options['max_size'] = GREEN_MAX_CONNECTIONS
+    elif socketio.async_mode == 'threading' and not debug:
+        # Werkzeug refuses to serve outside debug mode unless told to
+        logger.warning("Serving with the Werkzeug threading server; set SOCKETIO_ASYNC_MODE=eventlet in production")
+        options['allow_unsafe_werkzeug'] = True
+
     try:
-        socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+        socketio.run(app, debug=debug, host=host, port=port, **options)
     except Exception as e:
-        logger.error(f"Failed to start Flask application: {str(e)}")
+        logger.error("Failed to start Flask application: %s", e)
         raise
\ No newline at end of file
@@ -5,6 +5,9 @@ from datetime import datetime, timezone, timedelta
 import pytz
 import re
 import logging
+from identity import get_current_user
+from matching import mark_user_skills_changed
+from autocomplete import mark_user_changed
 from database import Session, User, Skill, Role, PortfolioItem, ActivityLog
 from email_service import send_otp_email, generate_otp
 
@@ -41,18 +44,18 @@ def register():
         password = data.get('password', '')
         full_name = data.get('full_name', '').strip()
         
-        logger.info(f"Registration attempt for username: {username}, email: {email}")
+        logger.info("Registration attempt for username: %s, email: %s", username, email)
         
         if not username or not email or not password:
             logger.error("Missing required fields in registration")
             return jsonify({"error": "Username, email, and password are required"}), 400
         
         if not validate_email(email):
-            logger.error(f"Invalid email format: {email}")
+            logger.error("Invalid email format: %s", email)
             return jsonify({"error": "Invalid email format"}), 400
 
         if not validate_vit_email(email):
-            logger.error(f"Email not from vitstudent.ac.in domain: {email}")
+            logger.error("Email not from vitstudent.ac.in domain: %s", email)
             return jsonify({"error": "Only @vitstudent.ac.in email addresses are allowed"}), 400
         
         if not validate_password(password):
@@ -62,12 +65,12 @@ def register():
         # Check if user already exists
         existing_username = session.query(User).filter_by(username=username).first()
         if existing_username:
-            logger.error(f"Username already exists: {username}")
+            logger.error("Username already exists: %s", username)
             return jsonify({"error": "Username already exists"}), 409
         
         existing_email = session.query(User).filter_by(email=email).first()
         if existing_email:
-            logger.error(f"Email already exists: {email}")
+            logger.error("Email already exists: %s", email)
             return jsonify({"error": "Email already exists"}), 409
         
         hashed_password = generate_password_hash(password)
@@ -85,12 +88,13 @@ def register():
 
         session.add(new_user)
         session.commit()
+        mark_user_changed(new_user.id)
 
 
         if send_otp_email(email, otp, username):
-            logger.info(f"OTP sent to {email}")
+            logger.info("OTP sent to %s", email)
         else:
-            logger.warning(f"Failed to send OTP to {email}")
+            logger.warning("Failed to send OTP to %s", email)
 
         return jsonify({
             "message": "Registration successful. Please check your email for OTP verification.",
@@ -101,8 +105,8 @@ def register():
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Registration failed: {type(e).__name__}: {str(e)}")
-        logger.error(f"Registration data: {data if 'data' in locals() else 'No data'}")
+        logger.error("Registration failed: %s: %s", type(e).__name__, e)
+        logger.error("Registration data: %s", data if 'data' in locals() else 'No data')
         return jsonify({"error": "Registration failed", "details": str(e)}), 500
     finally:
         session.close()
@@ -121,7 +125,7 @@ def login():
         username = data.get('username', '').strip()
         password = data.get('password', '')
         
-        logger.info(f"Login attempt for: {username}")
+        logger.info("Login attempt for: %s", username)
         
         if not username or not password:
             logger.error("Missing username or password")
@@ -133,30 +137,30 @@ def login():
         ).first()
 
         if not user:
-            logger.error(f"User not found: {username}")
+            logger.error("User not found: %s", username)
             return jsonify({"error": "Invalid credentials"}), 401
 
         if not validate_vit_email(user.email):
-            logger.error(f"Login attempt with non-VIT email: {user.email}")
+            logger.error("Login attempt with non-VIT email: %s", user.email)
             return jsonify({"error": "Only @vitstudent.ac.in email addresses are allowed"}), 401
         
         if not check_password_hash(user.password, password):
-            logger.error(f"Invalid password for user: {username}")
+            logger.error("Invalid password for user: %s", username)
             return jsonify({"error": "Invalid credentials"}), 401
 
         if not user.is_email_verified:
-            logger.error(f"Unverified email login attempt: {username}")
+            logger.error("Unverified email login attempt: %s", username)
             return jsonify({"error": "Please verify your email before logging in", "requires_verification": True}), 403
 
         if not user.is_active:
-            logger.error(f"Inactive account login attempt: {username}")
+            logger.error("Inactive account login attempt: %s", username)
             return jsonify({"error": "Account is disabled"}), 401
         
         # Update last login
         user.last_login = datetime.now(IST)
         session.commit()
         
-        logger.info(f"User logged in successfully: {username} (ID: {user.id})")
+        logger.info("User logged in successfully: %s (ID: %s)", username, user.id)
         
         # Create tokens
         access_token = create_access_token(identity=user.username)
@@ -180,8 +184,8 @@ def login():
         }), 200
         
     except Exception as e:
-        logger.error(f"Login failed: {type(e).__name__}: {str(e)}")
-        logger.error(f"Login data: {data if 'data' in locals() else 'No data'}")
+        logger.error("Login failed: %s: %s", type(e).__name__, e)
+        logger.error("Login data: %s", data if 'data' in locals() else 'No data')
         return jsonify({"error": "Login failed", "details": str(e)}), 500
     finally:
         session.close()
@@ -191,11 +195,11 @@ def login():
 def refresh():
     try:
         current_user = get_jwt_identity()
-        logger.info(f"Token refresh for user: {current_user}")
+        logger.info("Token refresh for user: %s", current_user)
         access_token = create_access_token(identity=current_user)
         return jsonify({"access_token": access_token}), 200
     except Exception as e:
-        logger.error(f"Token refresh failed: {type(e).__name__}: {str(e)}")
+        logger.error("Token refresh failed: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Token refresh failed", "details": str(e)}), 500
 
 @auth_bp.route('/me', methods=['GET'])
@@ -204,19 +208,19 @@ def get_profile():
     session = Session()
     try:
         current_user_id = get_jwt_identity()
-        logger.info(f"Profile request for user: {current_user_id}")
+        logger.info("Profile request for user: %s", current_user_id)
         
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
-            logger.error(f"User not found in profile request: {current_user_id}")
+            logger.error("User not found in profile request: %s", current_user_id)
             return jsonify({"error": "User not found"}), 404
         
         # Get user stats
         project_count = len(user.projects)
         skills_count = len(user.skills)
         
-        logger.info(f"Profile data retrieved for user: {current_user_id}")
+        logger.info("Profile data retrieved for user: %s", current_user_id)
         
         return jsonify({
             "id": user.id,
@@ -244,7 +248,7 @@ def get_profile():
         }), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch profile: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to fetch profile: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to fetch profile", "details": str(e)}), 500
     finally:
         session.close()
@@ -255,12 +259,12 @@ def update_profile():
     session = Session()
     try:
         current_user_id = get_jwt_identity()
-        logger.info(f"Profile update request for user: {current_user_id}")
+        logger.info("Profile update request for user: %s", current_user_id)
         
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
-            logger.error(f"User not found in profile update: {current_user_id}")
+            logger.error("User not found in profile update: %s", current_user_id)
             return jsonify({"error": "User not found"}), 404
         
         data = request.get_json()
@@ -297,25 +301,27 @@ def update_profile():
             skill_ids = data['skill_ids']
             skills = session.query(Skill).filter(Skill.id.in_(skill_ids)).all()
             user.skills = skills
-            logger.info(f"Updated skills for user {current_user_id}: {len(skills)} skills")
+            logger.info("Updated skills for user %s: %s skills", current_user_id, len(skills))
         
         # Update roles
         if 'role_ids' in data:
             role_ids = data['role_ids']
             roles = session.query(Role).filter(Role.id.in_(role_ids)).all()
             user.roles = roles
-            logger.info(f"Updated roles for user {current_user_id}: {len(roles)} roles")
+            logger.info("Updated roles for user %s: %s roles", current_user_id, len(roles))
         
         user.updated_at = datetime.now(IST)
         session.commit()
+        mark_user_skills_changed(user.id)
+        mark_user_changed(user.id)
         
-        logger.info(f"Profile updated successfully for user: {current_user_id}")
+        logger.info("Profile updated successfully for user: %s", current_user_id)
         
         return jsonify({"message": "Profile updated successfully"}), 200
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to update profile: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to update profile: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to update profile", "details": str(e)}), 500
     finally:
         session.close()
@@ -336,11 +342,11 @@ def get_skills():
                 "category": skill.category
             })
         
-        logger.info(f"Retrieved {len(skills_data)} skills")
+        logger.info("Retrieved %s skills", len(skills_data))
         return jsonify(skills_data), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch skills: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to fetch skills: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to fetch skills", "details": str(e)}), 500
     finally:
         session.close()
@@ -362,11 +368,11 @@ def get_roles():
                 "category": role.category
             })
         
-        logger.info(f"Retrieved {len(roles_data)} roles")
+        logger.info("Retrieved %s roles", len(roles_data))
         return jsonify(roles_data), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch roles: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to fetch roles: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to fetch roles", "details": str(e)}), 500
     finally:
         session.close()
@@ -376,18 +382,18 @@ def get_roles():
 def get_user_profile(user_id):
     session = Session()
     try:
-        logger.info(f"User profile request for ID: {user_id}")
+        logger.info("User profile request for ID: %s", user_id)
         user = session.query(User).filter_by(id=user_id).first()
         
         if not user:
-            logger.error(f"User not found: {user_id}")
+            logger.error("User not found: %s", user_id)
             return jsonify({"error": "User not found"}), 404
         
         # Get user stats
         project_count = len(user.projects)
         skills_count = len(user.skills)
         
-        logger.info(f"User profile retrieved: {user.username}")
+        logger.info("User profile retrieved: %s", user.username)
         
         return jsonify({
             "id": user.id,
@@ -412,7 +418,7 @@ def get_user_profile(user_id):
         }), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch user profile: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to fetch user profile: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to fetch user profile", "details": str(e)}), 500
     finally:
         session.close()
@@ -422,8 +428,7 @@ def get_user_profile(user_id):
 def get_portfolio():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -446,7 +451,7 @@ def get_portfolio():
         return jsonify(items_data), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch portfolio: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to fetch portfolio: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to fetch portfolio"}), 500
     finally:
         session.close()
@@ -456,8 +461,7 @@ def get_portfolio():
 def add_portfolio_item():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -484,7 +488,7 @@ def add_portfolio_item():
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to add portfolio item: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to add portfolio item: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to add portfolio item"}), 500
     finally:
         session.close()
@@ -494,8 +498,7 @@ def add_portfolio_item():
 def delete_portfolio_item(item_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -512,7 +515,7 @@ def delete_portfolio_item(item_id):
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to delete portfolio item: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to delete portfolio item: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to delete portfolio item"}), 500
     finally:
         session.close()
@@ -522,8 +525,7 @@ def delete_portfolio_item(item_id):
 def get_activity():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -543,7 +545,7 @@ def get_activity():
         return jsonify(activities_data), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch activity: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to fetch activity: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to fetch activity"}), 500
     finally:
         session.close()
@@ -571,7 +573,7 @@ def get_user_portfolio(user_id):
         return jsonify(items_data), 200
 
     except Exception as e:
-        logger.error(f"Failed to fetch user portfolio: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to fetch user portfolio: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to fetch portfolio"}), 500
     finally:
         session.close()
@@ -628,7 +630,7 @@ def verify_otp():
         access_token = create_access_token(identity=user.username)
         refresh_token = create_refresh_token(identity=user.username)
 
-        logger.info(f"Email verified successfully for user: {user.username}")
+        logger.info("Email verified successfully for user: %s", user.username)
 
         return jsonify({
             "message": "Email verified successfully",
@@ -645,7 +647,7 @@ def verify_otp():
 
     except Exception as e:
         session.rollback()
-        logger.error(f"OTP verification failed: {type(e).__name__}: {str(e)}")
+        logger.error("OTP verification failed: %s: %s", type(e).__name__, e)
         return jsonify({"error": "OTP verification failed", "details": str(e)}), 500
     finally:
         session.close()
@@ -673,21 +675,21 @@ def resend_otp():
             return jsonify({"error": "Email already verified"}), 400
 
         otp = generate_otp()
-        logger.info(f"Generated OTP for {user.email}: {otp}")
+        logger.info("Generated OTP for %s: %s", user.email, otp)
         user.email_otp = otp
         user.otp_created_at = datetime.now(IST)
         session.commit()
 
         if send_otp_email(email, otp, user.username):
-            logger.info(f"OTP resent to {email}")
+            logger.info("OTP resent to %s", email)
             return jsonify({"message": "OTP sent successfully"}), 200
         else:
-            logger.error(f"Failed to resend OTP to {email}")
+            logger.error("Failed to resend OTP to %s", email)
             return jsonify({"error": "Failed to send OTP"}), 500
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Resend OTP failed: {type(e).__name__}: {str(e)}")
+        logger.error("Resend OTP failed: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to resend OTP", "details": str(e)}), 500
     finally:
         session.close()
\ No newline at end of file
@@ -0,0 +1,221 @@
+from collections import defaultdict
+from bisect import bisect_left, insort
+import numpy as np
+import unicodedata
+import os
+import logging
+from sqlalchemy import select
+from database import User
+from incremental_index import IncrementalIndex
+
+logger = logging.getLogger(__name__)
+
+# In-memory user autocomplete over username and full name. Prefix lookups
+# bisect a sorted key list; when those run short, trigram postings (the
+# pg_trgm approach) find near misses and typos. Changes made in this
+# process are applied as deltas; the periodic rebuild catches the rest.
+AUTOCOMPLETE_REBUILD_SECONDS = float(os.getenv('AUTOCOMPLETE_REBUILD_SECONDS', 300))
+AUTOCOMPLETE_MIN_SIMILARITY = float(os.getenv('AUTOCOMPLETE_MIN_SIMILARITY', 0.3))
+# Bounds the work a one-letter query can cause
+PREFIX_SCAN_LIMIT = 500
+
+# Result tiers, best first
+TIER_EXACT = 0
+TIER_USERNAME_PREFIX = 1
+TIER_NAME_PREFIX = 2
+TIER_FUZZY = 3
+
+KEY_USERNAME = 0
+KEY_FULL_NAME = 1
+KEY_NAME_WORD = 2
+
+def normalize(value):
+    """Lowercase and strip accents, so 'José' matches 'jose'"""
+    if not value:
+        return ''
+    if value.isascii():
+        return value.lower().strip()
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower().strip()
+
+def trigrams(value):
+    padded = f"  {value} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+class UserAutocompleteIndex(IncrementalIndex):
+    index_name = 'User autocomplete index'
+    item_name = 'users'
+    rebuild_seconds = AUTOCOMPLETE_REBUILD_SECONDS
+
+    def _load_users(self, session, user_ids=None):
+        query = select(User.id, User.username, User.full_name).where(User.is_active == True)
+        if user_ids is not None:
+            query = query.where(User.id.in_(user_ids))
+        return session.execute(query).all()
+
+    @staticmethod
+    def _entry_keys(username, full_name):
+        keys = [(username, KEY_USERNAME)]
+        if full_name:
+            keys.append((full_name, KEY_FULL_NAME))
+            words = full_name.split()
+            if len(words) > 1:
+                keys.extend((word, KEY_NAME_WORD) for word in words[1:])
+        return keys
+
+    @staticmethod
+    def _entry_trigrams(username, full_name):
+        grams = trigrams(username)
+        if full_name:
+            grams |= trigrams(full_name)
+        return grams
+
+    def _build(self, session):
+        users = self._load_users(session)
+        entries = [(user.id, normalize(user.username), normalize(user.full_name)) for user in users]
+
+        keys = []
+        for row, (_, username, full_name) in enumerate(entries):
+            keys.extend((key, kind, row) for key, kind in self._entry_keys(username, full_name))
+        keys.sort()
+
+        row_grams = [self._entry_trigrams(username, full_name) for _, username, full_name in entries]
+        gram_counts = np.array([len(grams) for grams in row_grams], dtype=np.int32)
+
+        postings = {}
+        if entries:
+            vocabulary = sorted(set().union(*row_grams))
+            gram_ids = {gram: gram_id for gram_id, gram in enumerate(vocabulary)}
+            gram_keys = np.array([gram_ids[gram] for grams in row_grams for gram in grams], dtype=np.int32)
+            gram_rows = np.repeat(np.arange(len(entries), dtype=np.int32), gram_counts)
+
+            order = np.argsort(gram_keys, kind='stable')
+            gram_keys, gram_rows = gram_keys[order], gram_rows[order]
+            unique_ids, starts = np.unique(gram_keys, return_index=True)
+            postings = {vocabulary[gram_id]: rows for gram_id, rows in zip(unique_ids, np.split(gram_rows, starts[1:]))}
+
+        return entries, keys, gram_counts, postings
+
+    def _install(self, state):
+        self.entries, self.keys, self.gram_counts, self.postings = state
+        self.row_of = {user_id: row for row, (user_id, _, _) in enumerate(self.entries)}
+        self.live = np.ones(len(self.entries), dtype=bool)
+        self.delta = defaultdict(list)
+        self._delta_size = 0
+
+    def _size(self):
+        return len(self.entries)
+
+    def _apply_changes(self, session):
+        changed = list(self._dirty)
+        self._dirty.clear()
+
+        for user_id in changed:
+            row = self.row_of.pop(user_id, None)
+            if row is not None:
+                self.live[row] = False
+
+        users = self._load_users(session, changed)
+        new_counts = []
+        for user in users:
+            row = len(self.entries)
+            username, full_name = normalize(user.username), normalize(user.full_name)
+            self.entries.append((user.id, username, full_name))
+            self.row_of[user.id] = row
+            for key, kind in self._entry_keys(username, full_name):
+                insort(self.keys, (key, kind, row))
+
+            grams = self._entry_trigrams(username, full_name)
+            new_counts.append(len(grams))
+            for gram in grams:
+                self.delta[gram].append(row)
+                self._delta_size += 1
+
+        if users:
+            self.live = np.concatenate([self.live, np.ones(len(users), dtype=bool)])
+            self.gram_counts = np.concatenate([self.gram_counts, np.array(new_counts, dtype=np.int32)])
+
+        dead = len(self.entries) - len(self.row_of)
+        if self._delta_size > 50000 or dead > max(1000, len(self.entries) // 4):
+            self.rebuild(session)
+
+    def _prefix_matches(self, query, exclude_user_id):
+        matches = {}
+        index = bisect_left(self.keys, (query,))
+        scanned = 0
+        while index < len(self.keys) and scanned < PREFIX_SCAN_LIMIT:
+            key, kind, row = self.keys[index]
+            if not key.startswith(query):
+                break
+            index += 1
+            scanned += 1
+
+            if not self.live[row] or self.entries[row][0] == exclude_user_id:
+                continue
+            if key == query and kind != KEY_NAME_WORD:
+                tier = TIER_EXACT
+            elif kind == KEY_USERNAME:
+                tier = TIER_USERNAME_PREFIX
+            else:
+                tier = TIER_NAME_PREFIX
+            matches[row] = min(tier, matches.get(row, tier))
+        return matches
+
+    def _fuzzy_matches(self, query, exclude_user_id, limit):
+        grams = trigrams(query)
+        parts = []
+        for gram in grams:
+            if gram in self.postings:
+                parts.append(self.postings[gram])
+            if self.delta.get(gram):
+                parts.append(np.array(self.delta[gram], dtype=np.int32))
+        if not parts:
+            return {}
+
+        shared = np.bincount(np.concatenate(parts), minlength=len(self.entries))
+        # Share of the query's trigrams found in the name (like pg_trgm's
+        # word_similarity), so long full names aren't penalised; overall
+        # overlap only breaks ties towards the closer name
+        coverage = shared / len(grams)
+        overlap = shared / (len(grams) + self.gram_counts - shared)
+        coverage[~self.live] = 0
+        exclude_row = self.row_of.get(exclude_user_id)
+        if exclude_row is not None:
+            coverage[exclude_row] = 0
+
+        rows = np.flatnonzero(coverage >= AUTOCOMPLETE_MIN_SIMILARITY)
+        similarity = coverage[rows] + overlap[rows] * 1e-3
+        if len(rows) > limit:
+            top = np.argpartition(-similarity, limit - 1)[:limit]
+            rows, similarity = rows[top], similarity[top]
+        return {int(row): float(score) for row, score in zip(rows, similarity)}
+
+    def search(self, session, query, limit=10, exclude_user_id=None):
+        """Return up to limit user ids: exact, then prefix, then fuzzy matches"""
+        self.ensure_fresh(session)
+        query = normalize(query)
+        if not query:
+            return []
+
+        with self._lock:
+            matches = self._prefix_matches(query, exclude_user_id)
+            ranked = sorted(
+                matches.items(),
+                key=lambda item: (item[1], len(self.entries[item[0]][1]), self.entries[item[0]][1])
+            )[:limit]
+
+            if len(ranked) < limit and len(query) >= 3:
+                seen = {row for row, _ in ranked}
+                fuzzy = self._fuzzy_matches(query, exclude_user_id, limit + len(seen))
+                ranked.extend(sorted(
+                    ((row, TIER_FUZZY) for row in fuzzy if row not in seen),
+                    key=lambda item: (-fuzzy[item[0]], self.entries[item[0]][1])
+                )[:limit - len(ranked)])
+
+            return [self.entries[row][0] for row, _ in ranked]
+
+user_autocomplete = UserAutocompleteIndex()
+
+def mark_user_changed(user_id):
+    """Re-index a user after they register, rename or are (de)activated"""
+    user_autocomplete.mark_changed(user_id)
@@ -0,0 +1,80 @@
+"""Latency of the in-memory user autocomplete index.
+
+Seeds a throwaway SQLite database with users, builds the prefix/trigram
+index and times prefix, exact and misspelled lookups.
+
+    python benchmarks/bench_autocomplete.py --users 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--users', type=int, default=200_000)
+parser.add_argument('--repeat', type=int, default=300)
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp(prefix='assemble-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database import engine, Base, Session
+from autocomplete import user_autocomplete
+
+FIRST = ['aarav', 'vivaan', 'aditya', 'diya', 'ananya', 'ishaan', 'kavya', 'rohan', 'sneha', 'arjun',
+         'priya', 'rahul', 'meera', 'karthik', 'nisha', 'vikram', 'pooja', 'siddharth', 'tanvi', 'varun']
+LAST = ['sharma', 'iyer', 'reddy', 'nair', 'patel', 'gupta', 'singh', 'menon', 'rao', 'krishnan',
+        'kumar', 'das', 'joshi', 'pillai', 'shetty', 'verma', 'bose', 'mehta', 'chopra', 'banerjee']
+
+def misspell(word, rng):
+    index = rng.randrange(len(word))
+    return word[:index] + rng.choice(string.ascii_lowercase) + word[index + 1:]
+
+def timed(queries):
+    session = Session()
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        user_autocomplete.search(session, query, limit=10)
+        timings.append((time.perf_counter() - started) * 1000)
+    session.close()
+    return statistics.median(timings), sorted(timings)[int(len(timings) * 0.95) - 1]
+
+if __name__ == '__main__':
+    Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    names = []
+    for i in range(1, args.users + 1):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        names.append({"id": i, "u": f"{first}{last[:3]}{i}", "e": f"user{i}@vitstudent.ac.in",
+                      "n": f"{first.title()} {last.title()}"})
+
+    print(f"Seeding {args.users:,} users into {workdir} ...")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, username, email, full_name, is_active) VALUES (:id, :u, :e, :n, 1)"
+        ), names)
+
+    session = Session()
+    started = time.perf_counter()
+    user_autocomplete.rebuild(session)
+    session.close()
+    print(f"Index built in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    samples = [rng.choice(names) for _ in range(args.repeat)]
+    workloads = {
+        "one letter": [sample["u"][:1] for sample in samples],
+        "prefix": [sample["u"][:rng.randint(2, 6)] for sample in samples],
+        "exact username": [sample["u"] for sample in samples],
+        "surname": [sample["n"].split()[1][:4] for sample in samples],
+        "typo in name": [misspell(sample["n"].lower(), rng) for sample in samples],
+    }
+    for name, queries in workloads.items():
+        median, p95 = timed(queries)
+        print(f"{name:<16} median {median:7.3f} ms   p95 {p95:7.3f} ms")
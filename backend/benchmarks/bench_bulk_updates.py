@@ -0,0 +1,107 @@
+"""Marking a large backlog as read.
+
+Seeds a throwaway SQLite database with one user holding --unread unread
+notifications and the same number of unread chat messages from one
+sender. Notifications compare the old approach (load every unread row,
+flip is_read in Python, flush) against bulk.mark_read(). Chat messages
+carry no per-row flag; the unread count is a range above the reader's
+watermark and marking read moves the watermark, so those are timed on
+their own. Every run resets the read state first.
+
+    python benchmarks/bench_bulk_updates.py --unread 10000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--unread', type=int, default=10_000)
+parser.add_argument('--repeat', type=int, default=5)
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp(prefix='assemble-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database import engine, init_db, Session, Notification
+from bulk import mark_read
+from conversations import get_conversation, mark_conversation_read, get_unread_total
+
+READER_ID = 1
+SENDER_ID = 2
+
+def seed(connection):
+    connection.execute(text(
+        "INSERT INTO users (id, username, email, is_active) VALUES (:id, :u, :e, 1)"
+    ), [{"id": i, "u": f"user{i}", "e": f"user{i}@vitstudent.ac.in"} for i in (READER_ID, SENDER_ID)])
+    connection.execute(text(
+        "INSERT INTO notifications (user_id, title, content, type, is_read, created_at) "
+        "VALUES (:u, 'Update', :c, 'info', 0, CURRENT_TIMESTAMP)"
+    ), [{"u": READER_ID, "c": f"notification {i}"} for i in range(args.unread)])
+    connection.execute(text(
+        "INSERT INTO messages (sender_id, receiver_id, content, created_at) "
+        "VALUES (:s, :r, :c, CURRENT_TIMESTAMP)"
+    ), [{"s": SENDER_ID, "r": READER_ID, "c": f"message {i}"} for i in range(args.unread)])
+    connection.execute(text(
+        "INSERT INTO conversations (user_low_id, user_high_id, last_message_id, last_activity, "
+        "low_last_read_message_id, high_last_read_message_id) "
+        "SELECT 1, 2, MAX(id), CURRENT_TIMESTAMP, 0, 0 FROM messages"
+    ))
+
+def reset():
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE notifications SET is_read = 0"))
+        connection.execute(text("UPDATE conversations SET low_last_read_message_id = 0"))
+
+def orm_loop(session, model, filters):
+    rows = session.query(model).filter_by(is_read=False, **filters).all()
+    for row in rows:
+        row.is_read = True
+    session.flush()
+    return len(rows)
+
+def bulk(session, model, filters):
+    return mark_read(session, model, *[getattr(model, name) == value for name, value in filters.items()])
+
+def timed(strategy, *arguments):
+    timings = []
+    for _ in range(args.repeat):
+        reset()
+        session = Session()
+        started = time.perf_counter()
+        result = strategy(session, *arguments)
+        session.commit()
+        timings.append((time.perf_counter() - started) * 1000)
+        session.close()
+    return statistics.median(timings), result
+
+def unread_count(session):
+    return get_unread_total(session, READER_ID)
+
+def count_and_mark_read(session):
+    unread = get_unread_total(session, READER_ID)
+    # As if the reader had just been shown the newest message
+    newest_id = get_conversation(session, READER_ID, SENDER_ID).last_message_id
+    mark_conversation_read(session, READER_ID, SENDER_ID, newest_id)
+    return unread
+
+if __name__ == '__main__':
+    init_db()
+    print(f"Seeding {args.unread:,} unread notifications and messages into {workdir} ...")
+    with engine.begin() as connection:
+        seed(connection)
+
+    filters = {"user_id": READER_ID}
+    loop_ms, changed = timed(orm_loop, Notification, filters)
+    bulk_ms, bulk_changed = timed(bulk, Notification, filters)
+    assert changed == bulk_changed == args.unread, (changed, bulk_changed)
+    print(f"notifications  ORM loop {loop_ms:8.1f} ms   bulk UPDATE {bulk_ms:7.1f} ms   ({loop_ms / bulk_ms:.0f}x)")
+
+    count_ms, unread = timed(unread_count)
+    read_ms, _ = timed(count_and_mark_read)
+    assert unread == args.unread, unread
+    print(f"messages       unread count {count_ms:6.1f} ms   count + mark read {read_ms:6.1f} ms")
@@ -0,0 +1,78 @@
+"""Cost of the near-duplicate check for a new paper as the corpus grows.
+
+Seeds a throwaway SQLite database with random abstracts, signs them with
+the batch command's sign_corpus(), then times check_paper_duplicates()
+for fresh submissions, half of them lightly edited copies of existing
+abstracts. The LSH lookup should stay flat as --papers grows.
+
+    python benchmarks/bench_duplicates.py --papers 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--papers', type=int, default=50_000)
+parser.add_argument('--repeat', type=int, default=200)
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp(prefix='assemble-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database import engine, init_db, Session, ResearchPaper
+from duplicates import sign_corpus, check_paper_duplicates
+
+VOCABULARY = [f"term{i}" for i in range(20_000)]
+
+def abstract(rng, words=180):
+    return ' '.join(rng.choice(VOCABULARY) for _ in range(words))
+
+def edited_copy(rng, original):
+    words = original.split()
+    for _ in range(8):
+        words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+    return ' '.join(words)
+
+if __name__ == '__main__':
+    init_db()
+    rng = random.Random(42)
+    abstracts = [abstract(rng) for _ in range(args.papers)]
+
+    print(f"Seeding {args.papers:,} papers into {workdir} ...")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, username, email, is_active) VALUES (1, 'owner', 'owner@vitstudent.ac.in', 1)"
+        ))
+        connection.execute(text(
+            "INSERT INTO research_papers (id, title, abstract, authors, owner_id, is_active, created_at, updated_at) "
+            "VALUES (:id, :t, :a, 'a', 1, 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+        ), [{"id": i, "t": f"paper {i}", "a": body} for i, body in enumerate(abstracts, start=1)])
+
+    started = time.perf_counter()
+    signed, flagged = sign_corpus(batch_size=1000)
+    print(f"sign_corpus: {signed:,} papers in {time.perf_counter() - started:.1f} s ({flagged} flags)")
+
+    session = Session()
+    timings = []
+    found = 0
+    for index in range(args.repeat):
+        copy = index % 2 == 0
+        body = edited_copy(rng, rng.choice(abstracts)) if copy else abstract(rng)
+        paper = ResearchPaper(title='new', abstract=body, authors='a', owner_id=1)
+        session.add(paper)
+        started = time.perf_counter()
+        flags = check_paper_duplicates(session, paper)
+        timings.append((time.perf_counter() - started) * 1000)
+        found += bool(flags) == copy
+        session.rollback()
+
+    print(f"check_paper_duplicates over {args.papers:,} papers: median {statistics.median(timings):.2f} ms   "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.2f} ms   "
+          f"correct {found}/{args.repeat}")
+    session.close()
@@ -0,0 +1,126 @@
+"""Before/after query plans and latencies for the composite index set.
+
+Seeds a throwaway SQLite database (1M messages by default), runs the hot
+filter/order queries with only primary keys and unique constraints, then
+applies the index migration and runs them again.
+
+    python benchmarks/bench_indexes.py --messages 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--messages', type=int, default=1_000_000)
+parser.add_argument('--users', type=int, default=5_000)
+parser.add_argument('--repeat', type=int, default=20)
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp(prefix='assemble-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database import engine, Base
+from migrations import run_migrations
+
+QUERIES = {
+    "chat history": (
+        "SELECT * FROM messages WHERE (sender_id = :a AND receiver_id = :b) OR (sender_id = :b AND receiver_id = :a) "
+        "ORDER BY created_at DESC LIMIT 50"
+    ),
+    "unread messages": "SELECT count(*) FROM messages WHERE receiver_id = :a AND is_read = 0",
+    "unread notifications": (
+        "SELECT * FROM notifications WHERE user_id = :a AND is_read = 0 ORDER BY created_at DESC LIMIT 20"
+    ),
+    "project feed": "SELECT * FROM projects WHERE is_active = 1 ORDER BY created_at DESC LIMIT 10",
+    "has applied": "SELECT project_id FROM project_applications WHERE project_id = :p AND user_id = :a",
+    "paper reports": "SELECT count(*) FROM reports WHERE report_type = 'research_paper' AND target_id = :p",
+}
+
+def seed(connection):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    users = args.users
+    projects = max(users * 4, 1)
+
+    connection.execute(text(
+        "INSERT INTO users (id, username, email, is_active) VALUES (:id, :u, :e, 1)"
+    ), [{"id": i, "u": f"user{i}", "e": f"user{i}@vitstudent.ac.in"} for i in range(1, users + 1)])
+
+    connection.execute(text(
+        "INSERT INTO projects (id, name, owner_id, is_active, created_at) VALUES (:id, :n, :o, :a, :c)"
+    ), [{"id": i, "n": f"project {i}", "o": rng.randint(1, users), "a": rng.random() < 0.8,
+         "c": start + timedelta(minutes=i)} for i in range(1, projects + 1)])
+
+    connection.execute(text(
+        "INSERT INTO project_applications (project_id, user_id, status, applied_at) VALUES (:p, :u, 'pending', :c)"
+    ), [{"p": rng.randint(1, projects), "u": rng.randint(1, users), "c": start} for _ in range(projects * 5)])
+
+    connection.execute(text(
+        "INSERT INTO reports (reporter_id, report_type, target_id, reason, status) VALUES (:r, :t, :p, 'spam', 'pending')"
+    ), [{"r": rng.randint(1, users), "t": rng.choice(['project', 'hackathon', 'research_paper']),
+         "p": rng.randint(1, projects)} for _ in range(projects // 2)])
+
+    connection.execute(text(
+        "INSERT INTO notifications (user_id, title, content, type, is_read, created_at) VALUES (:u, 't', 'c', 'info', :r, :c)"
+    ), [{"u": rng.randint(1, users), "r": rng.random() < 0.7, "c": start + timedelta(seconds=i)}
+        for i in range(args.messages // 5)])
+
+    batch = 100_000
+    for offset in range(0, args.messages, batch):
+        rows = []
+        for i in range(offset, min(offset + batch, args.messages)):
+            sender = rng.randint(1, users)
+            # Most traffic stays inside small friend groups, like real chat
+            receiver = (sender + rng.randint(1, 20)) % users + 1
+            rows.append({"s": sender, "r": receiver, "read": rng.random() < 0.9,
+                         "c": start + timedelta(seconds=i)})
+        connection.execute(text(
+            "INSERT INTO messages (sender_id, receiver_id, content, is_read, created_at) VALUES (:s, :r, 'hello', :read, :c)"
+        ), rows)
+
+def drop_declared_indexes(connection):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+def measure(label):
+    rng = random.Random(7)
+    print(f"\n== {label} ==")
+    with engine.connect() as connection:
+        for name, sql in QUERIES.items():
+            params = {"a": rng.randint(1, args.users), "b": rng.randint(1, args.users), "p": rng.randint(1, args.users)}
+            plan = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+            timings = []
+            for _ in range(args.repeat):
+                params = {"a": rng.randint(1, args.users), "b": rng.randint(1, args.users), "p": rng.randint(1, args.users)}
+                started = time.perf_counter()
+                connection.execute(text(sql), params).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{name:<22} median {statistics.median(timings):8.3f} ms   p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:8.3f} ms")
+            for row in plan:
+                print(f"    {row[-1]}")
+
+if __name__ == '__main__':
+    Base.metadata.create_all(engine)
+    print(f"Seeding {args.messages:,} messages into {workdir} ...")
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        drop_declared_indexes(connection)
+        seed(connection)
+        connection.execute(text("ANALYZE"))
+    print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    measure("before: primary keys and unique constraints only")
+
+    run_migrations()
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+
+    measure("after: composite index set")
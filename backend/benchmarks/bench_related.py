@@ -0,0 +1,77 @@
+"""Build time and query latency of the related-papers TF-IDF index.
+
+Seeds a throwaway SQLite database with synthetic papers drawn from a set
+of topics, builds and persists the index, then times loading the
+memory-mapped build in a fresh index object (what a new worker does) and
+related() queries for random papers.
+
+    python benchmarks/bench_related.py --papers 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--papers', type=int, default=50_000)
+parser.add_argument('--repeat', type=int, default=200)
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp(prefix='assemble-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database import engine, init_db, Session
+from related import PaperVectorIndex
+
+TOPICS = [[f"topic{topic}term{i}" for i in range(60)] for topic in range(200)]
+COMMON = [f"word{i}" for i in range(5000)]
+
+def words(rng, topic, count):
+    return ' '.join(rng.choice(TOPICS[topic]) if rng.random() < 0.3 else rng.choice(COMMON) for _ in range(count))
+
+if __name__ == '__main__':
+    init_db()
+    rng = random.Random(42)
+
+    print(f"Seeding {args.papers:,} papers into {workdir} ...")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, username, email, is_active) VALUES (1, 'owner', 'owner@vitstudent.ac.in', 1)"
+        ))
+        rows = []
+        for paper_id in range(1, args.papers + 1):
+            topic = rng.randrange(len(TOPICS))
+            rows.append({"id": paper_id, "t": words(rng, topic, 8), "a": words(rng, topic, 150),
+                         "k": ', '.join(rng.sample(TOPICS[topic], 3))})
+        connection.execute(text(
+            "INSERT INTO research_papers (id, title, abstract, keywords, authors, owner_id, is_active, created_at, updated_at) "
+            "VALUES (:id, :t, :a, :k, 'a', 1, 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+        ), rows)
+
+    directory = os.path.join(workdir, 'related_index')
+    session = Session()
+
+    started = time.perf_counter()
+    PaperVectorIndex(directory).rebuild(session)
+    print(f"Full build and save: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    index = PaperVectorIndex(directory)
+    started = time.perf_counter()
+    index.ensure_fresh(session)
+    print(f"Worker start from the memory-mapped build: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    timings = []
+    for _ in range(args.repeat):
+        paper_id = rng.randint(1, args.papers)
+        started = time.perf_counter()
+        index.related(session, paper_id, limit=10)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    print(f"related() over {args.papers:,} papers: median {statistics.median(timings):.2f} ms   "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.2f} ms")
+    session.close()
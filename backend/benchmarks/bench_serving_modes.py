@@ -0,0 +1,251 @@
+"""Memory per Socket.IO connection and connection ceiling per serving mode.
+
+Starts the app once per async mode (threading, then eventlet) on a
+throwaway SQLite database and opens authenticated WebSocket connections
+to it in steps of --step, up to --max. After every step it records the
+server's resident memory and thread count from /proc. A mode's ceiling
+is the last step it completed before a connection failed or timed out.
+
+The client speaks just enough Engine.IO/WebSocket to connect the
+default namespace with a JWT and answer the server's pings, so one
+process can hold thousands of sockets.
+
+    python benchmarks/bench_serving_modes.py --max 5000 --step 500
+"""
+import argparse
+import base64
+import json
+import os
+import queue
+import selectors
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--max', type=int, default=5000)
+parser.add_argument('--step', type=int, default=500)
+parser.add_argument('--port', type=int, default=5200)
+parser.add_argument('--modes', default='threading,eventlet')
+parser.add_argument('--timeout', type=float, default=5)
+args = parser.parse_args()
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+def ws_frame(text):
+    """Masked client text frame"""
+    payload = text.encode('utf-8')
+    mask = os.urandom(4)
+    if len(payload) < 126:
+        header = struct.pack('!BB', 0x81, 0x80 | len(payload))
+    elif len(payload) < 65536:
+        header = struct.pack('!BBH', 0x81, 0x80 | 126, len(payload))
+    else:
+        header = struct.pack('!BBQ', 0x81, 0x80 | 127, len(payload))
+    return header + mask + bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+
+def ws_next(buffer):
+    """First complete server frame in buffer as (opcode, payload, rest), or None"""
+    if len(buffer) < 2:
+        return None
+    opcode, length = buffer[0] & 0x0F, buffer[1] & 0x7F
+    offset = 2
+    if length == 126:
+        if len(buffer) < 4:
+            return None
+        length, offset = struct.unpack('!H', buffer[2:4])[0], 4
+    elif length == 127:
+        if len(buffer) < 10:
+            return None
+        length, offset = struct.unpack('!Q', buffer[2:10])[0], 10
+    if len(buffer) < offset + length:
+        return None
+    return opcode, buffer[offset:offset + length], buffer[offset + length:]
+
+def ws_parse(buffer):
+    """Split complete server frames off buffer; returns ([(opcode, payload)], rest)"""
+    frames = []
+    while (frame := ws_next(buffer)) is not None:
+        opcode, payload, buffer = frame
+        frames.append((opcode, payload))
+    return frames, buffer
+
+def read_frame(connection, buffer):
+    """Block until a whole frame arrives; returns (text, rest of the buffer)"""
+    while (frame := ws_next(buffer)) is None:
+        chunk = connection.recv(65536)
+        if not chunk:
+            raise ConnectionError("closed during handshake")
+        buffer += chunk
+    _, payload, rest = frame
+    return payload.decode('utf-8'), rest
+
+def open_socket(port, token):
+    """Connect one authenticated Socket.IO client over WebSocket"""
+    connection = socket.create_connection(('127.0.0.1', port), timeout=args.timeout)
+    key = base64.b64encode(os.urandom(16)).decode()
+    connection.sendall((
+        "GET /socket.io/?EIO=4&transport=websocket HTTP/1.1\r\n"
+        f"Host: 127.0.0.1:{port}\r\n"
+        "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+    ).encode())
+
+    response = b''
+    while b'\r\n\r\n' not in response:
+        chunk = connection.recv(4096)
+        if not chunk:
+            raise ConnectionError("closed during upgrade")
+        response += chunk
+    head, buffer = response.split(b'\r\n\r\n', 1)
+    if b' 101 ' not in head.split(b'\r\n', 1)[0]:
+        raise ConnectionError(head.split(b'\r\n', 1)[0].decode())
+
+    packet, buffer = read_frame(connection, buffer)
+    if not packet.startswith('0'):
+        raise ConnectionError(f"unexpected open packet {packet[:40]}")
+    connection.sendall(ws_frame('40' + json.dumps({"token": token})))
+    packet, buffer = read_frame(connection, buffer)
+    if not packet.startswith('40'):
+        raise ConnectionError(f"namespace refused: {packet[:80]}")
+    connection.setblocking(False)
+    return connection, buffer
+
+class PingResponder(threading.Thread):
+    """Answers Engine.IO pings on every open socket so none time out"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.incoming = queue.SimpleQueue()
+        self.selector = selectors.DefaultSelector()
+        self.buffers = {}
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            while not self.incoming.empty():
+                connection, buffer = self.incoming.get()
+                self.buffers[connection] = buffer
+                self.selector.register(connection, selectors.EVENT_READ)
+            for key, _ in self.selector.select(timeout=0.2):
+                connection = key.fileobj
+                try:
+                    chunk = connection.recv(65536)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    chunk = b''
+                if not chunk:
+                    self.selector.unregister(connection)
+                    self.buffers.pop(connection, None)
+                    continue
+                frames, self.buffers[connection] = ws_parse(self.buffers[connection] + chunk)
+                for opcode, payload in frames:
+                    if opcode == 1 and payload == b'2':
+                        connection.sendall(ws_frame('3'))
+
+def process_stats(pid):
+    stats = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            name, _, value = line.partition(':')
+            if name in ('VmRSS', 'Threads'):
+                stats[name] = int(value.split()[0])
+    return stats['VmRSS'], stats['Threads']
+
+def wait_for_health(port, process, timeout=60):
+    import requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/health", timeout=1).ok:
+                return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+def measure(mode, env, token):
+    port = args.port
+    process = subprocess.Popen(
+        [sys.executable, 'app.py'], cwd=backend_dir,
+        env=dict(env, SOCKETIO_ASYNC_MODE=mode, PORT=str(port), FLASK_DEBUG='false'),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    responder = PingResponder()
+    responder.start()
+    connections = []
+    try:
+        wait_for_health(port, process)
+        base_rss, base_threads = process_stats(process.pid)
+        print(f"\n{mode}: idle server {base_rss / 1024:.1f} MB RSS, {base_threads} threads")
+
+        reached, failure = 0, None
+        while reached < args.max and failure is None:
+            started = time.perf_counter()
+            for _ in range(min(args.step, args.max - reached)):
+                try:
+                    connection, buffer = open_socket(port, token)
+                except (OSError, ConnectionError) as e:
+                    failure = f"{type(e).__name__}: {e}"
+                    break
+                connections.append(connection)
+                responder.incoming.put((connection, buffer))
+            else:
+                reached = len(connections)
+                rss, threads = process_stats(process.pid)
+                per_connection = (rss - base_rss) / reached
+                print(f"  {reached:>6,} sockets  {rss / 1024:8.1f} MB RSS  {threads:>6,} threads  "
+                      f"{per_connection:6.1f} KB/socket  ({time.perf_counter() - started:.1f} s for the step)")
+
+        if failure:
+            print(f"  stopped after {len(connections):,} sockets: {failure}")
+        rss, _ = process_stats(process.pid)
+        return reached, (rss - base_rss) / max(reached, 1)
+    finally:
+        responder.stopped.set()
+        for connection in connections:
+            connection.close()
+        process.terminate()
+        process.wait(timeout=30)
+        # Let the port and the server's sockets drain before the next mode
+        time.sleep(2)
+        args.port += 1
+
+if __name__ == '__main__':
+    workdir = tempfile.mkdtemp(prefix='assemble-bench-')
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        MAIL_DISPATCHER='false',
+        COUNTER_RECONCILE_SECONDS='0',
+        FLASK_ENV='production',
+        LOG_LEVEL='WARNING',
+        LOG_FILE=os.path.join(workdir, 'app.log'),
+    )
+    os.environ.update(env)
+
+    # Importing the app here creates the schema and signs the token
+    from sqlalchemy import text
+    from flask_jwt_extended import create_access_token
+    from app import app
+    from database import engine
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, username, email, is_active) VALUES (1, 'loadtest', 'loadtest@vitstudent.ac.in', 1)"
+        ))
+    with app.app_context():
+        token = create_access_token(identity='loadtest')
+
+    results = {mode: measure(mode, env, token) for mode in args.modes.split(',')}
+
+    print("\nmode        max sockets   KB/socket")
+    for mode, (reached, per_connection) in results.items():
+        print(f"{mode:<10} {reached:>12,} {per_connection:>11.1f}")
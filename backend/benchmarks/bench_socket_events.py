@@ -0,0 +1,89 @@
+"""Socket.IO event throughput with many authenticated connections.
+
+Seeds a throwaway SQLite database with --sockets users, connects one
+Socket.IO test client per user (each authenticating with its own JWT),
+pairs them up in chat rooms and then fires events from random sockets:
+typing indicators (resolved from the per-sid identity map alone) and
+chat messages (one INSERT and conversation update each). Reports
+connects/sec and events/sec for both, and checks that disconnecting
+empties the identity map.
+
+The test clients call the server's handlers in-process, so this measures
+the handler cost per event rather than network or transport overhead.
+
+    python benchmarks/bench_socket_events.py --sockets 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--sockets', type=int, default=5000)
+parser.add_argument('--events', type=int, default=20_000)
+parser.add_argument('--messages', type=int, default=2000)
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp(prefix='assemble-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+os.environ['MAIL_DISPATCHER'] = 'false'
+os.environ['COUNTER_RECONCILE_SECONDS'] = '0'
+os.environ['LOG_LEVEL'] = 'WARNING'
+os.environ['LOG_FILE'] = os.path.join(workdir, 'app.log')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from sqlalchemy import text
+from flask_jwt_extended import create_access_token
+from app import app, socketio
+from database import engine
+from socket_sessions import socket_registry
+
+def seed(connection):
+    connection.execute(text(
+        "INSERT INTO users (id, username, email, is_active) VALUES (:id, :u, :e, 1)"
+    ), [{"id": i, "u": f"user{i}", "e": f"user{i}@vitstudent.ac.in"} for i in range(1, args.sockets + 1)])
+
+def rate(count, seconds):
+    return f"{count / seconds:>10,.0f}/s"
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    rng = random.Random(42)
+    print(f"Seeding {args.sockets:,} users into {workdir} ...")
+    with engine.begin() as connection:
+        seed(connection)
+
+    with app.app_context():
+        tokens = [create_access_token(identity=f"user{i}") for i in range(1, args.sockets + 1)]
+
+    started = time.perf_counter()
+    clients = [socketio.test_client(app, auth={"token": token}) for token in tokens]
+    elapsed = time.perf_counter() - started
+    assert all(client.is_connected() for client in clients)
+    assert len(socket_registry) == args.sockets
+    print(f"connect        {args.sockets:>7,} sockets  {elapsed:6.2f} s  {rate(args.sockets, elapsed)}")
+
+    # Pair socket i with socket i + 1 (users i + 1 and i + 2)
+    pairs = [(index, index + 1) for index in range(0, args.sockets - 1, 2)]
+    for a, b in pairs:
+        clients[a].emit('join_chat', {"other_user_id": b + 1})
+        clients[b].emit('join_chat', {"other_user_id": a + 1})
+
+    def fire(event, count, payload):
+        started = time.perf_counter()
+        for _ in range(count):
+            a, b = rng.choice(pairs)
+            clients[a].emit(event, payload(b + 1))
+        elapsed = time.perf_counter() - started
+        print(f"{event:<14} {count:>7,} events   {elapsed:6.2f} s  {rate(count, elapsed)}")
+
+    fire('typing', args.events, lambda other: {"other_user_id": other, "is_typing": True})
+    fire('send_message', args.messages, lambda other: {"receiver_id": other, "content": "hello"})
+
+    for client in clients:
+        client.disconnect()
+    assert len(socket_registry) == 0, len(socket_registry)
+    print("identity map empty after disconnect")
@@ -0,0 +1,73 @@
+"""Latency of the find-teammates ranking over a large user base.
+
+Seeds a throwaway SQLite database with users, their skills and roles,
+builds the inverted skill/role index once and times candidate queries
+for random skill/role sets.
+
+    python benchmarks/bench_teammates.py --users 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--users', type=int, default=100_000)
+parser.add_argument('--repeat', type=int, default=200)
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp(prefix='assemble-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database import engine, init_db, Session, Skill, Role
+from matching import teammate_index
+
+def seed(connection, skill_ids, role_ids):
+    rng = random.Random(42)
+    connection.execute(text(
+        "INSERT INTO users (id, username, email, is_active, open_to_opportunities, availability) "
+        "VALUES (:id, :u, :e, 1, :o, :a)"
+    ), [{"id": i, "u": f"user{i}", "e": f"user{i}@vitstudent.ac.in", "o": rng.random() < 0.8,
+         "a": rng.choice(['available', 'available', 'busy', None])} for i in range(1, args.users + 1)])
+
+    connection.execute(text("INSERT INTO user_skills (user_id, skill_id) VALUES (:u, :s)"), [
+        {"u": i, "s": skill} for i in range(1, args.users + 1) for skill in rng.sample(skill_ids, rng.randint(1, 8))
+    ])
+    connection.execute(text("INSERT INTO user_roles (user_id, role_id) VALUES (:u, :r)"), [
+        {"u": i, "r": role} for i in range(1, args.users + 1) for role in rng.sample(role_ids, rng.randint(0, 3))
+    ])
+
+if __name__ == '__main__':
+    init_db()
+    session = Session()
+    skill_ids = [row[0] for row in session.query(Skill.id).all()]
+    role_ids = [row[0] for row in session.query(Role.id).all()]
+
+    print(f"Seeding {args.users:,} users into {workdir} ...")
+    with engine.begin() as connection:
+        seed(connection, skill_ids, role_ids)
+
+    started = time.perf_counter()
+    teammate_index.rebuild(session)
+    print(f"Index built in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    rng = random.Random(7)
+    timings = []
+    for _ in range(args.repeat):
+        skills = rng.sample(skill_ids, rng.randint(2, 6))
+        roles = rng.sample(role_ids, rng.randint(0, 2))
+        exclude = rng.sample(range(1, args.users + 1), 50)
+        page = rng.randint(0, 5)
+        started = time.perf_counter()
+        total, ranked = teammate_index.rank(session, skills, roles, availability={'available', ''},
+                                            exclude_user_ids=exclude, offset=page * 20, limit=20)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    print(f"rank() over {args.users:,} users: median {statistics.median(timings):.3f} ms   "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.3f} ms   (last total {total:,})")
+    session.close()
@@ -0,0 +1,143 @@
+"""Chat delivery across Socket.IO workers sharing a message queue.
+
+Starts the local TCP message broker and --workers app processes on
+consecutive ports, all on one throwaway SQLite database. Each pair of
+users is connected to two different workers: the first user sends a
+message over its socket and the check passes when the second user,
+connected elsewhere, receives it as new_message. Latency from emit to
+delivery is reported per pair.
+
+    python benchmarks/check_multiworker.py --workers 3
+
+Pass --queue redis://localhost:6379/0 to run the same check through a
+real Redis instead of the stand-in broker.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--workers', type=int, default=3)
+parser.add_argument('--base-port', type=int, default=5100)
+parser.add_argument('--broker-port', type=int, default=6390)
+parser.add_argument('--queue', help="message queue URL; defaults to the local broker")
+parser.add_argument('--timeout', type=float, default=10)
+parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+def serve(port):
+    """Worker mode: run the app on a port with the queue from the environment"""
+    from app import app, socketio
+    socketio.run(app, host='127.0.0.1', port=port, allow_unsafe_werkzeug=True)
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout:.0f}s")
+
+def run_check():
+    workdir = tempfile.mkdtemp(prefix='assemble-bench-')
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        MAIL_DISPATCHER='false',
+        COUNTER_RECONCILE_SECONDS='0',
+        LOG_LEVEL='WARNING',
+        LOG_FILE=os.path.join(workdir, 'app.log'),
+    )
+    os.environ.update(env)
+    os.environ.pop('SOCKETIO_MESSAGE_QUEUE', None)
+
+    # Importing the app here creates the schema before the workers start
+    import socketio as socketio_client
+    from sqlalchemy import text
+    from flask_jwt_extended import create_access_token
+    from app import app
+    from database import engine
+
+    pairs = [(index, (index + 1) % args.workers) for index in range(args.workers)]
+    usernames = [f"user{i}" for i in range(1, 2 * len(pairs) + 1)]
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, username, email, is_active) VALUES (:id, :u, :e, 1)"
+        ), [{"id": i, "u": name, "e": f"{name}@vitstudent.ac.in"} for i, name in enumerate(usernames, start=1)])
+    with app.app_context():
+        tokens = [create_access_token(identity=name) for name in usernames]
+
+    processes = []
+    queue_url = args.queue
+    try:
+        if queue_url is None:
+            queue_url = f"tcp://127.0.0.1:{args.broker_port}"
+            processes.append(subprocess.Popen(
+                [sys.executable, 'message_queue.py', '--port', str(args.broker_port)], cwd=backend_dir, env=env
+            ))
+            wait_for_port(args.broker_port, args.timeout)
+
+        ports = [args.base_port + index for index in range(args.workers)]
+        for port in ports:
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--serve', str(port)],
+                cwd=backend_dir, env=dict(env, SOCKETIO_MESSAGE_QUEUE=queue_url)
+            ))
+        for port in ports:
+            wait_for_port(port, args.timeout * 3)
+        print(f"{args.workers} workers on ports {ports[0]}-{ports[-1]}, queue {queue_url or 'none'}")
+
+        failures = 0
+        for pair_index, (sender_worker, receiver_worker) in enumerate(pairs):
+            sender_id, receiver_id = 2 * pair_index + 1, 2 * pair_index + 2
+            received = threading.Event()
+            latency = {}
+
+            sender = socketio_client.Client()
+            receiver = socketio_client.Client()
+
+            @receiver.on('new_message')
+            def on_new_message(message):
+                if message['sender_id'] == sender_id:
+                    latency['ms'] = (time.perf_counter() - latency['sent']) * 1000
+                    received.set()
+
+            receiver.connect(f"http://127.0.0.1:{ports[receiver_worker]}", auth={"token": tokens[receiver_id - 1]})
+            sender.connect(f"http://127.0.0.1:{ports[sender_worker]}", auth={"token": tokens[sender_id - 1]})
+            # call() waits for the server to acknowledge the join
+            receiver.call('join_chat', {"other_user_id": sender_id}, timeout=args.timeout)
+            sender.call('join_chat', {"other_user_id": receiver_id}, timeout=args.timeout)
+
+            latency['sent'] = time.perf_counter()
+            sender.emit('send_message', {"receiver_id": receiver_id, "content": f"hello from worker {sender_worker}"})
+            ok = received.wait(args.timeout)
+            failures += not ok
+            detail = f"{latency['ms']:.1f} ms" if ok else "NOT DELIVERED"
+            print(f"user{sender_id}@worker{sender_worker} -> user{receiver_id}@worker{receiver_worker}: {detail}")
+
+            sender.disconnect()
+            receiver.disconnect()
+
+        print("PASS" if not failures else f"FAIL ({failures} of {len(pairs)} messages lost)")
+        return failures
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+if __name__ == '__main__':
+    if args.serve:
+        serve(args.serve)
+    else:
+        sys.exit(1 if run_check() else 0)
@@ -0,0 +1,38 @@
+from sqlalchemy import update
+
+# Mass flag and status changes (mark all read, requeue, claim) run as one
+# UPDATE ... WHERE in the caller's transaction instead of loading every
+# matching row into the session and flipping it in Python. The helpers
+# return the number of rows the database reports as changed.
+#
+# Objects already loaded in the session are not refreshed unless the
+# caller asks for synchronize_session='evaluate', which applies the new
+# values to matching objects in the identity map without loading others.
+
+def bulk_update(session, model, values, *conditions, synchronize_session=False):
+    """UPDATE model SET values WHERE conditions; returns the affected row count"""
+    statement = update(model).where(*conditions).values(values).execution_options(
+        synchronize_session=synchronize_session
+    )
+    return session.execute(statement).rowcount
+
+def mark_read(session, model, *conditions, synchronize_session=False):
+    """Set is_read on the unread rows matching conditions; returns how many changed"""
+    return bulk_update(
+        session, model, {model.is_read: True}, model.is_read == False, *conditions,
+        synchronize_session=synchronize_session
+    )
+
+def set_status(session, model, new_status, *conditions, from_status=None, values=None, synchronize_session=False):
+    """Move rows matching conditions (and in from_status, if given) to new_status.
+
+    from_status may be a single status or a collection of them. Extra
+    column values are applied in the same statement.
+    """
+    if from_status is not None:
+        statuses = [from_status] if isinstance(from_status, str) else list(from_status)
+        conditions = (model.status.in_(statuses),) + conditions
+    changes = {model.status: new_status}
+    if values:
+        changes.update(values)
+    return bulk_update(session, model, changes, *conditions, synchronize_session=synchronize_session)
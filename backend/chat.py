@@ -1,8 +1,16 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, decode_token
 from datetime import datetime
 from database import Session, User, Message
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from identity import get_current_user_id, resolve_user_id
+from socket_sessions import socket_registry, SocketIdentity, chat_room
+from conversations import (
+    record_message, mark_conversation_read, get_conversation, is_message_read, get_inbox, get_unread_total
+)
+from pagination import encode_cursor, decode_cursor, get_cursor_args, cursor_page
+from autocomplete import user_autocomplete
+from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect, ConnectionRefusedError
+from jwt import ExpiredSignatureError
 import logging
 
 chat_bp = Blueprint('chat', __name__, url_prefix='/api/chat')
@@ -11,89 +19,186 @@ logger = logging.getLogger(__name__)
 # This will be initialized in app.py
 socketio = None
 
+# Limits for the user search dropdown
+SEARCH_QUERY_MAX_LENGTH = 64
+SEARCH_RESULTS_MAX = 20
+SEARCH_BIO_MAX_LENGTH = 160
+
+def _socket_token(auth):
+    """JWT sent by the client in the Socket.IO auth payload or ?token="""
+    if isinstance(auth, dict) and auth.get('token'):
+        return auth['token']
+    return request.args.get('token')
+
+def _socket_error(code, message):
+    """Payload sent back to the client when a socket event is rejected"""
+    return {"error": message, "code": code}
+
+def _socket_identity():
+    """Identity of the socket behind the current event, or None if it isn't authenticated"""
+    identity = socket_registry.get(request.sid)
+    if identity is None:
+        return None
+    if identity.is_expired():
+        logger.info("Socket token for user %s expired, disconnecting", identity.user_id)
+        # Say why before dropping the socket so the client can refresh its
+        # token and reconnect; an ack would never arrive after disconnect()
+        emit('chat_error', _socket_error('TOKEN_EXPIRED', 'Token has expired'))
+        disconnect()
+        return None
+    return identity
+
+def _other_user_id(data, key):
+    """Integer user id from the payload, or None if it isn't one"""
+    value = data.get(key) if isinstance(data, dict) else None
+    # int() would quietly turn True into 1 and truncate 2.5
+    if isinstance(value, (bool, float)):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _active_user(session, user_id):
+    return session.query(User).filter_by(id=user_id, is_active=True).first()
+
 def init_socketio(app_socketio):
     global socketio
     socketio = app_socketio
     
     # Register socket event handlers
+    @socketio.on('connect')
+    def on_connect(auth=None):
+        """Authenticate the socket once from its JWT"""
+        token = _socket_token(auth)
+        if not token:
+            raise ConnectionRefusedError('Authorization token is required')
+        
+        try:
+            claims = decode_token(token)
+        except ExpiredSignatureError:
+            # Same message as the REST API so the client knows to refresh
+            raise ConnectionRefusedError('Token has expired')
+        except Exception as e:
+            logger.warning("Socket connection with invalid token: %s", e)
+            raise ConnectionRefusedError('Invalid token')
+        
+        if claims.get('type') != 'access':
+            raise ConnectionRefusedError('Invalid token')
+        
+        username = claims['sub']
+        try:
+            user_id = resolve_user_id(username)
+        finally:
+            Session.remove()
+        if user_id is None:
+            raise ConnectionRefusedError('User not found')
+        
+        socket_registry.add(request.sid, SocketIdentity(user_id, username, claims.get('exp', float('inf'))))
+        logger.debug("User %s connected socket %s", user_id, request.sid)
+
+    @socketio.on('disconnect')
+    def on_disconnect():
+        identity = socket_registry.remove(request.sid)
+        if identity is not None:
+            logger.debug("User %s disconnected socket %s", identity.user_id, request.sid)
+
     @socketio.on('join_chat')
     def on_join_chat(data):
         """Join a chat room for real-time messaging"""
         try:
-            user_id = data.get('user_id')
-            other_user_id = data.get('other_user_id')
+            identity = _socket_identity()
+            other_user_id = _other_user_id(data, 'other_user_id')
             
-            if not user_id or not other_user_id:
-                return
+            if identity is None:
+                return _socket_error('UNAUTHORIZED', 'Not authenticated')
+            if not other_user_id:
+                return _socket_error('INVALID_REQUEST', 'Other user ID must be an integer')
             
-            # Create a consistent room name for both users
-            room = f"chat_{min(user_id, other_user_id)}_{max(user_id, other_user_id)}"
+            # Rooms come from the authenticated user, never from the payload
+            room = chat_room(identity.user_id, other_user_id)
             join_room(room)
+            socket_registry.join(request.sid, room)
             
-            logger.info(f"User {user_id} joined chat room {room}")
+            logger.info("User %s joined chat room %s", identity.user_id, room)
             
         except Exception as e:
-            logger.error(f"Error joining chat room: {str(e)}")
+            logger.error("Error joining chat room: %s", e)
+            return _socket_error('SERVER_ERROR', 'Something went wrong')
 
     @socketio.on('leave_chat')
     def on_leave_chat(data):
         """Leave a chat room"""
         try:
-            user_id = data.get('user_id')
-            other_user_id = data.get('other_user_id')
+            identity = _socket_identity()
+            other_user_id = _other_user_id(data, 'other_user_id')
             
-            if not user_id or not other_user_id:
-                return
+            if identity is None:
+                return _socket_error('UNAUTHORIZED', 'Not authenticated')
+            if not other_user_id:
+                return _socket_error('INVALID_REQUEST', 'Other user ID must be an integer')
             
-            room = f"chat_{min(user_id, other_user_id)}_{max(user_id, other_user_id)}"
+            room = chat_room(identity.user_id, other_user_id)
             leave_room(room)
+            socket_registry.leave(request.sid, room)
             
-            logger.info(f"User {user_id} left chat room {room}")
+            logger.info("User %s left chat room %s", identity.user_id, room)
             
         except Exception as e:
-            logger.error(f"Error leaving chat room: {str(e)}")
+            logger.error("Error leaving chat room: %s", e)
+            return _socket_error('SERVER_ERROR', 'Something went wrong')
 
     @socketio.on('send_message')
     def on_send_message(data):
-        """Handle real-time message sending"""
+        """Handle real-time message sending; the ack carries the message or the error"""
+        identity = _socket_identity()
+        if identity is None:
+            return _socket_error('UNAUTHORIZED', 'Not authenticated')
+        
+        if not isinstance(data, dict) or not data.get('receiver_id') or not (data.get('content') or '').strip():
+            return _socket_error('INVALID_REQUEST', 'Receiver ID and content are required')
+        
+        receiver_id = _other_user_id(data, 'receiver_id')
+        if receiver_id is None:
+            return _socket_error('INVALID_REQUEST', 'Receiver ID must be an integer')
+        
+        if receiver_id == identity.user_id:
+            return _socket_error('INVALID_REQUEST', 'Cannot send message to yourself')
+        
         session = Session()
         try:
-            sender_id = data.get('sender_id')
-            receiver_id = data.get('receiver_id')
-            content = data.get('content', '').strip()
-            
-            if not sender_id or not receiver_id or not content:
-                return
+            if not _active_user(session, receiver_id):
+                return _socket_error('NOT_FOUND', 'Receiver not found')
             
             # Save message to database
             message = Message(
-                sender_id=sender_id,
+                sender_id=identity.user_id,
                 receiver_id=receiver_id,
-                content=content
+                content=data['content'].strip()
             )
             session.add(message)
+            record_message(session, message)
             session.commit()
             
-            # Create room name
-            room = f"chat_{min(sender_id, receiver_id)}_{max(sender_id, receiver_id)}"
-            
             # Emit message to room
             message_data = {
                 "id": message.id,
                 "content": message.content,
                 "sender_id": message.sender_id,
                 "receiver_id": message.receiver_id,
-                "is_read": message.is_read,
+                "is_read": False,
                 "created_at": message.created_at.isoformat(),
                 "is_own": False  # Will be determined by client
             }
             
-            emit('new_message', message_data, room=room)
-            logger.info(f"Message sent from {sender_id} to {receiver_id}")
+            emit('new_message', message_data, room=chat_room(identity.user_id, receiver_id))
+            logger.info("Message sent from %s to %s", identity.user_id, receiver_id)
+            return {"message": message_data}
             
         except Exception as e:
             session.rollback()
-            logger.error(f"Error sending message: {str(e)}")
+            logger.error("Error sending message: %s", e)
+            return _socket_error('SERVER_ERROR', 'Failed to send message')
         finally:
             session.close()
 
@@ -101,95 +206,89 @@ def init_socketio(app_socketio):
     def on_typing(data):
         """Handle typing indicators"""
         try:
-            user_id = data.get('user_id')
-            other_user_id = data.get('other_user_id')
-            is_typing = data.get('is_typing', False)
-            
-            if not user_id or not other_user_id:
-                return
+            identity = _socket_identity()
+            other_user_id = _other_user_id(data, 'other_user_id')
+            is_typing = bool(data.get('is_typing', False))
             
-            room = f"chat_{min(user_id, other_user_id)}_{max(user_id, other_user_id)}"
+            if identity is None:
+                return _socket_error('UNAUTHORIZED', 'Not authenticated')
+            if not other_user_id:
+                return _socket_error('INVALID_REQUEST', 'Other user ID must be an integer')
             
             emit('user_typing', {
-                'user_id': user_id,
+                'user_id': identity.user_id,
                 'is_typing': is_typing
-            }, room=room, include_self=False)
+            }, room=chat_room(identity.user_id, other_user_id), include_self=False)
             
         except Exception as e:
-            logger.error(f"Error handling typing indicator: {str(e)}")
+            logger.error("Error handling typing indicator: %s", e)
+            return _socket_error('SERVER_ERROR', 'Something went wrong')
 
 @chat_bp.route('/conversations', methods=['GET'])
 @jwt_required()
 def get_conversations():
     session = Session()
     try:
-        current_username = get_jwt_identity()
-        current_user = session.query(User).filter_by(username=current_username).first()
-        if current_user is None:
+        current_user_id = get_current_user_id()
+        if current_user_id is None:
             return jsonify({"error": "User not found"}), 404
-
-        # Use current_user throughout:
-        user = current_user
-
         
-        # Get all unique users the current user has chatted with
-        sent_messages = session.query(Message.receiver_id).filter_by(sender_id=user.id).distinct().all()
-        received_messages = session.query(Message.sender_id).filter_by(receiver_id=user.id).distinct().all()
+        # Passing cursor or limit switches to incremental (keyset) loading
+        paginated = 'cursor' in request.args or 'limit' in request.args
+        limit = min(request.args.get('limit', 20, type=int), 100) if paginated else None
         
-        # Combine and get unique user IDs
-        user_ids = set()
-        for msg in sent_messages:
-            user_ids.add(msg[0])
-        for msg in received_messages:
-            user_ids.add(msg[0])
+        cursor = None
+        if request.args.get('cursor'):
+            try:
+                cursor = decode_cursor(request.args['cursor'])
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
         
-        # Remove current user from the list
-        user_ids.discard(user.id)
+        # Fetch one extra row to know whether another page exists
+        rows = get_inbox(session, current_user_id, limit=limit + 1 if limit else None, cursor=cursor)
+        has_more = bool(limit) and len(rows) > limit
+        if has_more:
+            rows = rows[:limit]
         
         conversations = []
-        for user_id in user_ids:
-            # Get the last message between current user and this user
-            last_message = session.query(Message).filter(
-                ((Message.sender_id == user.id) & (Message.receiver_id == user_id)) |
-                ((Message.sender_id == user_id) & (Message.receiver_id == user.id))
-            ).order_by(Message.created_at.desc()).first()
-            
-            if last_message:
-                # Get user info
-                chat_user = session.query(User).filter_by(id=user_id).first()
-                if chat_user:
-                    # Count unread messages from this user
-                    unread_count = session.query(Message).filter_by(
-                        sender_id=user_id,
-                        receiver_id=user.id,
-                        is_read=False
-                    ).count()
-                    
-                    conversations.append({
-                        "user": {
-                            "id": chat_user.id,
-                            "username": chat_user.username,
-                            "full_name": chat_user.full_name,
-                            "avatar_url": chat_user.avatar_url
-                        },
-                        "last_message": {
-                            "id": last_message.id,
-                            "content": last_message.content,
-                            "sender_id": last_message.sender_id,
-                            "receiver_id": last_message.receiver_id,
-                            "created_at": last_message.created_at.isoformat(),
-                            "is_read": last_message.is_read
-                        },
-                        "unread_count": unread_count
-                    })
-        
-        # Sort conversations by last message time
-        conversations.sort(key=lambda x: x["last_message"]["created_at"], reverse=True)
-        
-        return jsonify(conversations), 200
+        for conversation, last_message, chat_user, unread_count in rows:
+            conversations.append({
+                "user": {
+                    "id": chat_user.id,
+                    "username": chat_user.username,
+                    "full_name": chat_user.full_name,
+                    "avatar_url": chat_user.avatar_url
+                },
+                "last_message": {
+                    "id": last_message.id,
+                    "content": last_message.content,
+                    "sender_id": last_message.sender_id,
+                    "receiver_id": last_message.receiver_id,
+                    "created_at": last_message.created_at.isoformat(),
+                    "is_read": is_message_read(last_message, conversation)
+                },
+                "unread_count": unread_count or 0
+            })
+        
+        if not paginated:
+            return jsonify(conversations), 200
+        
+        next_cursor = None
+        if has_more:
+            last_conversation = rows[-1][0]
+            next_cursor = encode_cursor(last_conversation.last_activity, last_conversation.id)
+        
+        return jsonify({
+            "conversations": conversations,
+            "pagination": {
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "has_more": has_more
+            }
+        }), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch conversations: {str(e)}")
+        logger.error("Failed to fetch conversations: %s", e)
         return jsonify({"error": "Failed to fetch conversations"}), 500
     finally:
         session.close()
@@ -199,43 +298,49 @@ def get_conversations():
 def get_messages(user_id):
     session = Session()
     try:
-        current_username = get_jwt_identity()
-        current_user = session.query(User).filter_by(username=current_username).first()
-        if current_user is None:
+        current_user_id = get_current_user_id()
+        if current_user_id is None:
             return jsonify({"error": "User not found"}), 404
-
-        # Use current_user throughout:
-        user = current_user
         
         # Get query parameters
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 50, type=int), 100)
         
+        try:
+            cursor_mode, cursor, include_total = get_cursor_args()
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        
         # Get messages between current user and specified user
         query = session.query(Message).filter(
-            ((Message.sender_id == user.id) & (Message.receiver_id == user_id)) |
-            ((Message.sender_id == user_id) & (Message.receiver_id == user.id))
+            ((Message.sender_id == current_user_id) & (Message.receiver_id == user_id)) |
+            ((Message.sender_id == user_id) & (Message.receiver_id == current_user_id))
         )
         
-        # Get total count
-        total = query.count()
-        
-        # Apply pagination (newest first)
-        offset = (page - 1) * per_page
-        messages = query.order_by(Message.created_at.desc()).offset(offset).limit(per_page).all()
-        
-        # Mark messages from the other user as read
-        unread_messages = session.query(Message).filter_by(
-            sender_id=user_id,
-            receiver_id=user.id,
-            is_read=False
-        ).all()
+        if cursor_mode:
+            # Each cursor step loads the next-older page of history
+            messages, pagination = cursor_page(query, Message.created_at, Message.id, cursor, per_page, include_total)
+        else:
+            # Get total count
+            total = query.count()
+            
+            # Apply pagination (newest first)
+            offset = (page - 1) * per_page
+            messages = query.order_by(Message.created_at.desc()).offset(offset).limit(per_page).all()
+            pagination = {
+                "page": page,
+                "per_page": per_page,
+                "total": total,
+                "pages": (total + per_page - 1) // per_page
+            }
         
-        for message in unread_messages:
-            message.is_read = True
+        # Both watermarks for is_read; on a GET this may be a replica read
+        conversation = get_conversation(session, current_user_id, user_id)
         
-        if unread_messages:
-            session.commit()
+        # Mark what this page showed from the other user as read; messages
+        # that arrived since stay unread
+        shown_ids = [message.id for message in messages if message.receiver_id == current_user_id]
+        updated = mark_conversation_read(session, current_user_id, user_id, max(shown_ids)) if shown_ids else 0
         
         # Serialize messages
         messages_data = []
@@ -245,23 +350,23 @@ def get_messages(user_id):
                 "content": message.content,
                 "sender_id": message.sender_id,
                 "receiver_id": message.receiver_id,
-                "is_read": message.is_read,
+                # Everything addressed to the reader on this page was just marked read
+                "is_read": message.receiver_id == current_user_id or is_message_read(message, conversation),
                 "created_at": message.created_at.isoformat(),
-                "is_own": message.sender_id == user.id
+                "is_own": message.sender_id == current_user_id
             })
         
+        if updated:
+            session.commit()
+        
         return jsonify({
             "messages": messages_data,
-            "pagination": {
-                "page": page,
-                "per_page": per_page,
-                "total": total,
-                "pages": (total + per_page - 1) // per_page
-            }
+            "pagination": pagination
         }), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch messages: {str(e)}")
+        session.rollback()
+        logger.error("Failed to fetch messages: %s", e)
         return jsonify({"error": "Failed to fetch messages"}), 500
     finally:
         session.close()
@@ -271,13 +376,9 @@ def get_messages(user_id):
 def send_message():
     session = Session()
     try:
-        current_username = get_jwt_identity()
-        current_user = session.query(User).filter_by(username=current_username).first()
-        if current_user is None:
+        current_user_id = get_current_user_id()
+        if current_user_id is None:
             return jsonify({"error": "User not found"}), 404
-
-        # Use current_user throughout:
-        user = current_user
         
         data = request.get_json()
         
@@ -287,23 +388,29 @@ def send_message():
         if not receiver_id or not content:
             return jsonify({"error": "Receiver ID and content are required"}), 400
         
+        try:
+            receiver_id = int(receiver_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Receiver ID must be an integer"}), 400
+        
         # Check if receiver exists
-        receiver = session.query(User).filter_by(id=receiver_id).first()
+        receiver = _active_user(session, receiver_id)
         if not receiver:
             return jsonify({"error": "Receiver not found"}), 404
         
         # Don't allow sending messages to self
-        if int(receiver_id) == user.id:
+        if receiver_id == current_user_id:
             return jsonify({"error": "Cannot send message to yourself"}), 400
         
         # Create message
         message = Message(
-            sender_id=user.id,
+            sender_id=current_user_id,
             receiver_id=receiver_id,
             content=content
         )
         
         session.add(message)
+        record_message(session, message)
         session.commit()
         
         # Return the created message
@@ -312,7 +419,7 @@ def send_message():
             "content": message.content,
             "sender_id": message.sender_id,
             "receiver_id": message.receiver_id,
-            "is_read": message.is_read,
+            "is_read": False,
             "created_at": message.created_at.isoformat(),
             "is_own": True
         }
@@ -321,7 +428,7 @@ def send_message():
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to send message: {str(e)}")
+        logger.error("Failed to send message: %s", e)
         return jsonify({"error": "Failed to send message"}), 500
     finally:
         session.close()
@@ -331,39 +438,48 @@ def send_message():
 def search_users():
     session = Session()
     try:
-        current_username = get_jwt_identity()
-        current_user = session.query(User).filter_by(username=current_username).first()
-        if current_user is None:
+        current_user_id = get_current_user_id()
+        if current_user_id is None:
             return jsonify({"error": "User not found"}), 404
-
-        # Use current_user throughout:
-        user = current_user
         
-        query = request.args.get('q', '').strip()
+        query = request.args.get('q', '').strip()[:SEARCH_QUERY_MAX_LENGTH]
+        limit = min(max(request.args.get('limit', 10, type=int), 1), SEARCH_RESULTS_MAX)
         
         if not query:
             return jsonify([]), 200
         
-        # Search users by username or full name
-        users = session.query(User).filter(
-            (User.username.ilike(f'%{query}%')) |
-            (User.full_name.ilike(f'%{query}%'))
-        ).filter(User.id != user.id).filter(User.is_active == True).limit(10).all()
+        # Exact and prefix hits on username/full name first, then fuzzy matches
+        user_ids = user_autocomplete.search(session, query, limit=limit, exclude_user_id=current_user_id)
+        
+        if not user_ids:
+            return jsonify([]), 200
+        
+        # Only the fields the search dropdown needs; ?fields=bio adds a trimmed bio
+        include_bio = 'bio' in request.args.get('fields', '').split(',')
+        columns = [User.id, User.username, User.full_name, User.avatar_url]
+        if include_bio:
+            columns.append(User.bio)
+        users_by_id = {row.id: row for row in session.query(*columns).filter(User.id.in_(user_ids)).all()}
         
         users_data = []
-        for search_user in users:
-            users_data.append({
+        for user_id in user_ids:
+            search_user = users_by_id.get(user_id)
+            if search_user is None:
+                continue
+            user_data = {
                 "id": search_user.id,
                 "username": search_user.username,
                 "full_name": search_user.full_name,
-                "avatar_url": search_user.avatar_url,
-                "bio": search_user.bio
-            })
+                "avatar_url": search_user.avatar_url
+            }
+            if include_bio:
+                user_data["bio"] = search_user.bio[:SEARCH_BIO_MAX_LENGTH] if search_user.bio else None
+            users_data.append(user_data)
         
         return jsonify(users_data), 200
         
     except Exception as e:
-        logger.error(f"Failed to search users: {str(e)}")
+        logger.error("Failed to search users: %s", e)
         return jsonify({"error": "Failed to search users"}), 500
     finally:
         session.close()
@@ -373,23 +489,16 @@ def search_users():
 def get_unread_count():
     session = Session()
     try:
-        current_username = get_jwt_identity()
-        current_user = session.query(User).filter_by(username=current_username).first()
-        if current_user is None:
+        current_user_id = get_current_user_id()
+        if current_user_id is None:
             return jsonify({"error": "User not found"}), 404
-
-        # Use current_user throughout:
-        user = current_user
         
-        unread_count = session.query(Message).filter_by(
-            receiver_id=user.id,
-            is_read=False
-        ).count()
+        unread_count = get_unread_total(session, current_user_id)
         
         return jsonify({"unread_count": unread_count}), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch unread count: {str(e)}")
+        logger.error("Failed to fetch unread count: %s", e)
         return jsonify({"error": "Failed to fetch unread count"}), 500
     finally:
         session.close()
\ No newline at end of file
@@ -0,0 +1,295 @@
+from sqlalchemy import case, func, select, and_, or_, inspect, text, Table, MetaData
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import IntegrityError
+from database import Session, Conversation, Message, User, init_db
+from pagination import keyset_before
+import logging
+
+logger = logging.getLogger(__name__)
+
+def conversation_pair(user_id, other_user_id):
+    """Return the unordered pair key (low, high) for two users"""
+    return min(user_id, other_user_id), max(user_id, other_user_id)
+
+def record_message(session, message):
+    """Update the conversation summary for a message added to the session.
+
+    Runs inside the caller's transaction, so the message and its summary
+    row are committed (or rolled back) together.
+    """
+    sender_id, receiver_id = int(message.sender_id), int(message.receiver_id)
+    if sender_id == receiver_id:
+        return
+
+    # Make sure the message has its id and created_at
+    session.flush()
+
+    low, high = conversation_pair(sender_id, receiver_id)
+
+    if _advance_summary(session, low, high, message):
+        return
+
+    try:
+        with session.begin_nested():
+            conversation = Conversation(
+                user_low_id=low,
+                user_high_id=high,
+                last_message_id=message.id,
+                last_activity=message.created_at
+            )
+            session.add(conversation)
+    except IntegrityError:
+        # The row already exists: another writer created it first, or it
+        # already points at a newer message
+        _advance_summary(session, low, high, message)
+
+def _advance_summary(session, low, high, message):
+    """Point the pair's summary at message unless it already shows a newer one.
+
+    Concurrent senders can commit out of id order; the guard keeps a late
+    commit of an older message from rolling the preview and sort order
+    back, the same way mark_conversation_read only moves forward.
+    """
+    return session.query(Conversation).filter(
+        Conversation.user_low_id == low,
+        Conversation.user_high_id == high,
+        or_(Conversation.last_message_id.is_(None), Conversation.last_message_id < message.id)
+    ).update({
+        Conversation.last_message_id: message.id,
+        Conversation.last_activity: message.created_at
+    }, synchronize_session=False)
+
+def _watermark_column(user_id, low):
+    return Conversation.low_last_read_message_id if user_id == low else Conversation.high_last_read_message_id
+
+def get_conversation(session, user_id, other_user_id):
+    low, high = conversation_pair(user_id, other_user_id)
+    return session.query(Conversation).filter_by(user_low_id=low, user_high_id=high).first()
+
+def mark_conversation_read(session, user_id, other_user_id, up_to_message_id):
+    """Move user_id's read watermark up to up_to_message_id.
+
+    Pass the newest message the user was actually shown: anything that
+    arrived after it stays unread. One statement however many messages
+    it covers; the watermark only moves forward. Returns 1 if it moved,
+    0 if it was already there.
+    """
+    low, high = conversation_pair(user_id, other_user_id)
+    watermark = _watermark_column(user_id, low)
+
+    return session.query(Conversation).filter(
+        Conversation.user_low_id == low,
+        Conversation.user_high_id == high,
+        watermark < up_to_message_id
+    ).update({watermark: up_to_message_id}, synchronize_session=False)
+
+def is_message_read(message, conversation):
+    """Whether the receiver's watermark has passed a message"""
+    if conversation is None:
+        return False
+    if message.receiver_id == conversation.user_low_id:
+        return message.id <= conversation.low_last_read_message_id
+    return message.id <= conversation.high_last_read_message_id
+
+def _unread_count(user_id, partner_id, watermark):
+    """Correlated count of the partner's messages above the user's watermark"""
+    unread = aliased(Message)
+    return select(func.count(unread.id)).where(
+        unread.sender_id == partner_id,
+        unread.receiver_id == user_id,
+        unread.id > watermark
+    ).correlate(Conversation).scalar_subquery()
+
+def get_inbox(session, user_id, limit=None, cursor=None):
+    """Return (conversation, last_message, partner, unread_count) rows, newest first"""
+    is_low = Conversation.user_low_id == user_id
+    partner_id = case((is_low, Conversation.user_high_id), else_=Conversation.user_low_id)
+    watermark = case((is_low, Conversation.low_last_read_message_id), else_=Conversation.high_last_read_message_id)
+
+    query = session.query(Conversation, Message, User, _unread_count(user_id, partner_id, watermark)).join(
+        Message, Message.id == Conversation.last_message_id
+    ).join(
+        User, User.id == partner_id
+    ).filter(
+        (Conversation.user_low_id == user_id) | (Conversation.user_high_id == user_id)
+    )
+
+    if cursor:
+        query = query.filter(keyset_before(Conversation.last_activity, Conversation.id, cursor))
+
+    query = query.order_by(Conversation.last_activity.desc(), Conversation.id.desc())
+
+    if limit:
+        query = query.limit(limit)
+
+    return query.all()
+
+def get_unread_total(session, user_id):
+    """Total unread messages for a user, summed over their conversations"""
+    total = 0
+    for side, partner, watermark in (
+        (Conversation.user_low_id, Conversation.user_high_id, Conversation.low_last_read_message_id),
+        (Conversation.user_high_id, Conversation.user_low_id, Conversation.high_last_read_message_id),
+    ):
+        total += session.query(func.count(Message.id)).select_from(Conversation).join(
+            Message,
+            and_(Message.sender_id == partner, Message.receiver_id == user_id, Message.id > watermark)
+        ).filter(side == user_id).scalar()
+    return total
+
+def _has_legacy_read_flags(connection):
+    return 'is_read' in {column['name'] for column in inspect(connection).get_columns('messages')}
+
+def legacy_watermarks(connection):
+    """{(reader_id, sender_id): watermark} from the per-message is_read flags.
+
+    A reader has read a sender's messages up to just before the first
+    unread one, or all of the flagged ones if none is unread. Messages
+    written since the flags were retired have is_read NULL; they say
+    nothing either way, so they neither lower nor raise the watermark.
+    """
+    rows = connection.execute(text(
+        "SELECT receiver_id, sender_id, "
+        "MAX(CASE WHEN is_read IS NOT NULL THEN id END), MIN(CASE WHEN NOT is_read THEN id END) "
+        "FROM messages WHERE sender_id != receiver_id GROUP BY receiver_id, sender_id"
+    )).all()
+    return {
+        (reader_id, sender_id): first_unread - 1 if first_unread is not None else last_flagged_id
+        for reader_id, sender_id, last_flagged_id, first_unread in rows
+        if last_flagged_id is not None
+    }
+
+def rebuild_conversations(session):
+    """Rebuild the conversations table from the existing Message rows.
+
+    Read watermarks of existing rows are kept; pairs without one start
+    from the legacy is_read flags when the database still has them.
+    """
+    low = case((Message.sender_id < Message.receiver_id, Message.sender_id), else_=Message.receiver_id)
+    high = case((Message.sender_id < Message.receiver_id, Message.receiver_id), else_=Message.sender_id)
+
+    last_ids = session.query(
+        low.label('user_low_id'),
+        high.label('user_high_id'),
+        func.max(Message.id).label('last_message_id')
+    ).filter(
+        Message.sender_id != Message.receiver_id
+    ).group_by(low, high).subquery()
+
+    pairs = session.query(
+        last_ids.c.user_low_id,
+        last_ids.c.user_high_id,
+        last_ids.c.last_message_id,
+        Message.created_at
+    ).join(Message, Message.id == last_ids.c.last_message_id).all()
+
+    connection = session.connection()
+    watermarks = legacy_watermarks(connection) if _has_legacy_read_flags(connection) else {}
+    for user_low_id, user_high_id, low_watermark, high_watermark in session.query(
+        Conversation.user_low_id,
+        Conversation.user_high_id,
+        Conversation.low_last_read_message_id,
+        Conversation.high_last_read_message_id
+    ).all():
+        watermarks[(user_low_id, user_high_id)] = low_watermark
+        watermarks[(user_high_id, user_low_id)] = high_watermark
+
+    session.query(Conversation).delete(synchronize_session=False)
+
+    rows = []
+    for user_low_id, user_high_id, last_message_id, last_activity in pairs:
+        rows.append({
+            "user_low_id": user_low_id,
+            "user_high_id": user_high_id,
+            "last_message_id": last_message_id,
+            "last_activity": last_activity,
+            "low_last_read_message_id": watermarks.get((user_low_id, user_high_id), 0),
+            "high_last_read_message_id": watermarks.get((user_high_id, user_low_id), 0)
+        })
+
+    if rows:
+        session.bulk_insert_mappings(Conversation, rows)
+
+    session.commit()
+    return len(rows)
+
+def add_read_watermarks(connection):
+    """Migration step: replace the unread counters with read watermarks.
+
+    Adds the watermark columns, fills them from the messages' is_read
+    flags and drops the old counter columns and the index on is_read.
+    The is_read column itself is left in place but no longer written.
+    """
+    inspector = inspect(connection)
+    if not inspector.has_table('conversations'):
+        return 0
+
+    existing = {column['name'] for column in inspector.get_columns('conversations')}
+    added = 0
+    for column in ('low_last_read_message_id', 'high_last_read_message_id'):
+        if column not in existing:
+            connection.execute(text(f"ALTER TABLE conversations ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+            logger.info("Added conversations.%s", column)
+            added += 1
+
+    if added and _has_legacy_read_flags(connection):
+        watermarks = legacy_watermarks(connection)
+        pairs = connection.execute(select(Conversation.user_low_id, Conversation.user_high_id)).all()
+        updates = [
+            {
+                "low": low,
+                "high": high,
+                "low_watermark": watermarks.get((low, high), 0),
+                "high_watermark": watermarks.get((high, low), 0)
+            }
+            for low, high in pairs
+        ]
+        if updates:
+            connection.execute(text(
+                "UPDATE conversations SET low_last_read_message_id = :low_watermark, "
+                "high_last_read_message_id = :high_watermark "
+                "WHERE user_low_id = :low AND user_high_id = :high"
+            ), updates)
+        logger.info("Set read watermarks on %s conversations from is_read flags", len(updates))
+
+    for column in ('low_unread_count', 'high_unread_count'):
+        if column in existing:
+            connection.execute(text(f"ALTER TABLE conversations DROP COLUMN {column}"))
+            logger.info("Dropped conversations.%s", column)
+
+    messages = Table('messages', MetaData(), autoload_with=connection)
+    for index in messages.indexes:
+        if index.name == 'ix_messages_receiver_read':
+            index.drop(connection)
+            logger.info("Dropped ix_messages_receiver_read")
+
+    return added
+
+def backfill_conversations_if_empty():
+    """Build the summary table on first start against a database that already has messages"""
+    session = Session()
+    try:
+        if session.query(Conversation.id).first() is None and session.query(Message.id).first() is not None:
+            logger.info("Conversations table is empty, backfilling from messages...")
+            count = rebuild_conversations(session)
+            logger.info("Backfilled %s conversations", count)
+    except Exception as e:
+        session.rollback()
+        logger.error("Conversation backfill failed: %s: %s", type(e).__name__, e)
+        raise
+    finally:
+        session.close()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    session = Session()
+    try:
+        count = rebuild_conversations(session)
+        logger.info("Rebuilt %s conversations from messages", count)
+    except Exception as e:
+        session.rollback()
+        logger.error("Conversation backfill failed: %s", e)
+        raise
+    finally:
+        session.close()
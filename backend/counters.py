@@ -0,0 +1,145 @@
+from sqlalchemy import select, update, inspect, func, text, or_
+from database import (
+    engine, init_db, Project, HackathonPost, ResearchPaper, ProjectApplication,
+    HackathonApplication, Report, user_bookmarks
+)
+import threading
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Application, bookmark and report counts are stored on the row they
+# belong to, so listings read a column instead of loading collections or
+# running a count per row. Writers adjust them with relative UPDATEs
+# (col = col + 1) in the same transaction as the change itself; the
+# reconciliation job recomputes them from the source tables and repairs
+# any drift (raw SQL edits, deletes that bypass these helpers, bugs).
+COUNTER_RECONCILE_SECONDS = float(os.getenv('COUNTER_RECONCILE_SECONDS', 3600))
+
+REPORT_TARGETS = {
+    'project': Project,
+    'hackathon': HackathonPost,
+    'research_paper': ResearchPaper,
+}
+
+def _counter_sources():
+    """(model, column, source table, foreign key column, extra conditions) per counter"""
+    project_applications = ProjectApplication.__table__
+    hackathon_applications = HackathonApplication.__table__
+    reports = Report.__table__
+    return [
+        (Project, 'application_count', project_applications, project_applications.c.project_id, ()),
+        (Project, 'pending_application_count', project_applications, project_applications.c.project_id,
+         (project_applications.c.status == 'pending',)),
+        (Project, 'bookmark_count', user_bookmarks, user_bookmarks.c.project_id, ()),
+        (Project, 'report_count', reports, reports.c.target_id, (reports.c.report_type == 'project',)),
+        (HackathonPost, 'application_count', hackathon_applications, hackathon_applications.c.hackathon_id, ()),
+        (HackathonPost, 'pending_application_count', hackathon_applications, hackathon_applications.c.hackathon_id,
+         (hackathon_applications.c.status == 'pending',)),
+        (HackathonPost, 'report_count', reports, reports.c.target_id, (reports.c.report_type == 'hackathon',)),
+        (ResearchPaper, 'report_count', reports, reports.c.target_id, (reports.c.report_type == 'research_paper',)),
+    ]
+
+def _bump(session, model, target_id, **deltas):
+    session.query(model).filter(model.id == target_id).update(
+        {getattr(model, column): getattr(model, column) + delta for column, delta in deltas.items() if delta},
+        synchronize_session=False
+    )
+
+def application_created(session, model, target_id):
+    """Count a new (pending) application to a project or hackathon post"""
+    _bump(session, model, target_id, application_count=1, pending_application_count=1)
+
+def application_status_changed(session, model, target_id, old_status, new_status):
+    delta = (new_status == 'pending') - (old_status == 'pending')
+    if delta:
+        _bump(session, model, target_id, pending_application_count=delta)
+
+def bookmark_added(session, project_id):
+    _bump(session, Project, project_id, bookmark_count=1)
+
+def bookmark_removed(session, project_id):
+    _bump(session, Project, project_id, bookmark_count=-1)
+
+def report_created(session, report_type, target_id):
+    model = REPORT_TARGETS.get(report_type)
+    if model is not None:
+        _bump(session, model, target_id, report_count=1)
+
+def reconcile_counters(connection):
+    """Recompute every counter from its source table; returns the rows repaired"""
+    repaired = 0
+    for model, column, source, foreign_key, conditions in _counter_sources():
+        actual = select(func.count()).select_from(source).where(
+            foreign_key == model.id, *conditions
+        ).scalar_subquery()
+        stored = getattr(model, column)
+        result = connection.execute(
+            update(model).where(or_(stored.is_(None), stored != actual)).values({column: actual})
+        )
+        if result.rowcount:
+            logger.warning("Repaired %s on %s %s rows", column, result.rowcount, model.__tablename__)
+            repaired += result.rowcount
+    return repaired
+
+def add_counter_columns(connection):
+    """Migration step: add the counter columns to existing tables and fill them"""
+    inspector = inspect(connection)
+    added = 0
+    for model, column, _, _, _ in _counter_sources():
+        table = model.__tablename__
+        if not inspector.has_table(table):
+            continue
+        existing = {info['name'] for info in inspector.get_columns(table)}
+        if column not in existing:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+            logger.info("Added %s.%s", table, column)
+            added += 1
+
+    if added:
+        reconcile_counters(connection)
+    return added
+
+class CounterReconciler:
+    """Runs reconcile_counters periodically in a daemon thread"""
+
+    def __init__(self, interval=COUNTER_RECONCILE_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='counter-reconciler', daemon=True)
+        self._thread.start()
+        logger.info("Counter reconciliation every %.0fs", self.interval)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with engine.begin() as connection:
+                    reconcile_counters(connection)
+            except Exception as e:
+                logger.error("Counter reconciliation failed: %s: %s", type(e).__name__, e)
+
+_reconciler = None
+
+def start_counter_reconciler(interval=COUNTER_RECONCILE_SECONDS):
+    """Start the periodic reconciliation once per process"""
+    global _reconciler
+    if _reconciler is None and interval > 0:
+        _reconciler = CounterReconciler(interval)
+        _reconciler.start()
+    return _reconciler
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    with engine.begin() as connection:
+        repaired = reconcile_counters(connection)
+    print(f"Repaired {repaired} counter rows")
@@ -1,26 +1,163 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Boolean, Text, Table, func
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship, scoped_session
+from sqlalchemy import create_engine, event, Column, Integer, BigInteger, SmallInteger, Float, LargeBinary, String, ForeignKey, DateTime, Boolean, Text, Table, Index, UniqueConstraint, func
+from sqlalchemy.orm import sessionmaker, declarative_base, relationship, scoped_session, Session as OrmSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from green import is_green, green_sqlite_creator, GREEN_SQLITE_POOL_SIZE
 from datetime import datetime, timezone
 import pytz
 import os
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Database setup
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///assemble.db')
-logger.info(f"Database URL: {DATABASE_URL}")
+logger.info("Database URL: %s", DATABASE_URL)
+
+# Engine tuning. SQLite gets WAL + busy_timeout so concurrent chat writers
+# wait for the lock instead of failing with "database is locked"; server
+# databases get an explicit connection pool.
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 65536))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    finally:
+        cursor.close()
+
+def create_database_engine(url):
+    """Create an engine for url with the tuning profile for its backend.
+
+    Returns (engine, profile) where profile describes the active settings.
+    """
+    if url.startswith('sqlite') and is_green():
+        # Under eventlet, SQLite calls run in native threads (see green.py)
+        engine = create_engine(
+            url,
+            echo=False,
+            creator=green_sqlite_creator(make_url(url).database, SQLITE_BUSY_TIMEOUT_MS / 1000),
+            poolclass=QueuePool,
+            pool_size=GREEN_SQLITE_POOL_SIZE,
+            max_overflow=0,
+            pool_timeout=DB_POOL_TIMEOUT
+        )
+        event.listen(engine, 'connect', _apply_sqlite_pragmas)
+        profile = {
+            "backend": "sqlite",
+            "journal_mode": SQLITE_JOURNAL_MODE,
+            "synchronous": SQLITE_SYNCHRONOUS,
+            "busy_timeout_ms": SQLITE_BUSY_TIMEOUT_MS,
+            "pool": "QueuePool (eventlet tpool)",
+            "pool_size": GREEN_SQLITE_POOL_SIZE
+        }
+    elif url.startswith('sqlite'):
+        engine = create_engine(
+            url,
+            echo=False,
+            connect_args={
+                'check_same_thread': False,
+                'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000
+            }
+        )
+        event.listen(engine, 'connect', _apply_sqlite_pragmas)
+        profile = {
+            "backend": "sqlite",
+            "journal_mode": SQLITE_JOURNAL_MODE,
+            "synchronous": SQLITE_SYNCHRONOUS,
+            "busy_timeout_ms": SQLITE_BUSY_TIMEOUT_MS,
+            "cache_size_kb": SQLITE_CACHE_SIZE_KB,
+            "mmap_size": SQLITE_MMAP_SIZE,
+            "pool": type(engine.pool).__name__
+        }
+    else:
+        engine = create_engine(
+            url,
+            echo=False,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=True
+        )
+        profile = {
+            "backend": engine.dialect.name,
+            "pool": type(engine.pool).__name__,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_timeout": DB_POOL_TIMEOUT
+        }
+    return engine, profile
+
+def describe_engine_profile(profile):
+    return ", ".join(f"{key}={value}" for key, value in profile.items())
 
 try:
-    engine = create_engine(DATABASE_URL, echo=False)
+    engine, ENGINE_PROFILE = create_database_engine(DATABASE_URL)
     logger.info("Database engine created successfully")
 except Exception as e:
-    logger.error(f"Failed to create database engine: {str(e)}")
+    logger.error("Failed to create database engine: %s", e)
     raise
 
+# Optional read replica. When configured, reads issued while read routing
+# is enabled for the current thread (see read_routing.py) go to the
+# replica; writes and anything inside a flush always use the primary.
+READ_REPLICA_URL = os.getenv('READ_REPLICA_URL')
+replica_engine = None
+REPLICA_PROFILE = None
+
+if READ_REPLICA_URL:
+    try:
+        replica_engine, REPLICA_PROFILE = create_database_engine(READ_REPLICA_URL)
+        logger.info("Read replica engine created successfully")
+    except Exception as e:
+        logger.error("Failed to create read replica engine: %s", e)
+        raise
+
+_routing = threading.local()
+
+def set_read_routing(enabled):
+    """Send this thread's subsequent reads to the replica (if one is configured)"""
+    _routing.use_replica = bool(enabled) and replica_engine is not None
+    _routing.wrote = False
+
+def get_read_routing():
+    """Whether this thread's reads currently go to the replica"""
+    return getattr(_routing, 'use_replica', False)
+
+def consume_write_flag():
+    """Return whether this thread wrote to the primary since routing was last set"""
+    wrote = getattr(_routing, 'wrote', False)
+    _routing.wrote = False
+    return wrote
+
+class RoutingSession(OrmSession):
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or (clause is not None and getattr(clause, 'is_dml', False)):
+            _routing.wrote = True
+            return engine
+        if getattr(_routing, 'use_replica', False):
+            return replica_engine
+        return engine
+
 Base = declarative_base()
 
-SessionFactory = sessionmaker(bind=engine)
+SessionFactory = sessionmaker(class_=RoutingSession, bind=engine)
 Session = scoped_session(SessionFactory)
 
 # Set Indian timezone
@@ -31,28 +168,32 @@ user_skills = Table(
     'user_skills',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('skill_id', Integer, ForeignKey('skills.id'), primary_key=True)
+    Column('skill_id', Integer, ForeignKey('skills.id'), primary_key=True),
+    Index('ix_user_skills_skill', 'skill_id')
 )
 
 user_roles = Table(
     'user_roles',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('role_id', Integer, ForeignKey('roles.id'), primary_key=True)
+    Column('role_id', Integer, ForeignKey('roles.id'), primary_key=True),
+    Index('ix_user_roles_role', 'role_id')
 )
 
 project_skills = Table(
     'project_skills',
     Base.metadata,
     Column('project_id', Integer, ForeignKey('projects.id'), primary_key=True),
-    Column('skill_id', Integer, ForeignKey('skills.id'), primary_key=True)
+    Column('skill_id', Integer, ForeignKey('skills.id'), primary_key=True),
+    Index('ix_project_skills_skill', 'skill_id')
 )
 
 project_roles = Table(
     'project_roles',
     Base.metadata,
     Column('project_id', Integer, ForeignKey('projects.id'), primary_key=True),
-    Column('role_id', Integer, ForeignKey('roles.id'), primary_key=True)
+    Column('role_id', Integer, ForeignKey('roles.id'), primary_key=True),
+    Index('ix_project_roles_role', 'role_id')
 )
 
 user_bookmarks = Table(
@@ -60,21 +201,32 @@ user_bookmarks = Table(
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
     Column('project_id', Integer, ForeignKey('projects.id'), primary_key=True),
-    Column('created_at', DateTime, default=lambda: datetime.now(IST))
+    Column('created_at', DateTime, default=lambda: datetime.now(IST)),
+    Index('ix_user_bookmarks_project', 'project_id')
 )
 
 hackathon_skills = Table(
     'hackathon_skills',
     Base.metadata,
     Column('hackathon_id', Integer, ForeignKey('hackathon_posts.id'), primary_key=True),
-    Column('skill_id', Integer, ForeignKey('skills.id'), primary_key=True)
+    Column('skill_id', Integer, ForeignKey('skills.id'), primary_key=True),
+    Index('ix_hackathon_skills_skill', 'skill_id')
 )
 
 hackathon_roles = Table(
     'hackathon_roles',
     Base.metadata,
     Column('hackathon_id', Integer, ForeignKey('hackathon_posts.id'), primary_key=True),
-    Column('role_id', Integer, ForeignKey('roles.id'), primary_key=True)
+    Column('role_id', Integer, ForeignKey('roles.id'), primary_key=True),
+    Index('ix_hackathon_roles_role', 'role_id')
+)
+
+paper_tags = Table(
+    'paper_tags',
+    Base.metadata,
+    Column('paper_id', Integer, ForeignKey('research_papers.id'), primary_key=True),
+    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True),
+    Index('ix_paper_tags_tag', 'tag_id')
 )
 
 class User(Base):
@@ -126,6 +278,10 @@ class User(Base):
 
 class Project(Base):
     __tablename__ = 'projects'
+    __table_args__ = (
+        Index('ix_projects_active_created', 'is_active', 'created_at'),
+        Index('ix_projects_owner_created', 'owner_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
@@ -137,6 +293,11 @@ class Project(Base):
     owner_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(IST))
     updated_at = Column(DateTime, default=lambda: datetime.now(IST), onupdate=lambda: datetime.now(IST))
+    # Maintained by counters.py
+    application_count = Column(Integer, default=0, nullable=False)
+    pending_application_count = Column(Integer, default=0, nullable=False)
+    bookmark_count = Column(Integer, default=0, nullable=False)
+    report_count = Column(Integer, default=0, nullable=False)
     
     # Relationships
     owner = relationship('User', back_populates='projects')
@@ -176,6 +337,10 @@ class Role(Base):
 
 class ProjectApplication(Base):
     __tablename__ = 'project_applications'
+    __table_args__ = (
+        Index('ix_project_applications_project_user', 'project_id', 'user_id'),
+        Index('ix_project_applications_user_applied', 'user_id', 'applied_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     project_id = Column(Integer, ForeignKey('projects.id'), nullable=False)
@@ -190,6 +355,10 @@ class ProjectApplication(Base):
 
 class Notification(Base):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),
+        Index('ix_notifications_user_created', 'user_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -204,6 +373,10 @@ class Notification(Base):
 
 class HackathonPost(Base):
     __tablename__ = 'hackathon_posts'
+    __table_args__ = (
+        Index('ix_hackathon_posts_active_created', 'is_active', 'created_at'),
+        Index('ix_hackathon_posts_owner_created', 'owner_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     title = Column(String(100), nullable=False)
@@ -215,6 +388,10 @@ class HackathonPost(Base):
     is_active = Column(Boolean, default=True)
     owner_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(IST))
+    # Maintained by counters.py
+    application_count = Column(Integer, default=0, nullable=False)
+    pending_application_count = Column(Integer, default=0, nullable=False)
+    report_count = Column(Integer, default=0, nullable=False)
     
     # Relationships
     owner = relationship('User', back_populates='hackathon_posts')
@@ -225,6 +402,10 @@ class HackathonPost(Base):
 
 class HackathonApplication(Base):
     __tablename__ = 'hackathon_applications'
+    __table_args__ = (
+        Index('ix_hackathon_applications_hackathon_user', 'hackathon_id', 'user_id'),
+        Index('ix_hackathon_applications_user_applied', 'user_id', 'applied_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     hackathon_id = Column(Integer, ForeignKey('hackathon_posts.id'), nullable=False)
@@ -239,20 +420,54 @@ class HackathonApplication(Base):
 
 class Message(Base):
     __tablename__ = 'messages'
+    __table_args__ = (
+        Index('ix_messages_sender_receiver_created', 'sender_id', 'receiver_id', 'created_at'),
+        # Unread counts are id ranges above the reader's watermark
+        Index('ix_messages_sender_receiver_id', 'sender_id', 'receiver_id', 'id'),
+    )
     
     id = Column(Integer, primary_key=True)
     sender_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     receiver_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     content = Column(Text, nullable=False)
-    is_read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=lambda: datetime.now(IST))
     
     # Relationships
     sender = relationship('User', foreign_keys=[sender_id], back_populates='sent_messages')
     receiver = relationship('User', foreign_keys=[receiver_id], back_populates='received_messages')
 
+class Conversation(Base):
+    """Per-pair chat summary kept up to date on every message write.
+
+    The pair is stored unordered as (user_low_id, user_high_id) with
+    user_low_id < user_high_id. Each side keeps a read watermark: the id
+    of the newest message it has read. Messages from the partner above
+    the watermark are unread.
+    """
+    __tablename__ = 'conversations'
+    __table_args__ = (
+        UniqueConstraint('user_low_id', 'user_high_id', name='uq_conversations_pair'),
+        Index('ix_conversations_low_activity', 'user_low_id', 'last_activity'),
+        Index('ix_conversations_high_activity', 'user_high_id', 'last_activity'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_low_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    user_high_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    last_message_id = Column(Integer, ForeignKey('messages.id'), nullable=True)
+    last_activity = Column(DateTime, nullable=True)
+    low_last_read_message_id = Column(Integer, default=0, nullable=False)  # read by user_low
+    high_last_read_message_id = Column(Integer, default=0, nullable=False)  # read by user_high
+    created_at = Column(DateTime, default=lambda: datetime.now(IST))
+
+    # Relationships
+    last_message = relationship('Message')
+
 class PortfolioItem(Base):
     __tablename__ = 'portfolio_items'
+    __table_args__ = (
+        Index('ix_portfolio_items_user_created', 'user_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -266,6 +481,26 @@ class PortfolioItem(Base):
     
     # Relationships
     user = relationship('User', back_populates='portfolio_items')
+
+class EmailOutbox(Base):
+    """Outgoing email waiting for (or done with) background delivery"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    to_email = Column(String(120), nullable=False)
+    subject = Column(String(255), nullable=False)
+    text_body = Column(Text, nullable=True)
+    html_body = Column(Text, nullable=True)
+    status = Column(String(20), default='pending')  # pending, sending, sent, failed
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, default=lambda: datetime.now(IST))
+    created_at = Column(DateTime, default=lambda: datetime.now(IST))
+    sent_at = Column(DateTime, nullable=True)
+
 def init_db():
     """Initialize database and create tables"""
     try:
@@ -278,7 +513,7 @@ def init_db():
         try:
             skill_count = session.query(Skill).count()
             role_count = session.query(Role).count()
-            logger.info(f"Current skill count: {skill_count}, role count: {role_count}")
+            logger.info("Current skill count: %s, role count: %s", skill_count, role_count)
             
             if skill_count == 0:
                 logger.info("Creating default skills...")
@@ -328,7 +563,7 @@ def init_db():
                     session.add(skill)
                 
                 session.commit()
-                logger.info(f"Created {len(default_skills)} default skills successfully")
+                logger.info("Created %s default skills successfully", len(default_skills))
             else:
                 logger.info("Default skills already exist, skipping creation")
             
@@ -367,23 +602,26 @@ def init_db():
                     session.add(role)
                 
                 session.commit()
-                logger.info(f"Created {len(default_roles)} default roles successfully")
+                logger.info("Created %s default roles successfully", len(default_roles))
             else:
                 logger.info("Default roles already exist, skipping creation")
                 
         except Exception as e:
             session.rollback()
-            logger.error(f"Error creating default data: {type(e).__name__}: {str(e)}")
+            logger.error("Error creating default data: %s: %s", type(e).__name__, e)
             raise
         finally:
             session.close()
             
     except Exception as e:
-        logger.error(f"Database initialization failed: {type(e).__name__}: {str(e)}")
+        logger.error("Database initialization failed: %s: %s", type(e).__name__, e)
         raise
 
 class ActivityLog(Base):
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        Index('ix_activity_logs_user_created', 'user_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -397,6 +635,9 @@ class ActivityLog(Base):
 
 class ProjectMilestone(Base):
     __tablename__ = 'project_milestones'
+    __table_args__ = (
+        Index('ix_project_milestones_project', 'project_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     project_id = Column(Integer, ForeignKey('projects.id'), nullable=False)
@@ -413,6 +654,12 @@ class ProjectMilestone(Base):
 
 class ResearchPaper(Base):
     __tablename__ = 'research_papers'
+    __table_args__ = (
+        Index('ix_research_papers_active_created', 'is_active', 'created_at'),
+        Index('ix_research_papers_owner_active_created', 'owner_id', 'is_active', 'created_at'),
+        # The related papers index polls for rows changed by other workers
+        Index('ix_research_papers_updated', 'updated_at'),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String(200), nullable=False)
@@ -428,13 +675,78 @@ class ResearchPaper(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=lambda: datetime.now(IST))
     updated_at = Column(DateTime, default=lambda: datetime.now(IST), onupdate=lambda: datetime.now(IST))
+    # Maintained by counters.py
+    report_count = Column(Integer, default=0, nullable=False)
 
     # Relationships
     owner = relationship('User')
-    reports = relationship('Report', back_populates='research_paper', cascade='all, delete-orphan')
+    tags = relationship('Tag', secondary=paper_tags, back_populates='papers')
+    reports = relationship('Report', foreign_keys='Report.target_id', primaryjoin='and_(ResearchPaper.id==Report.target_id, Report.report_type=="research_paper")', back_populates='research_paper', viewonly=True)
+
+class Tag(Base):
+    __tablename__ = 'tags'
+    __table_args__ = (
+        Index('ix_tags_paper_count', 'paper_count'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # Normalized keyword (see tags.normalize_tag)
+    name = Column(String(50), unique=True, nullable=False, index=True)
+    # Number of active papers carrying the tag
+    paper_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(IST))
+
+    # Relationships
+    papers = relationship('ResearchPaper', secondary=paper_tags, back_populates='tags')
+
+class PaperSignature(Base):
+    """MinHash signature of a research paper abstract (see duplicates.py)"""
+    __tablename__ = 'paper_signatures'
+
+    paper_id = Column(Integer, ForeignKey('research_papers.id'), primary_key=True)
+    # NUM_PERMUTATIONS little-endian uint32 values
+    signature = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(IST), onupdate=lambda: datetime.now(IST))
+
+class PaperLshBucket(Base):
+    """One LSH band of a paper signature, hashed into a bucket"""
+    __tablename__ = 'paper_lsh_buckets'
+    __table_args__ = (
+        Index('ix_paper_lsh_buckets_paper', 'paper_id'),
+    )
+
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    paper_id = Column(Integer, ForeignKey('research_papers.id'), primary_key=True)
+
+class PaperDuplicate(Base):
+    """A paper whose abstract closely matches an earlier paper's"""
+    __tablename__ = 'paper_duplicates'
+    __table_args__ = (
+        UniqueConstraint('paper_id', 'duplicate_of_id', name='uq_paper_duplicates_pair'),
+        Index('ix_paper_duplicates_status_similarity', 'status', 'similarity'),
+        Index('ix_paper_duplicates_duplicate_of', 'duplicate_of_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    paper_id = Column(Integer, ForeignKey('research_papers.id'), nullable=False)
+    duplicate_of_id = Column(Integer, ForeignKey('research_papers.id'), nullable=False)
+    # Estimated Jaccard similarity of the abstracts' word shingles
+    similarity = Column(Float, nullable=False)
+    status = Column(String(20), default='pending')  # pending, dismissed, confirmed
+    created_at = Column(DateTime, default=lambda: datetime.now(IST))
+
+    # Relationships
+    paper = relationship('ResearchPaper', foreign_keys=[paper_id])
+    duplicate_of = relationship('ResearchPaper', foreign_keys=[duplicate_of_id])
 
 class Report(Base):
     __tablename__ = 'reports'
+    __table_args__ = (
+        Index('ix_reports_type_target', 'report_type', 'target_id'),
+        Index('ix_reports_reporter_type_target', 'reporter_id', 'report_type', 'target_id'),
+        Index('ix_reports_status', 'status'),
+    )
 
     id = Column(Integer, primary_key=True)
     reporter_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -455,5 +767,5 @@ if __name__ == '__main__':
         init_db()
         logger.info("Database initialization completed successfully")
     except Exception as e:
-        logger.error(f"Database initialization failed: {str(e)}")
+        logger.error("Database initialization failed: %s", e)
         raise
\ No newline at end of file
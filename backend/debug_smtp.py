@@ -0,0 +1,83 @@
+import socketserver
+import threading
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Minimal SMTP server for local development and load testing of the mail
+# dispatcher. It accepts any login and discards messages after counting
+# them. Point the app at it with SMTP_HOST=localhost SMTP_PORT=1025
+# SMTP_USE_TLS=false.
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode('utf-8'))
+
+    def handle(self):
+        self.reply('220 localhost debug SMTP ready')
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+
+            command = raw.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb in ('EHLO', 'HELO'):
+                self.wfile.write(b'250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n')
+            elif verb == 'AUTH':
+                self.reply('235 2.7.0 Authentication successful')
+            elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                self.read_data()
+                self.server.record_message()
+                self.reply('250 OK queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+    def read_data(self):
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                return
+
+class DebugSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, SMTPHandler)
+        self._lock = threading.Lock()
+        self.received = 0
+
+    def record_message(self):
+        with self._lock:
+            self.received += 1
+            received = self.received
+        logger.info("Received message #%s", received)
+
+def start_debug_smtp(host='localhost', port=1025):
+    """Run the server on a background thread and return it"""
+    server = DebugSMTPServer((host, port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Debug SMTP server that accepts and discards mail')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=1025)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = DebugSMTPServer((args.host, args.port))
+    logger.info("Debug SMTP server listening on %s:%s", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,254 @@
+from sqlalchemy import select, insert, delete, or_, and_
+from database import engine, init_db, ResearchPaper, PaperSignature, PaperLshBucket, PaperDuplicate
+import numpy as np
+import argparse
+import hashlib
+import zlib
+import re
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Near-duplicate detection for research paper abstracts. Each abstract is
+# reduced to a MinHash signature over its word 3-shingles; the signature is
+# cut into LSH bands and every band hashed into a bucket row, so a new
+# submission only compares itself with papers sharing at least one bucket
+# instead of the whole corpus. Candidates are then scored by signature
+# agreement, an estimate of the shingles' Jaccard similarity.
+SHINGLE_SIZE = 3
+# Too little text to tell a copy from a coincidence
+MIN_SHINGLES = 5
+NUM_PERMUTATIONS = 128
+# 32 bands of 4 rows: pairs at 0.6 similarity become candidates ~99% of
+# the time, pairs at 0.3 only ~23%. Changing these requires --resign.
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+DUPLICATE_SIMILARITY_THRESHOLD = float(os.getenv('DUPLICATE_SIMILARITY_THRESHOLD', 0.6))
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+# Fixed seed: signatures stored by one process must match another's
+_permutation_rng = np.random.default_rng(20240917)
+_PERM_A = _permutation_rng.integers(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _permutation_rng.integers(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+_WORD = re.compile(r'\w+')
+
+def shingles(text):
+    words = _WORD.findall((text or '').lower())
+    return {' '.join(words[index:index + SHINGLE_SIZE]) for index in range(len(words) - SHINGLE_SIZE + 1)}
+
+def minhash(text):
+    """MinHash signature (uint32 array) of a text, or None if it is too short"""
+    grams = shingles(text)
+    if len(grams) < MIN_SHINGLES:
+        return None
+
+    hashes = np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+    # (a * x + b) mod p for every permutation at once; a, x and b are below
+    # 2**32, so the product and sum fit in uint64 without overflowing
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+def signature_to_bytes(signature):
+    return signature.astype('<u4').tobytes()
+
+def signature_from_bytes(data):
+    return np.frombuffer(data, dtype='<u4')
+
+def band_buckets(signature):
+    """(band, bucket) pairs for a signature, bucket being a signed 64-bit hash"""
+    bands = signature.astype('<u4').reshape(LSH_BANDS, LSH_ROWS)
+    return [
+        (band, int.from_bytes(hashlib.blake2b(values.tobytes(), digest_size=8).digest(), 'little', signed=True))
+        for band, values in enumerate(bands)
+    ]
+
+def similarities(signature, others):
+    """Estimated Jaccard similarity of a signature against a (n, NUM_PERMUTATIONS) matrix"""
+    return (others == signature[None, :]).mean(axis=1)
+
+def _store_signature(connection, paper_id, signature):
+    connection.execute(delete(PaperLshBucket).where(PaperLshBucket.paper_id == paper_id))
+    connection.execute(delete(PaperSignature).where(PaperSignature.paper_id == paper_id))
+    if signature is None:
+        return
+    connection.execute(insert(PaperSignature), [{"paper_id": paper_id, "signature": signature_to_bytes(signature)}])
+    connection.execute(insert(PaperLshBucket), [
+        {"band": band, "bucket": bucket, "paper_id": paper_id}
+        for band, bucket in band_buckets(signature)
+    ])
+
+def _load_signatures(connection, paper_ids):
+    rows = connection.execute(
+        select(PaperSignature.paper_id, PaperSignature.signature)
+        .join(ResearchPaper, ResearchPaper.id == PaperSignature.paper_id)
+        .where(PaperSignature.paper_id.in_(paper_ids), ResearchPaper.is_active == True)
+    ).all()
+    return {paper_id: signature_from_bytes(data) for paper_id, data in rows}
+
+def _record_duplicates(connection, pairs):
+    """Insert flags for (paper_id, duplicate_of_id, similarity) pairs not flagged before"""
+    if not pairs:
+        return 0
+    existing = set(connection.execute(
+        select(PaperDuplicate.paper_id, PaperDuplicate.duplicate_of_id).where(
+            PaperDuplicate.paper_id.in_({a for a, _, _ in pairs})
+        )
+    ).all())
+    new_pairs = [
+        {"paper_id": a, "duplicate_of_id": b, "similarity": round(float(score), 4), "status": 'pending'}
+        for a, b, score in pairs
+        if (a, b) not in existing
+    ]
+    if new_pairs:
+        connection.execute(insert(PaperDuplicate), new_pairs)
+    return len(new_pairs)
+
+def _ordered_pair(paper_id, other_id, score):
+    # The later submission is the suspected copy
+    if paper_id > other_id:
+        return paper_id, other_id, score
+    return other_id, paper_id, score
+
+def check_paper_duplicates(session, paper):
+    """Sign a paper's abstract and flag the papers it nearly duplicates.
+
+    Runs inside the caller's transaction after the paper is added or its
+    abstract changes. Returns the number of new duplicate flags.
+    """
+    session.flush()
+    connection = session.connection()
+
+    signature = minhash(paper.abstract)
+    _store_signature(connection, paper.id, signature)
+    # Pending flags are recomputed; dismissed or confirmed ones are kept
+    connection.execute(delete(PaperDuplicate).where(
+        or_(PaperDuplicate.paper_id == paper.id, PaperDuplicate.duplicate_of_id == paper.id),
+        PaperDuplicate.status == 'pending'
+    ))
+    if signature is None:
+        return 0
+
+    # OR of (band, bucket) pairs rather than a row-value IN, which older
+    # SQLite versions answer with a full scan instead of the primary key
+    candidate_ids = set(connection.execute(
+        select(PaperLshBucket.paper_id).where(
+            or_(*[
+                and_(PaperLshBucket.band == band, PaperLshBucket.bucket == bucket)
+                for band, bucket in band_buckets(signature)
+            ]),
+            PaperLshBucket.paper_id != paper.id
+        ).distinct()
+    ).scalars())
+    if not candidate_ids:
+        return 0
+
+    signatures = _load_signatures(connection, candidate_ids)
+    if not signatures:
+        return 0
+
+    other_ids = list(signatures)
+    scores = similarities(signature, np.vstack([signatures[other_id] for other_id in other_ids]))
+    pairs = [
+        _ordered_pair(paper.id, other_id, score)
+        for other_id, score in zip(other_ids, scores)
+        if score >= DUPLICATE_SIMILARITY_THRESHOLD
+    ]
+    flagged = _record_duplicates(connection, pairs)
+    if flagged:
+        logger.info("Research paper %s flagged as a possible duplicate of %s papers", paper.id, flagged)
+    return flagged
+
+def forget_paper(session, paper_id):
+    """Drop a deleted paper's signature, buckets and duplicate flags"""
+    connection = session.connection()
+    _store_signature(connection, paper_id, None)
+    connection.execute(delete(PaperDuplicate).where(
+        or_(PaperDuplicate.paper_id == paper_id, PaperDuplicate.duplicate_of_id == paper_id)
+    ))
+
+def _flag_batch(connection, paper_ids):
+    """Flag duplicates between a batch of freshly signed papers and everything signed"""
+    left = PaperLshBucket.__table__.alias('left_bucket')
+    right = PaperLshBucket.__table__.alias('right_bucket')
+    candidate_pairs = connection.execute(
+        select(left.c.paper_id, right.c.paper_id).join(
+            right,
+            and_(
+                right.c.band == left.c.band,
+                right.c.bucket == left.c.bucket,
+                right.c.paper_id != left.c.paper_id
+            )
+        ).where(left.c.paper_id.in_(paper_ids)).distinct()
+    ).all()
+
+    # A pair inside the batch shows up twice; keep one
+    candidate_pairs = {
+        (min(a, b), max(a, b)) if b in paper_ids else (a, b)
+        for a, b in candidate_pairs
+    }
+    if not candidate_pairs:
+        return 0
+
+    signatures = _load_signatures(connection, {paper_id for pair in candidate_pairs for paper_id in pair})
+    candidate_pairs = [(a, b) for a, b in candidate_pairs if a in signatures and b in signatures]
+    if not candidate_pairs:
+        return 0
+
+    first = np.vstack([signatures[a] for a, _ in candidate_pairs])
+    second = np.vstack([signatures[b] for _, b in candidate_pairs])
+    scores = (first == second).mean(axis=1)
+
+    return _record_duplicates(connection, [
+        _ordered_pair(a, b, score)
+        for (a, b), score in zip(candidate_pairs, scores)
+        if score >= DUPLICATE_SIMILARITY_THRESHOLD
+    ])
+
+def sign_corpus(batch_size=500, resign=False):
+    """Sign every unsigned paper (or all of them with resign) and flag duplicates"""
+    if resign:
+        with engine.begin() as connection:
+            connection.execute(delete(PaperLshBucket))
+            connection.execute(delete(PaperSignature))
+
+    signed = flagged = 0
+    last_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(ResearchPaper.id, ResearchPaper.abstract).where(
+                    ResearchPaper.id > last_id,
+                    ~ResearchPaper.id.in_(select(PaperSignature.paper_id))
+                ).order_by(ResearchPaper.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            batch_ids = set()
+            for paper_id, abstract in rows:
+                signature = minhash(abstract)
+                if signature is not None:
+                    _store_signature(connection, paper_id, signature)
+                    batch_ids.add(paper_id)
+
+            if batch_ids:
+                flagged += _flag_batch(connection, batch_ids)
+            signed += len(batch_ids)
+        logger.info("Signed %s research papers so far, %s duplicate flags", signed, flagged)
+
+    return signed, flagged
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sign research paper abstracts for duplicate detection")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--resign', action='store_true', help="recompute every signature, e.g. after changing LSH settings")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    signed, flagged = sign_corpus(batch_size=args.batch_size, resign=args.resign)
+    print(f"Signed {signed} papers, flagged {flagged} possible duplicates")
@@ -1,10 +1,9 @@
 import smtplib
 import random
 import string
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
 import logging
+from mail_queue import enqueue_email
 
 logger = logging.getLogger(__name__)
 
@@ -12,23 +11,31 @@ SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
 SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
 SMTP_USERNAME = os.getenv('SMTP_USERNAME', 'balajismtptest@gmail.com')
 SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', 'mshx pahg bjlw yhaw')
+SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', 30))
 FROM_EMAIL = os.getenv('FROM_EMAIL', SMTP_USERNAME)
 
 def generate_otp():
     return ''.join(random.choices(string.digits, k=6))
 
-def send_otp_email(to_email, otp, username):
+def open_smtp_connection():
+    """Connect, upgrade to TLS and log in to the configured SMTP server"""
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
     try:
-        if not SMTP_USERNAME or not SMTP_PASSWORD:
-            logger.error("SMTP credentials not configured")
-            return False
+        if SMTP_USE_TLS:
+            server.starttls()
+        if SMTP_USERNAME and SMTP_PASSWORD:
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    return server
 
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = 'Verify Your Email - Assemble Platform'
-        msg['From'] = FROM_EMAIL
-        msg['To'] = to_email
+def build_otp_email(otp, username):
+    """Return (subject, text, html) for an OTP verification email"""
+    subject = 'Verify Your Email - Assemble Platform'
 
-        text = f"""
+    text = f"""
         Hi {username},
 
         Welcome to Assemble! Please verify your email address using the OTP below:
@@ -43,7 +50,7 @@ def send_otp_email(to_email, otp, username):
         Assemble Team
         """
 
-        html = f"""
+    html = f"""
         <html>
         <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
             <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
@@ -62,19 +69,21 @@ def send_otp_email(to_email, otp, username):
         </html>
         """
 
-        part1 = MIMEText(text, 'plain')
-        part2 = MIMEText(html, 'html')
-        msg.attach(part1)
-        msg.attach(part2)
+    return subject, text, html
 
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
+def send_otp_email(to_email, otp, username):
+    """Queue an OTP email for background delivery; returns False if it could not be queued"""
+    try:
+        if not SMTP_USERNAME or not SMTP_PASSWORD:
+            logger.error("SMTP credentials not configured")
+            return False
+
+        subject, text, html = build_otp_email(otp, username)
+        enqueue_email(to_email, subject, text, html)
 
-        logger.info(f"OTP email sent successfully to {to_email}")
+        logger.info("OTP email queued for %s", to_email)
         return True
 
     except Exception as e:
-        logger.error(f"Failed to send OTP email: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to queue OTP email: %s: %s", type(e).__name__, e)
         return False
@@ -0,0 +1,225 @@
+from sqlalchemy import text, inspect, or_
+from database import engine, Project, HackathonPost, ResearchPaper
+import html
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Full-text indexes for the searchable content types. On SQLite these are
+# external-content FTS5 tables kept in sync by triggers; on PostgreSQL a
+# generated, weighted tsvector column with a GIN index. Other databases
+# (or a SQLite build without FTS5) fall back to ilike scans.
+#
+# Columns carry a PostgreSQL weight label; SQLite bm25 uses the matching
+# numeric weight so both rank titles above body text the same way.
+FULLTEXT_TABLES = {
+    'projects': {
+        'model': Project,
+        'table': 'projects',
+        'columns': (('name', 'A'), ('description', 'B')),
+    },
+    'hackathons': {
+        'model': HackathonPost,
+        'table': 'hackathon_posts',
+        'columns': (('title', 'A'), ('hackathon_name', 'A'), ('description', 'B')),
+    },
+    'papers': {
+        'model': ResearchPaper,
+        'table': 'research_papers',
+        'columns': (('title', 'A'), ('keywords', 'B'), ('authors', 'C'), ('abstract', 'D')),
+    },
+}
+
+BM25_WEIGHTS = {'A': 10.0, 'B': 5.0, 'C': 2.0, 'D': 1.0}
+POSTGRES_TEXT_CONFIG = 'english'
+MAX_QUERY_TERMS = 8
+SNIPPET_WORDS = 16
+
+# Private-use markers survive escaping and are swapped for <mark> tags afterwards
+_MARK_START = '\ue000'
+_MARK_END = '\ue001'
+
+_fulltext_mode = None
+
+def _fts_table(config):
+    return f"{config['table']}_fts"
+
+def _column_names(config):
+    return [name for name, _ in config['columns']]
+
+def _create_sqlite_fts(connection, config):
+    table = config['table']
+    fts = _fts_table(config)
+    columns = _column_names(config)
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+
+    created = 0
+    if not inspect(connection).has_table(fts):
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({column_list}, content='{table}', content_rowid='id', "
+            f"tokenize='porter unicode61 remove_diacritics 2')"
+        ))
+        connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+        logger.info("Created full-text index %s", fts)
+        created += 1
+
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+    ))
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END"
+    ))
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+    ))
+    return created
+
+def _create_postgres_tsvector(connection, config):
+    table = config['table']
+    columns = {column['name'] for column in inspect(connection).get_columns(table)}
+    if 'search_vector' in columns:
+        return 0
+
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{POSTGRES_TEXT_CONFIG}', coalesce({name}, '')), '{weight}')"
+        for name, weight in config['columns']
+    )
+    # A generated column stays in sync on insert and update by itself
+    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED"))
+    connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)"))
+    logger.info("Created full-text index on %s.search_vector", table)
+    return 1
+
+def _sqlite_has_fts5(connection):
+    try:
+        connection.execute(text("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(body)"))
+        connection.execute(text("DROP TABLE temp._fts5_probe"))
+        return True
+    except Exception:
+        return False
+
+def create_fulltext_indexes(connection):
+    """Migration step: create the full-text tables/columns, indexes and triggers"""
+    global _fulltext_mode
+    _fulltext_mode = None
+    dialect = connection.dialect.name
+
+    if dialect == 'sqlite':
+        if not _sqlite_has_fts5(connection):
+            logger.warning("SQLite was built without FTS5, search falls back to ilike scans")
+            return 0
+        return sum(_create_sqlite_fts(connection, config) for config in FULLTEXT_TABLES.values())
+
+    if dialect == 'postgresql':
+        return sum(_create_postgres_tsvector(connection, config) for config in FULLTEXT_TABLES.values())
+
+    logger.warning("No full-text index support for %s, search falls back to ilike scans", dialect)
+    return 0
+
+def get_fulltext_mode():
+    """'sqlite', 'postgresql' or None when search has to fall back to ilike"""
+    global _fulltext_mode
+    if _fulltext_mode is None:
+        mode = ''
+        with engine.connect() as connection:
+            if engine.dialect.name == 'sqlite':
+                if all(inspect(connection).has_table(_fts_table(config)) for config in FULLTEXT_TABLES.values()):
+                    mode = 'sqlite'
+            elif engine.dialect.name == 'postgresql':
+                columns = {column['name'] for column in inspect(connection).get_columns('projects')}
+                if 'search_vector' in columns:
+                    mode = 'postgresql'
+        _fulltext_mode = mode
+    return _fulltext_mode or None
+
+def query_terms(search):
+    return re.findall(r'\w+', search.lower())[:MAX_QUERY_TERMS]
+
+def build_match_query(terms, mode):
+    """Turn search terms into an all-terms, prefix-matching full-text query"""
+    if mode == 'sqlite':
+        return ' '.join(f'"{term}"*' for term in terms)
+    return ' & '.join(f'{term}:*' for term in terms)
+
+def _ilike_filter(config, search):
+    model = config['model']
+    return or_(*[getattr(model, name).ilike(f'%{search}%') for name in _column_names(config)])
+
+def render_snippet(raw):
+    """HTML-escape a snippet and turn the match markers into <mark> tags"""
+    if raw is None:
+        return None
+    escaped = html.escape(raw)
+    return escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+def _fallback_snippet(row, config):
+    for name in reversed(_column_names(config)):
+        value = getattr(row, name)
+        if value:
+            return html.escape(value[:200] + ('…' if len(value) > 200 else ''))
+    return None
+
+def fulltext_search(session, kind, search, offset=0, limit=20):
+    """Relevance-ranked search over active rows of one content type.
+
+    Returns (total, hits) where hits are (id, score, snippet_html) for the
+    requested slice, best match first. The snippet highlights the matched
+    terms with <mark> and is safe to render as HTML.
+    """
+    config = FULLTEXT_TABLES[kind]
+    table = config['table']
+    mode = get_fulltext_mode()
+    terms = query_terms(search)
+
+    if not terms:
+        return 0, []
+
+    if mode == 'sqlite':
+        fts = _fts_table(config)
+        weights = ', '.join(str(BM25_WEIGHTS[weight]) for _, weight in config['columns'])
+        where = f"{fts} MATCH :fts_query AND {table}.is_active = 1"
+        params = {"fts_query": build_match_query(terms, mode)}
+
+        total = session.execute(text(
+            f"SELECT count(*) FROM {fts} JOIN {table} ON {table}.id = {fts}.rowid WHERE {where}"
+        ), params).scalar()
+        rows = session.execute(text(
+            f"SELECT {table}.id, bm25({fts}, {weights}) AS rank, "
+            f"snippet({fts}, -1, :mark_start, :mark_end, '…', {SNIPPET_WORDS}) AS snippet "
+            f"FROM {fts} JOIN {table} ON {table}.id = {fts}.rowid WHERE {where} "
+            f"ORDER BY rank, {table}.id DESC LIMIT :limit OFFSET :offset"
+        ), dict(params, mark_start=_MARK_START, mark_end=_MARK_END, limit=limit, offset=offset)).all()
+        # bm25 is lower-is-better; flip it so higher scores rank higher everywhere
+        return total, [(row.id, -row.rank, render_snippet(row.snippet)) for row in rows]
+
+    if mode == 'postgresql':
+        document = "concat_ws(' ', " + ', '.join(_column_names(config)) + ")"
+        where = f"search_vector @@ to_tsquery('{POSTGRES_TEXT_CONFIG}', :fts_query) AND is_active"
+        params = {"fts_query": build_match_query(terms, mode)}
+
+        total = session.execute(text(f"SELECT count(*) FROM {table} WHERE {where}"), params).scalar()
+        rows = session.execute(text(
+            f"SELECT id, ts_rank_cd(search_vector, to_tsquery('{POSTGRES_TEXT_CONFIG}', :fts_query)) AS rank, "
+            f"ts_headline('{POSTGRES_TEXT_CONFIG}', {document}, to_tsquery('{POSTGRES_TEXT_CONFIG}', :fts_query), :headline_options) AS snippet "
+            f"FROM {table} WHERE {where} ORDER BY rank DESC, id DESC LIMIT :limit OFFSET :offset"
+        ), dict(
+            params,
+            headline_options=f"StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords={SNIPPET_WORDS}, MinWords=6, MaxFragments=2",
+            limit=limit,
+            offset=offset
+        )).all()
+        return total, [(row.id, float(row.rank), render_snippet(row.snippet)) for row in rows]
+
+    # No full-text index: unranked scan, newest first
+    model = config['model']
+    query = session.query(model).filter(model.is_active == True, _ilike_filter(config, search))
+    total = query.count()
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).offset(offset).limit(limit).all()
+    return total, [(row.id, 0.0, _fallback_snippet(row, config)) for row in rows]
@@ -0,0 +1,61 @@
+import os
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Green-thread (eventlet) serving. Every Socket.IO connection is a
+# greenlet instead of an OS thread, so a node can hold far more idle chat
+# sockets. This only works if the standard library is monkey-patched
+# before anything captures the unpatched versions: scoped_session and the
+# read-routing state use threading.local, the connection pool uses
+# threading locks, and the mail/index workers start threads.
+#
+# SQLite is the one blocking piece left: its calls (including the busy
+# handler waiting on another writer's lock) run in C and would stall the
+# hub, and with it the greenlet holding that lock. Under eventlet the
+# engine therefore hands every SQLite call to eventlet's native thread
+# pool (see database.create_database_engine), with a fixed pool of
+# connections and one native thread per connection.
+#
+# Server databases need a driver with its own green support (for
+# psycopg2, psycogreen); they are left as configured.
+GREEN_SQLITE_POOL_SIZE = int(os.getenv('GREEN_SQLITE_POOL_SIZE', 8))
+# Simultaneous connections the eventlet server accepts; keep the process's
+# open-file limit (ulimit -n) above this
+GREEN_MAX_CONNECTIONS = int(os.getenv('GREEN_MAX_CONNECTIONS', 10000))
+
+# Modules that must not be imported before patching
+_PATCH_FIRST = ('sqlalchemy', 'database', 'flask_socketio')
+
+def patch_for_eventlet():
+    """Monkey-patch the standard library for eventlet; call before any other import"""
+    imported = [name for name in _PATCH_FIRST if name in sys.modules]
+    if imported:
+        raise RuntimeError(
+            f"patch_for_eventlet() must run before importing {', '.join(imported)}"
+        )
+
+    import eventlet
+    eventlet.monkey_patch()
+
+def is_green():
+    """Whether the process runs on eventlet's monkey-patched threads"""
+    if 'eventlet' not in sys.modules:
+        return False
+    from eventlet.patcher import is_monkey_patched
+    return is_monkey_patched('thread')
+
+def green_sqlite_creator(path, timeout):
+    """DBAPI connect function whose SQLite calls run in eventlet's thread pool"""
+    import sqlite3
+    from eventlet import tpool
+
+    tpool.set_num_threads(GREEN_SQLITE_POOL_SIZE)
+
+    def connect():
+        connection = tpool.execute(sqlite3.connect, path, timeout=timeout, check_same_thread=False)
+        # Cursors come back proxied too, so execute/fetch also leave the hub
+        return tpool.Proxy(connection, autowrap=(sqlite3.Cursor,))
+
+    return connect
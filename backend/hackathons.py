@@ -1,7 +1,13 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from datetime import datetime, timezone
 import pytz
+from pagination import get_cursor_args, cursor_page
+from sqlalchemy.orm import joinedload, selectinload
+from identity import get_current_user, get_current_user_id
+from matching import get_teammate_candidates
+from fulltext import fulltext_search
+from counters import application_created, application_status_changed, report_created
 from database import Session, User, HackathonPost, HackathonApplication, Skill, Role, Notification, ActivityLog, Report
 import logging
 
@@ -21,26 +27,41 @@ def get_hackathons():
         per_page = min(request.args.get('per_page', 10, type=int), 100)
         search = request.args.get('search', '').strip()
         
+        try:
+            cursor_mode, cursor, include_total = get_cursor_args()
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        
         # Base query
         query = session.query(HackathonPost).filter(HackathonPost.is_active == True)
         
         # Apply search filter
         if search:
+            # Substring match, as the list filter always did; ranked
+            # full-text search is /api/hackathons/search
             query = query.filter(
                 (HackathonPost.title.ilike(f'%{search}%')) |
                 (HackathonPost.hackathon_name.ilike(f'%{search}%'))
             )
         
-        # Get total count
-        total = query.count()
-        
-        # Apply pagination
-        offset = (page - 1) * per_page
-        hackathons = query.order_by(HackathonPost.created_at.desc()).offset(offset).limit(per_page).all()
+        if cursor_mode:
+            hackathons, pagination = cursor_page(query, HackathonPost.created_at, HackathonPost.id, cursor, per_page, include_total)
+        else:
+            # Get total count
+            total = query.count()
+            
+            # Apply pagination
+            offset = (page - 1) * per_page
+            hackathons = query.order_by(HackathonPost.created_at.desc()).offset(offset).limit(per_page).all()
+            pagination = {
+                "page": page,
+                "per_page": per_page,
+                "total": total,
+                "pages": (total + per_page - 1) // per_page
+            }
         
         # Get current user for checking applications
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        current_user_id = get_current_user_id()
         
         # Serialize hackathons
         hackathons_data = []
@@ -48,7 +69,7 @@ def get_hackathons():
             # Check if current user has applied
             has_applied = session.query(HackathonApplication).filter_by(
                 hackathon_id=hackathon.id,
-                user_id=user.id if user else None
+                user_id=current_user_id
             ).first() is not None
             
             hackathons_data.append({
@@ -68,13 +89,65 @@ def get_hackathons():
                 },
                 "skills": [{"id": skill.id, "name": skill.name, "category": skill.category} for skill in hackathon.skills],
                 "roles": [{"id": role.id, "name": role.name, "description": role.description, "category": role.category} for role in hackathon.roles],
-                "application_count": len(hackathon.applications),
+                "application_count": hackathon.application_count,
                 "has_applied": has_applied,
-                "is_owner": hackathon.owner_id == (user.id if user else None)
+                "is_owner": hackathon.owner_id == current_user_id
             })
         
         return jsonify({
             "hackathons": hackathons_data,
+            "pagination": pagination
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": "Failed to fetch hackathons"}), 500
+    finally:
+        session.close()
+
+@hackathon_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_hackathons():
+    session = Session()
+    try:
+        search = request.args.get('q', '').strip()
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 10, type=int), 1), 50)
+        
+        if not search:
+            return jsonify({"error": "Search query is required"}), 400
+        
+        total, hits = fulltext_search(session, 'hackathons', search, offset=(page - 1) * per_page, limit=per_page)
+        
+        hackathons = session.query(HackathonPost).options(
+            joinedload(HackathonPost.owner),
+            selectinload(HackathonPost.skills)
+        ).filter(HackathonPost.id.in_([hackathon_id for hackathon_id, _, _ in hits])).all()
+        hackathons_by_id = {hackathon.id: hackathon for hackathon in hackathons}
+        
+        results = []
+        for hackathon_id, score, snippet in hits:
+            hackathon = hackathons_by_id.get(hackathon_id)
+            if hackathon is None:
+                continue
+            results.append({
+                "id": hackathon.id,
+                "title": hackathon.title,
+                "hackathon_name": hackathon.hackathon_name,
+                "hackathon_date": hackathon.hackathon_date.astimezone(IST).isoformat() if hackathon.hackathon_date else None,
+                "created_at": hackathon.created_at.astimezone(IST).isoformat(),
+                "owner": {
+                    "id": hackathon.owner.id,
+                    "username": hackathon.owner.username,
+                    "full_name": hackathon.owner.full_name,
+                    "avatar_url": hackathon.owner.avatar_url
+                },
+                "skills": [{"id": skill.id, "name": skill.name, "category": skill.category} for skill in hackathon.skills],
+                "score": round(score, 6),
+                "snippet": snippet
+            })
+        
+        return jsonify({
+            "results": results,
             "pagination": {
                 "page": page,
                 "per_page": per_page,
@@ -84,7 +157,8 @@ def get_hackathons():
         }), 200
         
     except Exception as e:
-        return jsonify({"error": "Failed to fetch hackathons"}), 500
+        logger.error("Failed to search hackathons: %s", e)
+        return jsonify({"error": "Failed to search hackathons"}), 500
     finally:
         session.close()
 
@@ -99,11 +173,10 @@ def get_hackathon(hackathon_id):
             return jsonify({"error": "Hackathon not found"}), 404
         
         # Check if current user has applied
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        current_user_id = get_current_user_id()
         has_applied = session.query(HackathonApplication).filter_by(
             hackathon_id=hackathon_id,
-            user_id=user.id if user else None
+            user_id=current_user_id
         ).first() is not None
         
         hackathon_data = {
@@ -125,9 +198,9 @@ def get_hackathon(hackathon_id):
             },
             "skills": [{"id": skill.id, "name": skill.name, "category": skill.category} for skill in hackathon.skills],
             "roles": [{"id": role.id, "name": role.name, "description": role.description, "category": role.category} for role in hackathon.roles],
-            "application_count": len(hackathon.applications),
+            "application_count": hackathon.application_count,
             "has_applied": has_applied,
-            "is_owner": hackathon.owner_id == (user.id if user else None)
+            "is_owner": hackathon.owner_id == current_user_id
         }
         
         return jsonify(hackathon_data), 200
@@ -142,8 +215,7 @@ def get_hackathon(hackathon_id):
 def create_hackathon():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -228,8 +300,7 @@ def create_hackathon():
 def apply_to_hackathon(hackathon_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -266,6 +337,7 @@ def apply_to_hackathon(hackathon_id):
         )
         
         session.add(application)
+        application_created(session, HackathonPost, hackathon_id)
         
         # Create notification for hackathon owner
         notification = Notification(
@@ -296,13 +368,51 @@ def apply_to_hackathon(hackathon_id):
     finally:
         session.close()
 
+@hackathon_bp.route('/<int:hackathon_id>/candidates', methods=['GET'])
+@jwt_required()
+def get_hackathon_candidates(hackathon_id):
+    session = Session()
+    try:
+        user_id = get_current_user_id()
+        
+        if not user_id:
+            return jsonify({"error": "User not found"}), 404
+        
+        hackathon = session.query(HackathonPost).options(
+            selectinload(HackathonPost.skills),
+            selectinload(HackathonPost.roles)
+        ).filter_by(id=hackathon_id, owner_id=user_id).first()
+        if not hackathon:
+            return jsonify({"error": "Hackathon not found or not owned by you"}), 404
+        
+        # Skip the owner and anyone who already applied
+        applicant_ids = {row[0] for row in session.query(HackathonApplication.user_id).filter_by(hackathon_id=hackathon_id).all()}
+        applicant_ids.add(user_id)
+        
+        candidates, pagination = get_teammate_candidates(
+            session,
+            [skill.id for skill in hackathon.skills],
+            [role.id for role in hackathon.roles],
+            applicant_ids
+        )
+        
+        return jsonify({
+            "candidates": candidates,
+            "pagination": pagination
+        }), 200
+        
+    except Exception as e:
+        logger.error("Failed to find candidates for hackathon: %s", e)
+        return jsonify({"error": "Failed to find candidates"}), 500
+    finally:
+        session.close()
+
 @hackathon_bp.route('/<int:hackathon_id>/applications', methods=['GET'])
 @jwt_required()
 def get_hackathon_applications(hackathon_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -346,8 +456,7 @@ def get_hackathon_applications(hackathon_id):
 def update_hackathon_application_status(application_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -366,6 +475,7 @@ def update_hackathon_application_status(application_id):
         if new_status not in ['accepted', 'rejected']:
             return jsonify({"error": "Invalid status"}), 400
         
+        application_status_changed(session, HackathonPost, application.hackathon_id, application.status, new_status)
         application.status = new_status
         
         # Create notification for applicant
@@ -417,8 +527,7 @@ def update_hackathon_application_status(application_id):
 def get_my_hackathons():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -439,7 +548,8 @@ def get_my_hackathons():
                 "created_at": hackathon.created_at.astimezone(IST).isoformat(),
                 "skills": [{"id": skill.id, "name": skill.name, "category": skill.category} for skill in hackathon.skills],
                 "roles": [{"id": role.id, "name": role.name, "description": role.description, "category": role.category} for role in hackathon.roles],
-                "application_count": len(hackathon.applications)
+                "application_count": hackathon.application_count,
+                "pending_application_count": hackathon.pending_application_count
             })
         
         return jsonify(hackathons_data), 200
@@ -454,8 +564,7 @@ def get_my_hackathons():
 def update_hackathon(hackathon_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -515,8 +624,7 @@ def update_hackathon(hackathon_id):
 def delete_hackathon(hackathon_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -552,8 +660,7 @@ def delete_hackathon(hackathon_id):
 def get_my_hackathon_applications():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -593,8 +700,7 @@ def get_my_hackathon_applications():
 def report_hackathon(hackathon_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -629,15 +735,16 @@ def report_hackathon(hackathon_id):
         )
 
         session.add(report)
+        report_created(session, 'hackathon', hackathon_id)
         session.commit()
 
-        logger.info(f"Hackathon reported: {hackathon.title} by user {user.username}")
+        logger.info("Hackathon reported: %s by user %s", hackathon.title, user.username)
 
         return jsonify({"message": "Hackathon reported successfully"}), 201
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to report hackathon: {str(e)}")
+        logger.error("Failed to report hackathon: %s", e)
         return jsonify({"error": "Failed to report hackathon"}), 500
     finally:
         session.close()
\ No newline at end of file
@@ -0,0 +1,89 @@
+from flask import g
+from flask_jwt_extended import get_jwt_identity
+from database import Session, User
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Process-wide JWT identity (username) -> user id cache. Entries are short
+# lived so other workers' changes are picked up quickly; deactivation in
+# this process evicts immediately through invalidate_cached_user.
+IDENTITY_CACHE_TTL = float(os.getenv('IDENTITY_CACHE_TTL', 30))
+
+_identity_cache = {}
+_identity_lock = threading.Lock()
+
+def _cached_user_id(username):
+    with _identity_lock:
+        entry = _identity_cache.get(username)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if expires_at < time.monotonic():
+            del _identity_cache[username]
+            return None
+        return user_id
+
+def _remember_user(user):
+    if not user.is_active:
+        return
+    with _identity_lock:
+        _identity_cache[user.username] = (user.id, time.monotonic() + IDENTITY_CACHE_TTL)
+
+def invalidate_cached_user(username):
+    """Drop a user from the identity cache, e.g. after deactivation"""
+    with _identity_lock:
+        _identity_cache.pop(username, None)
+
+def get_current_user_id():
+    """Id of the active user behind the request's JWT, or None.
+
+    Resolved once per request (kept on flask.g) and served from the
+    identity cache when possible, so most calls need no query at all.
+    """
+    if 'current_user_id' in g:
+        return g.current_user_id
+
+    g.current_user_id = resolve_user_id(get_jwt_identity())
+    return g.current_user_id
+
+def resolve_user_id(username):
+    """Id of the active user with this JWT identity, or None, through the cache"""
+    user_id = _cached_user_id(username)
+
+    if user_id is None:
+        user = Session().query(User).filter_by(username=username).first()
+        if user is not None and user.is_active:
+            _remember_user(user)
+            user_id = user.id
+
+    return user_id
+
+def get_current_user(session):
+    """The active User behind the request's JWT, loaded into session, or None"""
+    if 'current_user_id' in g:
+        user_id = g.current_user_id
+        if user_id is None:
+            return None
+    else:
+        user_id = _cached_user_id(get_jwt_identity())
+
+    if user_id is not None:
+        # Identity-map hit when the user was already loaded in this session
+        user = session.get(User, user_id)
+    else:
+        user = session.query(User).filter_by(username=get_jwt_identity()).first()
+        if user is not None:
+            _remember_user(user)
+
+    if user is None or not user.is_active:
+        if user is not None:
+            invalidate_cached_user(user.username)
+        g.current_user_id = None
+        return None
+
+    g.current_user_id = user.id
+    return user
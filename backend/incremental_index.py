@@ -0,0 +1,106 @@
+from database import Session
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class IncrementalIndex:
+    """Base for in-memory indexes kept fresh by full rebuilds plus deltas.
+
+    Writers mark the ids they changed; the next ensure_fresh() re-indexes
+    just those (_apply_changes). A full rebuild runs on the first request
+    and then periodically in a background thread, while queries keep
+    using the current index. Subclasses implement:
+
+      _build(session)          load and build a new index, outside the lock
+      _install(state)          swap what _build returned in (lock held)
+      _apply_changes(session)  re-index self._dirty (lock held); clears it
+      _size()                  items in the index, for the rebuild log
+
+    and may override _is_built(), _is_stale() and _has_changes().
+    """
+
+    index_name = 'Index'
+    item_name = 'items'
+    rebuild_seconds = 300
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._rebuilding = False
+        self._dirty = set()
+        # One set per rebuild in progress, collecting ids changed while it
+        # loads. A concurrent _apply_changes can consume those ids against
+        # the old index, so they are marked dirty again once the new one
+        # is installed.
+        self._rebuild_marks = []
+
+    def mark_changed(self, item_id):
+        with self._lock:
+            self._dirty.add(item_id)
+            for marks in self._rebuild_marks:
+                marks.add(item_id)
+
+    def rebuild(self, session):
+        """Build a fresh index and swap it in; queries keep using the old one meanwhile"""
+        started = time.perf_counter()
+        with self._lock:
+            # Ids already marked stay marked for the new index too
+            marks = set(self._dirty)
+            self._rebuild_marks.append(marks)
+
+        try:
+            state = self._build(session)
+            with self._lock:
+                self._install(state)
+                self._built_at = time.monotonic()
+                self._dirty |= marks
+        finally:
+            with self._lock:
+                self._rebuild_marks = [pending for pending in self._rebuild_marks if pending is not marks]
+        logger.info("%s rebuilt: %s %s in %.1fms", self.index_name, self._size(), self.item_name, (time.perf_counter() - started) * 1000)
+
+    def _rebuild_in_background(self):
+        session = Session()
+        try:
+            self.rebuild(session)
+        except Exception as e:
+            logger.error("Background %s rebuild failed: %s: %s", self.index_name, type(e).__name__, e)
+        finally:
+            self._rebuilding = False
+            Session.remove()
+
+    def _is_built(self):
+        return self._built_at is not None
+
+    def _is_stale(self):
+        return time.monotonic() - self._built_at > self.rebuild_seconds
+
+    def _has_changes(self):
+        return bool(self._dirty)
+
+    def ensure_fresh(self, session):
+        with self._lock:
+            if not self._is_built():
+                # Nothing to serve yet, so the first request builds it
+                self.rebuild(session)
+            elif self._is_stale() and not self._rebuilding:
+                # Refresh off the request path and keep serving the current index
+                self._rebuilding = True
+                threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+            if self._has_changes():
+                self._apply_changes(session)
+
+    def _build(self, session):
+        raise NotImplementedError
+
+    def _install(self, state):
+        raise NotImplementedError
+
+    def _apply_changes(self, session):
+        raise NotImplementedError
+
+    def _size(self):
+        raise NotImplementedError
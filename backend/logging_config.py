@@ -0,0 +1,197 @@
+from flask import request, g
+from logging.handlers import QueueHandler, QueueListener
+import logging
+import queue
+import random
+import atexit
+import json
+import time
+import sys
+import os
+
+logger = logging.getLogger(__name__)
+
+# Handlers only put records on an in-memory queue; a listener thread does
+# the formatting and the file/console I/O, so requests never wait on disk.
+# A preset picks sensible defaults per environment and every value can be
+# overridden through the LOG_* environment variables.
+LOG_PRESETS = {
+    'development': {
+        'level': 'DEBUG',
+        'format': 'text',
+        'body_sample_rate': 1.0,
+        'body_max_bytes': 4096,
+        'access_only': False,
+    },
+    'production': {
+        'level': 'INFO',
+        'format': 'json',
+        'body_sample_rate': 0.0,
+        'body_max_bytes': 1024,
+        # One line per request, written when the response goes out
+        'access_only': True,
+    },
+}
+
+# Third-party loggers that are too chatty to run at DEBUG/INFO in production
+NOISY_LOGGERS = ('werkzeug', 'engineio', 'socketio', 'urllib3')
+
+REDACTED_FIELDS = {'password', 'new_password', 'current_password', 'otp', 'token'}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# Argument types that cannot change between the logging call and the
+# listener formatting the record
+_IMMUTABLE_ARGS = (str, int, float, bool, type(None), BaseException)
+
+_listener = None
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    The stock prepare() renders the message in the caller's thread. Records
+    whose arguments are all immutable are queued as they are instead; any
+    other record is rendered up front so later mutation can't change it.
+    """
+
+    def prepare(self, record):
+        # A single mapping argument is stored as record.args itself
+        args = record.args or ()
+        if isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args):
+            return record
+        return super().prepare(record)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any fields passed via extra="""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def get_log_settings():
+    """Resolve the active preset and apply LOG_* environment overrides"""
+    default_preset = 'production' if os.getenv('FLASK_ENV') == 'production' else 'development'
+    preset = os.getenv('LOG_PRESET', default_preset)
+    if preset not in LOG_PRESETS:
+        preset = default_preset
+
+    settings = dict(LOG_PRESETS[preset], preset=preset)
+    settings['level'] = os.getenv('LOG_LEVEL', settings['level']).upper()
+    settings['format'] = os.getenv('LOG_FORMAT', settings['format'])
+    settings['body_sample_rate'] = float(os.getenv('LOG_BODY_SAMPLE_RATE', settings['body_sample_rate']))
+    settings['body_max_bytes'] = int(os.getenv('LOG_BODY_MAX_BYTES', settings['body_max_bytes']))
+    settings['access_only'] = os.getenv('LOG_ACCESS_ONLY', str(settings['access_only'])).lower() == 'true'
+    settings['file'] = os.getenv('LOG_FILE', 'app.log')
+    return settings
+
+def configure_logging(settings=None):
+    """Install the queue-based root handler and start the listener thread"""
+    global _listener
+    settings = settings or get_log_settings()
+
+    if _listener is not None:
+        return settings
+
+    if settings['format'] == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if settings['file']:
+        handlers.append(logging.FileHandler(settings['file']))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(settings['level'])
+
+    if settings['preset'] == 'production':
+        for name in NOISY_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(stop_logging)
+    return settings
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def _redact(data):
+    if isinstance(data, dict):
+        return {key: '[REDACTED]' if key in REDACTED_FIELDS else _redact(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_redact(item) for item in data]
+    return data
+
+def _request_body_for_log(max_bytes):
+    length = request.content_length
+    if length is not None and length > max_bytes:
+        return f"<{length} bytes, not logged>"
+
+    data = request.get_json(silent=True)
+    if data is None:
+        return None
+    return _redact(data)
+
+def init_request_logging(app, settings):
+    """Log requests according to the active preset"""
+    access_logger = logging.getLogger('access')
+    request_logger = logging.getLogger('app.request')
+
+    @app.before_request
+    def start_request_log():
+        g.request_started = time.perf_counter()
+
+        if settings['access_only']:
+            return
+
+        request_logger.info("Request: %s %s", request.method, request.url)
+
+        if (
+            request.is_json
+            and settings['body_sample_rate'] > 0
+            and request_logger.isEnabledFor(logging.DEBUG)
+            and random.random() < settings['body_sample_rate']
+        ):
+            body = _request_body_for_log(settings['body_max_bytes'])
+            if body is not None:
+                request_logger.debug("Request Body: %s", body)
+
+    @app.after_request
+    def finish_request_log(response):
+        started = g.get('request_started')
+        duration_ms = round((time.perf_counter() - started) * 1000, 2) if started else None
+        access_logger.info(
+            "%s %s %s %sms", request.method, request.path, response.status_code, duration_ms,
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "duration_ms": duration_ms,
+                "remote_addr": request.remote_addr,
+            }
+        )
+        return response
@@ -0,0 +1,334 @@
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from collections import deque
+from datetime import datetime, timedelta
+import smtplib
+import threading
+import queue
+import time
+import os
+import logging
+from database import Session, SessionFactory, EmailOutbox, IST
+from bulk import set_status
+
+logger = logging.getLogger(__name__)
+
+# Requests only write to the outbox table; background worker threads
+# claim pending rows in batches and deliver them over pooled SMTP
+# connections, retrying failures with exponential backoff.
+MAIL_WORKERS = int(os.getenv('MAIL_WORKERS', 2))
+MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 20))
+MAIL_POLL_INTERVAL = float(os.getenv('MAIL_POLL_INTERVAL', 5))
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', 6))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv('MAIL_RETRY_BASE_SECONDS', 5))
+MAIL_RETRY_MAX_SECONDS = float(os.getenv('MAIL_RETRY_MAX_SECONDS', 600))
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv('SMTP_IDLE_CHECK_SECONDS', 30))
+# Rows stuck in 'sending' this long (e.g. a worker died mid-batch) are retried
+MAIL_STALE_SENDING_SECONDS = float(os.getenv('MAIL_STALE_SENDING_SECONDS', 300))
+
+_wakeup = threading.Event()
+_dispatcher = None
+
+class SMTPConnectionPool:
+    """Keeps logged-in SMTP connections open for reuse between sends"""
+
+    def __init__(self, connect, size):
+        self._connect = connect
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            if time.monotonic() - last_used < SMTP_IDLE_CHECK_SECONDS:
+                return server
+
+            # Servers drop idle clients; make sure this one is still alive
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._discard(server)
+
+    def release(self, server, broken=False):
+        if broken:
+            self._discard(server)
+            return
+        try:
+            self._idle.put_nowait((server, time.monotonic()))
+        except queue.Full:
+            self._discard(server)
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(server)
+
+    def _discard(self, server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+class MailMetrics:
+    """Send counters and a rolling window of delivery latencies"""
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.sent_total = 0
+        self.failed_total = 0
+        self.retried_total = 0
+
+    def record_sent(self, seconds):
+        with self._lock:
+            self.sent_total += 1
+            self._latencies.append(seconds)
+
+    def record_retry(self):
+        with self._lock:
+            self.retried_total += 1
+
+    def record_failed(self):
+        with self._lock:
+            self.failed_total += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            sent, failed, retried = self.sent_total, self.failed_total, self.retried_total
+
+        latency = None
+        if latencies:
+            latency = {
+                "avg_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+                "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2)
+            }
+
+        return {
+            "sent_total": sent,
+            "failed_total": failed,
+            "retried_total": retried,
+            "send_latency": latency
+        }
+
+metrics = MailMetrics()
+
+def build_mime_message(outbox, from_email):
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = outbox.subject
+    msg['From'] = from_email
+    msg['To'] = outbox.to_email
+    if outbox.text_body:
+        msg.attach(MIMEText(outbox.text_body, 'plain'))
+    if outbox.html_body:
+        msg.attach(MIMEText(outbox.html_body, 'html'))
+    return msg
+
+def retry_delay(attempts):
+    return min(MAIL_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), MAIL_RETRY_MAX_SECONDS)
+
+def enqueue_email(to_email, subject, text_body, html_body=None):
+    """Persist an email in the outbox and wake the dispatcher; returns the outbox id"""
+    # A session of its own: committing or closing the request's scoped
+    # session here would expire and detach the caller's objects
+    session = SessionFactory()
+    try:
+        outbox = EmailOutbox(
+            to_email=to_email,
+            subject=subject,
+            text_body=text_body,
+            html_body=html_body,
+            status='pending',
+            next_attempt_at=datetime.now(IST)
+        )
+        session.add(outbox)
+        session.commit()
+        outbox_id = outbox.id
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    _wakeup.set()
+    return outbox_id
+
+def get_mail_metrics():
+    """Queue depth plus send counters and latency for the health endpoint"""
+    session = SessionFactory()
+    try:
+        queue_depth = session.query(EmailOutbox).filter(
+            EmailOutbox.status.in_(['pending', 'sending'])
+        ).count()
+    finally:
+        session.close()
+
+    data = metrics.snapshot()
+    data["queue_depth"] = queue_depth
+    data["dispatcher_running"] = _dispatcher is not None and _dispatcher.is_running()
+    return data
+
+class MailDispatcher:
+    def __init__(self, connect, from_email, workers=MAIL_WORKERS):
+        self.from_email = from_email
+        self.pool = SMTPConnectionPool(connect, size=workers)
+        self._workers = workers
+        self._threads = []
+        self._stopping = threading.Event()
+
+    def start(self):
+        self._requeue_stale()
+        for number in range(self._workers):
+            thread = threading.Thread(target=self._run, name=f"mail-dispatcher-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Mail dispatcher started with %s workers", self._workers)
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        _wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.pool.close()
+
+    def is_running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                delivered = self.dispatch_once()
+            except Exception as e:
+                logger.error("Mail dispatcher error: %s: %s", type(e).__name__, e)
+                delivered = 0
+            finally:
+                Session.remove()
+
+            # A full batch means there is probably more waiting
+            if delivered < MAIL_BATCH_SIZE:
+                _wakeup.wait(MAIL_POLL_INTERVAL)
+                _wakeup.clear()
+
+    def _requeue_stale(self):
+        session = Session()
+        try:
+            cutoff = datetime.now(IST) - timedelta(seconds=MAIL_STALE_SENDING_SECONDS)
+            requeued = set_status(
+                session, EmailOutbox, 'pending',
+                EmailOutbox.next_attempt_at < cutoff,
+                from_status='sending'
+            )
+            session.commit()
+            if requeued:
+                logger.warning("Requeued %s emails stuck in sending", requeued)
+        except Exception as e:
+            session.rollback()
+            logger.error("Failed to requeue stale emails: %s", e)
+        finally:
+            session.close()
+
+    def _claim_batch(self, session):
+        now = datetime.now(IST)
+        candidate_ids = [row[0] for row in session.query(EmailOutbox.id).filter(
+            EmailOutbox.status == 'pending',
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(MAIL_BATCH_SIZE).all()]
+
+        if not candidate_ids:
+            return []
+
+        # Only rows still pending are ours; other workers may race for them.
+        # One UPDATE claims the whole batch, stamping it with this claim's
+        # time so the rows we won can be told apart from another worker's.
+        claimed = set_status(
+            session, EmailOutbox, 'sending',
+            EmailOutbox.id.in_(candidate_ids),
+            from_status='pending',
+            values={EmailOutbox.next_attempt_at: now}
+        )
+        session.commit()
+
+        if not claimed:
+            return []
+        return session.query(EmailOutbox).filter(
+            EmailOutbox.id.in_(candidate_ids),
+            EmailOutbox.status == 'sending',
+            EmailOutbox.next_attempt_at == now
+        ).order_by(EmailOutbox.id).all()
+
+    def dispatch_once(self):
+        """Claim and deliver one batch; returns how many emails were sent"""
+        session = Session()
+        batch = self._claim_batch(session)
+        if not batch:
+            return 0
+
+        delivered = 0
+        server = None
+        try:
+            for outbox in batch:
+                started = time.perf_counter()
+                try:
+                    if server is None:
+                        server = self.pool.acquire()
+                    server.send_message(build_mime_message(outbox, self.from_email))
+                except Exception as e:
+                    # The connection may be unusable now; start fresh next time
+                    if server is not None:
+                        self.pool.release(server, broken=True)
+                        server = None
+                    self._mark_failed(outbox, e)
+                else:
+                    outbox.status = 'sent'
+                    outbox.sent_at = datetime.now(IST)
+                    outbox.attempts = (outbox.attempts or 0) + 1
+                    outbox.last_error = None
+                    metrics.record_sent(time.perf_counter() - started)
+                    delivered += 1
+                session.commit()
+        finally:
+            if server is not None:
+                self.pool.release(server)
+
+        return delivered
+
+    def _mark_failed(self, outbox, error):
+        outbox.attempts = (outbox.attempts or 0) + 1
+        outbox.last_error = f"{type(error).__name__}: {str(error)}"[:1000]
+        if outbox.attempts >= MAIL_MAX_ATTEMPTS:
+            outbox.status = 'failed'
+            metrics.record_failed()
+            logger.error("Giving up on email %s to %s: %s", outbox.id, outbox.to_email, outbox.last_error)
+        else:
+            outbox.status = 'pending'
+            outbox.next_attempt_at = datetime.now(IST) + timedelta(seconds=retry_delay(outbox.attempts))
+            metrics.record_retry()
+            logger.warning("Email %s failed (attempt %s), retrying: %s", outbox.id, outbox.attempts, outbox.last_error)
+
+def start_mail_dispatcher(connect, from_email, workers=MAIL_WORKERS):
+    """Start the background dispatcher once per process"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = MailDispatcher(connect, from_email, workers=workers)
+        _dispatcher.start()
+    return _dispatcher
+
+def stop_mail_dispatcher():
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.stop()
+        _dispatcher = None
@@ -0,0 +1,522 @@
+from flask import request
+from datetime import datetime
+from collections import defaultdict
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+import numpy as np
+import math
+import os
+import logging
+from database import User, Project, Skill, Role, IST, user_skills, user_roles, project_skills, project_roles
+from incremental_index import IncrementalIndex
+
+logger = logging.getLogger(__name__)
+
+# Skill and role sets are kept as uint64 bitsets (one bit per skill/role
+# id) so scoring a user against every active project is a handful of
+# vectorised AND/popcount operations instead of loading ORM objects.
+# Changes made in this process are applied incrementally; the periodic
+# rebuild picks up changes made by other workers.
+MATCH_INDEX_REBUILD_SECONDS = float(os.getenv('MATCH_INDEX_REBUILD_SECONDS', 300))
+MATCH_RECENCY_HALF_LIFE_DAYS = float(os.getenv('MATCH_RECENCY_HALF_LIFE_DAYS', 30))
+MATCH_SKILL_WEIGHT = 0.7
+MATCH_ROLE_WEIGHT = 0.3
+MATCH_RECENCY_WEIGHT = 0.2
+USER_BITS_CACHE_SIZE = 10000
+
+_ONE = np.uint64(1)
+
+def _now_timestamp():
+    # created_at is stored as naive IST wall time
+    return datetime.now(IST).replace(tzinfo=None).timestamp()
+
+def popcount_rows(bits):
+    """Number of set bits per row of a 2-D uint64 array"""
+    return np.bitwise_count(bits).sum(axis=1, dtype=np.int64)
+
+class BitLayout:
+    """Maps skill/role ids to bit positions, grouped by category"""
+
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.ids = np.array([row_id for row_id, _ in rows], dtype=np.int64)
+        self.position = {row_id: index for index, (row_id, _) in enumerate(rows)}
+        self.words = max(1, math.ceil(len(rows) / 64))
+
+        self.categories = sorted({category or 'Other' for _, category in rows})
+        category_index = {category: index for index, category in enumerate(self.categories)}
+        self.category_masks = np.zeros((len(self.categories), self.words), dtype=np.uint64)
+        for row_id, category in rows:
+            self._set(self.category_masks[category_index[category or 'Other']], self.position[row_id])
+
+    @staticmethod
+    def _set(bits, position):
+        bits[position >> 6] |= _ONE << np.uint64(position & 63)
+
+    def knows(self, ids):
+        return all(row_id in self.position for row_id in ids)
+
+    def pack(self, ids):
+        """Bitset for a collection of ids; unknown ids are ignored"""
+        bits = np.zeros(self.words, dtype=np.uint64)
+        for row_id in ids:
+            position = self.position.get(row_id)
+            if position is not None:
+                self._set(bits, position)
+        return bits
+
+class ProjectMatchIndex(IncrementalIndex):
+    """In-memory bitset index of active projects for skill/role matching"""
+
+    index_name = 'Project match index'
+    item_name = 'projects'
+    rebuild_seconds = MATCH_INDEX_REBUILD_SECONDS
+
+    # Built by _build() and swapped in together
+    _INDEX_STATE = (
+        'skill_layout', 'role_layout', 'project_ids', 'owner_ids', 'created_ts', 'live',
+        'skill_bits', 'role_bits', 'size', 'row_of', 'category_weights',
+        'required_skill_weight', 'required_roles',
+    )
+
+    def __init__(self):
+        super().__init__()
+        self._user_bits = {}
+        self.skill_layout = None
+        self.role_layout = None
+
+    # Change tracking
+
+    def mark_user_changed(self, user_id):
+        with self._lock:
+            self._user_bits.pop(user_id, None)
+
+    # Building
+
+    def _allocate(self, capacity):
+        self.project_ids = np.zeros(capacity, dtype=np.int64)
+        self.owner_ids = np.zeros(capacity, dtype=np.int64)
+        self.created_ts = np.zeros(capacity, dtype=np.float64)
+        self.live = np.zeros(capacity, dtype=bool)
+        self.skill_bits = np.zeros((capacity, self.skill_layout.words), dtype=np.uint64)
+        self.role_bits = np.zeros((capacity, self.role_layout.words), dtype=np.uint64)
+        self.size = 0
+        self.row_of = {}
+
+    def _grow(self, needed):
+        capacity = len(self.project_ids)
+        if self.size + needed <= capacity:
+            return
+        new_capacity = max(capacity * 2, self.size + needed, 64)
+        for name in ('project_ids', 'owner_ids', 'created_ts', 'live', 'skill_bits', 'role_bits'):
+            old = getattr(self, name)
+            grown = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, name, grown)
+
+    def _load_projects(self, session, project_ids=None):
+        """Return [(id, owner_id, created_at, skill_ids, role_ids)] for active projects"""
+        query = session.query(Project.id, Project.owner_id, Project.created_at).filter(Project.is_active == True)
+        if project_ids is not None:
+            query = query.filter(Project.id.in_(project_ids))
+        projects = {row.id: (row.owner_id, row.created_at, [], []) for row in query.all()}
+        if not projects:
+            return []
+
+        skill_query = session.query(project_skills.c.project_id, project_skills.c.skill_id)
+        role_query = session.query(project_roles.c.project_id, project_roles.c.role_id)
+        if project_ids is not None:
+            skill_query = skill_query.filter(project_skills.c.project_id.in_(project_ids))
+            role_query = role_query.filter(project_roles.c.project_id.in_(project_ids))
+
+        for project_id, skill_id in skill_query.all():
+            if project_id in projects:
+                projects[project_id][2].append(skill_id)
+        for project_id, role_id in role_query.all():
+            if project_id in projects:
+                projects[project_id][3].append(role_id)
+
+        return [(project_id,) + values for project_id, values in projects.items()]
+
+    def _append(self, rows):
+        self._grow(len(rows))
+        for project_id, owner_id, created_at, skill_ids, role_ids in rows:
+            row = self.size
+            self.project_ids[row] = project_id
+            self.owner_ids[row] = owner_id
+            self.created_ts[row] = created_at.timestamp() if created_at else 0
+            self.skill_bits[row] = self.skill_layout.pack(skill_ids)
+            self.role_bits[row] = self.role_layout.pack(role_ids)
+            self.live[row] = True
+            self.row_of[project_id] = row
+            self.size += 1
+
+    def _compute_weights(self):
+        """Weight skill categories by rarity, so matching a niche skill counts for more"""
+        live = self.live[:self.size]
+        skill_bits = self.skill_bits[:self.size]
+        total = int(live.sum())
+
+        self.category_weights = np.ones(len(self.skill_layout.categories), dtype=np.float64)
+        required = np.zeros(self.size, dtype=np.float64)
+        for index, mask in enumerate(self.skill_layout.category_masks):
+            counts = popcount_rows(skill_bits & mask)
+            projects_needing = int(((counts > 0) & live).sum())
+            weight = 1.0 + math.log((total + 1) / (projects_needing + 1))
+            self.category_weights[index] = weight
+            required += weight * counts
+
+        self.required_skill_weight = required
+        self.required_roles = popcount_rows(self.role_bits[:self.size])
+
+    def _build(self, session):
+        fresh = ProjectMatchIndex()
+        fresh.skill_layout = BitLayout(session.query(Skill.id, Skill.category).all())
+        fresh.role_layout = BitLayout(session.query(Role.id, Role.category).all())
+        rows = fresh._load_projects(session)
+        fresh._allocate(max(64, len(rows) * 2))
+        fresh._append(rows)
+        fresh._compute_weights()
+        return fresh
+
+    def _install(self, fresh):
+        for name in self._INDEX_STATE:
+            setattr(self, name, getattr(fresh, name))
+        # Cached user bitsets follow the old skill/role layout
+        self._user_bits.clear()
+
+    def _size(self):
+        return self.size
+
+    def _apply_changes(self, session):
+        changed = list(self._dirty)
+        self._dirty.clear()
+        rows = self._load_projects(session, changed)
+
+        if not all(self.skill_layout.knows(row[3]) and self.role_layout.knows(row[4]) for row in rows):
+            # A skill or role we have no bit for yet; lay the bitsets out again
+            self.rebuild(session)
+            return
+
+        for project_id in changed:
+            row = self.row_of.pop(project_id, None)
+            if row is not None:
+                self.live[row] = False
+
+        self._append(rows)
+
+        # Compact once dead rows make up most of the arrays
+        if self.size > 64 and len(self.row_of) < self.size // 2:
+            self.rebuild(session)
+            return
+
+        self._compute_weights()
+
+    # Scoring
+
+    def _bits_for_user(self, session, user_id):
+        cached = self._user_bits.get(user_id)
+        if cached is not None:
+            return cached
+
+        skill_ids = [row[0] for row in session.query(user_skills.c.skill_id).filter(user_skills.c.user_id == user_id).all()]
+        role_ids = [row[0] for row in session.query(user_roles.c.role_id).filter(user_roles.c.user_id == user_id).all()]
+        bits = (self.skill_layout.pack(skill_ids), self.role_layout.pack(role_ids))
+
+        if len(self._user_bits) >= USER_BITS_CACHE_SIZE:
+            self._user_bits.clear()
+        self._user_bits[user_id] = bits
+        return bits
+
+    def suggest(self, session, user_id, limit):
+        """Return [(project_id, score)] for the best matching projects, best first.
+
+        Scores are in [0, 1]: weighted skill coverage and role coverage of
+        each project's requirements, blended with project recency.
+        """
+        self.ensure_fresh(session)
+
+        with self._lock:
+            if self.size == 0 or limit <= 0:
+                return []
+
+            user_skill_bits, user_role_bits = self._bits_for_user(session, user_id)
+            size = self.size
+
+            candidates = self.live[:size] & (self.owner_ids[:size] != user_id)
+            if not candidates.any():
+                return []
+
+            matched_skills = self.skill_bits[:size] & user_skill_bits
+            matched_weight = np.zeros(size, dtype=np.float64)
+            for weight, mask in zip(self.category_weights, self.skill_layout.category_masks):
+                matched_weight += weight * popcount_rows(matched_skills & mask)
+
+            required_weight = self.required_skill_weight
+            skill_score = np.divide(matched_weight, required_weight, out=np.zeros(size), where=required_weight > 0)
+
+            required_roles = self.required_roles
+            matched_roles = popcount_rows(self.role_bits[:size] & user_role_bits)
+            role_score = np.divide(matched_roles, required_roles, out=np.zeros(size), where=required_roles > 0)
+
+            match = np.where(
+                required_roles > 0,
+                MATCH_SKILL_WEIGHT * skill_score + MATCH_ROLE_WEIGHT * role_score,
+                skill_score
+            )
+            # Projects with no roles listed are judged on skills alone, and vice versa
+            match = np.where(required_weight > 0, match, role_score)
+
+            age_days = np.maximum(_now_timestamp() - self.created_ts[:size], 0) / 86400
+            recency = np.exp2(-age_days / MATCH_RECENCY_HALF_LIFE_DAYS)
+
+            scores = (1 - MATCH_RECENCY_WEIGHT) * match + MATCH_RECENCY_WEIGHT * recency
+            scores = np.where(candidates, scores, -1.0)
+
+            count = min(limit, int(candidates.sum()))
+            top = np.argpartition(-scores, count - 1)[:count] if count < size else np.arange(size)
+            top = top[np.argsort(-scores[top], kind='stable')][:count]
+
+            return [(int(self.project_ids[row]), float(scores[row])) for row in top]
+
+class TeammateIndex(IncrementalIndex):
+    """Inverted skill/role -> user index of people open to opportunities.
+
+    Postings are arrays of user rows, so a query is one np.bincount over
+    the postings of the post's skills and roles. Users changed in this
+    process are re-indexed into small delta lists until the next rebuild.
+    """
+
+    index_name = 'Teammate index'
+    item_name = 'users'
+    rebuild_seconds = MATCH_INDEX_REBUILD_SECONDS
+
+    @staticmethod
+    def _availability_code(codes, availability):
+        key = (availability or '').strip().lower()
+        code = codes.get(key)
+        if code is None:
+            code = len(codes)
+            codes[key] = code
+        return code
+
+    def _load_users(self, session, user_ids=None):
+        query = session.query(User.id, User.availability).filter(
+            User.is_active == True,
+            User.open_to_opportunities == True
+        )
+        if user_ids is not None:
+            query = query.filter(User.id.in_(user_ids))
+        return query.order_by(User.id).all()
+
+    def _load_memberships(self, session, table, column, user_ids=None):
+        # Core select: this reads every membership row on a rebuild
+        query = select(table.c.user_id, column)
+        if user_ids is not None:
+            query = query.where(table.c.user_id.in_(user_ids))
+        return session.execute(query).all()
+
+    @staticmethod
+    def _build_postings(user_ids, memberships):
+        if not memberships or len(user_ids) == 0:
+            return {}
+        pairs = np.array([(user_id, key) for user_id, key in memberships], dtype=np.int64)
+        member_ids, keys = pairs[:, 0], pairs[:, 1]
+
+        # user_ids is sorted by id, so rows can be found by binary search
+        rows = np.minimum(np.searchsorted(user_ids, member_ids), len(user_ids) - 1)
+        indexed = user_ids[rows] == member_ids
+        rows, keys = rows[indexed], keys[indexed]
+
+        order = np.argsort(keys, kind='stable')
+        rows, keys = rows[order], keys[order]
+        unique_keys, starts = np.unique(keys, return_index=True)
+        return {int(key): postings for key, postings in zip(unique_keys, np.split(rows, starts[1:]))}
+
+    def _build(self, session):
+        users = self._load_users(session)
+        codes = {}
+        user_ids = np.array([row.id for row in users], dtype=np.int64)
+        availability = np.array([self._availability_code(codes, row.availability) for row in users], dtype=np.int16)
+        skill_postings = self._build_postings(user_ids, self._load_memberships(session, user_skills, user_skills.c.skill_id))
+        role_postings = self._build_postings(user_ids, self._load_memberships(session, user_roles, user_roles.c.role_id))
+
+        return codes, user_ids, availability, skill_postings, role_postings
+
+    def _install(self, state):
+        self._availability_codes, self.user_ids, self.availability, self.skill_postings, self.role_postings = state
+        self.live = np.ones(len(self.user_ids), dtype=bool)
+        self.row_of = {int(user_id): row for row, user_id in enumerate(self.user_ids)}
+        self.skill_delta = defaultdict(list)
+        self.role_delta = defaultdict(list)
+        self._delta_size = 0
+
+    def _size(self):
+        return len(self.user_ids)
+
+    def _apply_changes(self, session):
+        changed = list(self._dirty)
+        self._dirty.clear()
+
+        for user_id in changed:
+            row = self.row_of.pop(user_id, None)
+            if row is not None:
+                self.live[row] = False
+
+        users = self._load_users(session, changed)
+        if users:
+            first_row = len(self.user_ids)
+            self.user_ids = np.concatenate([self.user_ids, np.array([row.id for row in users], dtype=np.int64)])
+            self.availability = np.concatenate([
+                self.availability,
+                np.array([self._availability_code(self._availability_codes, row.availability) for row in users], dtype=np.int16)
+            ])
+            self.live = np.concatenate([self.live, np.ones(len(users), dtype=bool)])
+            for offset, row in enumerate(users):
+                self.row_of[row.id] = first_row + offset
+
+            ids = [row.id for row in users]
+            for user_id, skill_id in self._load_memberships(session, user_skills, user_skills.c.skill_id, ids):
+                self.skill_delta[skill_id].append(self.row_of[user_id])
+                self._delta_size += 1
+            for user_id, role_id in self._load_memberships(session, user_roles, user_roles.c.role_id, ids):
+                self.role_delta[role_id].append(self.row_of[user_id])
+                self._delta_size += 1
+
+        # Fold the deltas back into the main postings once they grow large
+        dead = len(self.user_ids) - len(self.row_of)
+        if self._delta_size > 10000 or dead > max(1000, len(self.user_ids) // 4):
+            self.rebuild(session)
+
+    def _hits(self, postings, delta, keys, size):
+        parts = []
+        for key in keys:
+            if key in postings:
+                parts.append(postings[key])
+            if delta.get(key):
+                parts.append(np.array(delta[key], dtype=np.int64))
+        if not parts:
+            return np.zeros(size, dtype=np.int64)
+        return np.bincount(np.concatenate(parts), minlength=size)
+
+    def rank(self, session, skill_ids, role_ids, availability=None, exclude_user_ids=(), offset=0, limit=20):
+        """Rank users by coverage of the given skills and roles.
+
+        availability is a collection of accepted values ('' meaning not
+        stated), or None for any. Returns (total, [(user_id, score)]) for
+        the requested slice, best first; only users matching at least one
+        skill or role are counted.
+        """
+        self.ensure_fresh(session)
+        skill_ids, role_ids = set(skill_ids), set(role_ids)
+
+        with self._lock:
+            size = len(self.user_ids)
+            if size == 0 or not (skill_ids or role_ids):
+                return 0, []
+
+            skill_score = self._hits(self.skill_postings, self.skill_delta, skill_ids, size) / max(len(skill_ids), 1)
+            if role_ids:
+                role_score = self._hits(self.role_postings, self.role_delta, role_ids, size) / len(role_ids)
+                scores = MATCH_SKILL_WEIGHT * skill_score + MATCH_ROLE_WEIGHT * role_score if skill_ids else role_score
+            else:
+                scores = skill_score
+
+            candidates = self.live & (scores > 0)
+            if availability is not None:
+                codes = [self._availability_codes[key] for key in availability if key in self._availability_codes]
+                candidates &= np.isin(self.availability, codes)
+            for user_id in exclude_user_ids:
+                row = self.row_of.get(user_id)
+                if row is not None:
+                    candidates[row] = False
+
+            rows = np.flatnonzero(candidates)
+            total = len(rows)
+            wanted = offset + limit
+            if total == 0 or offset >= total:
+                return total, []
+
+            row_scores = scores[rows]
+            if wanted < total:
+                # Only sort users scoring at least the wanted-th best score
+                threshold = np.partition(row_scores, total - wanted)[total - wanted]
+                keep = row_scores >= threshold
+                rows, row_scores = rows[keep], row_scores[keep]
+
+            # Best score first, then lowest user id, so pages are stable
+            order = np.lexsort((self.user_ids[rows], -row_scores))[offset:wanted]
+            return total, [(int(self.user_ids[rows[index]]), float(row_scores[index])) for index in order]
+
+project_index = ProjectMatchIndex()
+teammate_index = TeammateIndex()
+
+def mark_project_changed(project_id):
+    """Re-index a project (created, edited or deleted) on the next suggestion request"""
+    project_index.mark_changed(project_id)
+
+def mark_user_skills_changed(user_id):
+    """Re-index a user after a profile update (skills, roles, availability or activation)"""
+    project_index.mark_user_changed(user_id)
+    teammate_index.mark_changed(user_id)
+
+def get_teammate_candidates(session, skill_ids, role_ids, exclude_user_ids):
+    """One page of ranked teammate candidates for a post's skills and roles.
+
+    Reads page, per_page and availability from the query string. By
+    default users who are available or have not said are included;
+    ?availability=available,busy picks exact values and "any" disables
+    the filter. Returns (candidates, pagination).
+    """
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+    availability_arg = request.args.get('availability', '').strip().lower()
+    if availability_arg == 'any':
+        availability = None
+    elif availability_arg:
+        availability = {value.strip() for value in availability_arg.split(',') if value.strip()}
+    else:
+        availability = {'available', ''}
+
+    total, ranked = teammate_index.rank(
+        session, skill_ids, role_ids,
+        availability=availability,
+        exclude_user_ids=exclude_user_ids,
+        offset=(page - 1) * per_page,
+        limit=per_page
+    )
+
+    users = session.query(User).options(
+        selectinload(User.skills),
+        selectinload(User.roles)
+    ).filter(User.id.in_([user_id for user_id, _ in ranked])).all()
+    users_by_id = {user.id: user for user in users}
+
+    skill_ids, role_ids = set(skill_ids), set(role_ids)
+    candidates = []
+    for user_id, score in ranked:
+        user = users_by_id.get(user_id)
+        if user is None:
+            continue
+        candidates.append({
+            "id": user.id,
+            "username": user.username,
+            "full_name": user.full_name,
+            "avatar_url": user.avatar_url,
+            "bio": user.bio,
+            "location": user.location,
+            "experience": user.experience,
+            "availability": user.availability,
+            "match_score": round(score * 100),
+            "matched_skills": [{"id": skill.id, "name": skill.name, "category": skill.category} for skill in user.skills if skill.id in skill_ids],
+            "matched_roles": [{"id": role.id, "name": role.name, "category": role.category} for role in user.roles if role.id in role_ids]
+        })
+
+    pagination = {
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "pages": (total + per_page - 1) // per_page
+    }
+    return candidates, pagination
@@ -0,0 +1,150 @@
+from socketio import PubSubManager
+from urllib.parse import urlparse
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Socket.IO rooms live in the memory of the process a client is connected
+# to, so without a message queue an emit only reaches clients of the same
+# worker. With SOCKETIO_MESSAGE_QUEUE set, every emit is published to the
+# queue and each worker delivers it to its own members of the room:
+#
+#   redis://host:6379/0   Redis pub/sub (needs the redis package)
+#   amqp://...            anything else is handed to kombu
+#   tcp://host:port       the local broker below, for tests and
+#                         single-machine setups without Redis
+#
+# Running more than one worker also needs sticky sessions: Engine.IO
+# long-polling sends several HTTP requests per connection and they must
+# all reach the worker that holds the session (e.g. nginx ip_hash or a
+# cookie-based affinity on the load balancer). Clients that connect with
+# transports=['websocket'] only need the upgrade request routed once.
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'assemble-socketio')
+BROKER_RECONNECT_SECONDS = 1.0
+# First line of a listening connection; any other connection publishes
+SUBSCRIBE = b'subscribe\n'
+
+def socketio_queue_options(url=SOCKETIO_MESSAGE_QUEUE, channel=SOCKETIO_CHANNEL, write_only=False):
+    """Keyword arguments for SocketIO() that attach the configured message queue"""
+    if not url:
+        return {}
+    if url.startswith('tcp://'):
+        return {"client_manager": TcpBrokerManager(url, channel=channel, write_only=write_only)}
+    return {"message_queue": url, "channel": channel}
+
+def _broker_address(url):
+    parsed = urlparse(url)
+    return parsed.hostname or '127.0.0.1', parsed.port or 6380
+
+class TcpBrokerManager(PubSubManager):
+    """Socket.IO client manager publishing through the local TCP broker.
+
+    Messages are newline-delimited JSON, published on one connection and
+    received on another. The broker sends every message to every
+    subscriber, this process included, which is how PubSubManager
+    delivers emits to its own clients as well.
+    """
+    name = 'tcp'
+
+    def __init__(self, url, channel=SOCKETIO_CHANNEL, write_only=False, logger=None):
+        self.address = _broker_address(url)
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _connect(self):
+        return socket.create_connection(self.address)
+
+    def _publish(self, data):
+        frame = (json.dumps(dict(data, channel=self.channel)) + '\n').encode('utf-8')
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect()
+                    self._publisher.sendall(frame)
+                    return
+                except OSError as e:
+                    self._publisher = None
+                    if attempt:
+                        logger.error("Cannot publish to the message broker at %s: %s", self.address, e)
+
+    def _listen(self):
+        while True:
+            try:
+                with self._connect() as connection, connection.makefile('rb') as stream:
+                    connection.sendall(SUBSCRIBE)
+                    for line in stream:
+                        try:
+                            message = json.loads(line)
+                        except ValueError:
+                            logger.warning("Skipping a malformed message from the broker")
+                            continue
+                        if message.pop('channel', None) == self.channel:
+                            yield message
+            except OSError as e:
+                logger.warning("Lost the message broker at %s, reconnecting: %s", self.address, e)
+            time.sleep(BROKER_RECONNECT_SECONDS)
+
+class _BrokerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        first = self.rfile.readline()
+        if first == SUBSCRIBE:
+            # Subscribers only listen; hold the connection until they go
+            self.server.subscribe(self.wfile)
+            try:
+                self.rfile.read()
+            finally:
+                self.server.unsubscribe(self.wfile)
+            return
+
+        if first:
+            self.server.publish(first)
+        for line in self.rfile:
+            self.server.publish(line)
+
+class MessageBroker(socketserver.ThreadingTCPServer):
+    """Fan every line published on any connection out to every subscriber"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _BrokerHandler)
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self, stream):
+        with self._lock:
+            self._subscribers.add(stream)
+
+    def unsubscribe(self, stream):
+        with self._lock:
+            self._subscribers.discard(stream)
+
+    def publish(self, line):
+        with self._lock:
+            for stream in list(self._subscribers):
+                try:
+                    stream.write(line)
+                    stream.flush()
+                except OSError:
+                    self._subscribers.discard(stream)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local Socket.IO message broker (stand-in for Redis)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6380)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with MessageBroker((args.host, args.port)) as broker:
+        logger.info("Message broker listening on tcp://%s:%s", args.host, args.port)
+        broker.serve_forever()
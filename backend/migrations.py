@@ -0,0 +1,105 @@
+from sqlalchemy import inspect, text
+from contextlib import contextmanager
+from database import engine, Base, init_db
+from fulltext import create_fulltext_indexes
+from tags import backfill_paper_tags
+from counters import add_counter_columns
+from conversations import add_read_watermarks, backfill_conversations_if_empty
+import os
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# create_all() only creates missing tables, so anything added to a table
+# that already exists (indexes, columns, backfills) is applied here. Every
+# step inspects the live schema first and is safe to run on every start.
+#
+# Every worker runs them on import, so migrate() holds a cross-process
+# lock for the whole schema phase: the other workers wait, then find
+# nothing left to do. SQLite locks a file next to the database (SQLite is
+# single-host anyway); PostgreSQL takes a session advisory lock. Set
+# MIGRATE_ON_START=false to run `python migrations.py` as a deploy step
+# instead.
+MIGRATE_ON_START = os.getenv('MIGRATE_ON_START', 'true').lower() == 'true'
+# pg_advisory_lock key: 'assemble' as a 64-bit integer
+MIGRATION_LOCK_KEY = 0x617373656d626c65
+
+def create_missing_indexes(connection):
+    """Create indexes declared on the models that an existing database lacks"""
+    inspector = inspect(connection)
+    created = 0
+
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info("Creating index %s on %s", index.name, table.name)
+                index.create(connection)
+                created += 1
+
+    return created
+
+MIGRATIONS = [
+    ('create_missing_indexes', create_missing_indexes),
+    ('create_fulltext_indexes', create_fulltext_indexes),
+    ('backfill_paper_tags', backfill_paper_tags),
+    ('add_counter_columns', add_counter_columns),
+    ('add_read_watermarks', add_read_watermarks),
+]
+
+@contextmanager
+def migration_lock():
+    """Hold the cross-process schema lock; other workers block until it is released"""
+    url = engine.url
+    backend = url.get_backend_name()
+
+    if backend == 'sqlite' and fcntl is not None and url.database and url.database != ':memory:':
+        with open(f"{url.database}.migrate-lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    elif backend == 'postgresql':
+        with engine.connect() as connection:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            connection.commit()
+            try:
+                yield
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                connection.commit()
+    else:
+        # In-memory SQLite is private to the process; other backends are
+        # left to a separate migration step
+        yield
+
+def migrate():
+    """Create tables, apply every migration step and backfill, under the schema lock"""
+    with migration_lock():
+        init_db()
+        run_migrations()
+        backfill_conversations_if_empty()
+
+def run_migrations():
+    """Apply every migration step in order"""
+    for name, step in MIGRATIONS:
+        try:
+            with engine.begin() as connection:
+                result = step(connection)
+            logger.info("Migration %s applied (%s changes)", name, result)
+        except Exception as e:
+            logger.error("Migration %s failed: %s: %s", name, type(e).__name__, e)
+            raise
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    migrate()
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
+from pagination import get_cursor_args, cursor_page
+from identity import get_current_user_id
+from bulk import mark_read
 from database import Session, User, Notification
 
 notifications_bp = Blueprint('notifications', __name__, url_prefix='/api/notifications')
@@ -9,13 +12,20 @@ notifications_bp = Blueprint('notifications', __name__, url_prefix='/api/notific
 def get_notifications():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = get_current_user_id()
+        if current_user_id is None:
+            return jsonify({"error": "User not found"}), 404
         
         # Get query parameters
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 20, type=int), 100)
         unread_only = request.args.get('unread_only', 'false').lower() == 'true'
         
+        try:
+            cursor_mode, cursor, include_total = get_cursor_args()
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        
         # Base query
         query = session.query(Notification).filter_by(user_id=current_user_id)
         
@@ -23,12 +33,21 @@ def get_notifications():
         if unread_only:
             query = query.filter_by(is_read=False)
         
-        # Get total count
-        total = query.count()
-        
-        # Apply pagination
-        offset = (page - 1) * per_page
-        notifications = query.order_by(Notification.created_at.desc()).offset(offset).limit(per_page).all()
+        if cursor_mode:
+            notifications, pagination = cursor_page(query, Notification.created_at, Notification.id, cursor, per_page, include_total)
+        else:
+            # Get total count
+            total = query.count()
+            
+            # Apply pagination
+            offset = (page - 1) * per_page
+            notifications = query.order_by(Notification.created_at.desc()).offset(offset).limit(per_page).all()
+            pagination = {
+                "page": page,
+                "per_page": per_page,
+                "total": total,
+                "pages": (total + per_page - 1) // per_page
+            }
         
         # Serialize notifications
         notifications_data = []
@@ -44,12 +63,7 @@ def get_notifications():
         
         return jsonify({
             "notifications": notifications_data,
-            "pagination": {
-                "page": page,
-                "per_page": per_page,
-                "total": total,
-                "pages": (total + per_page - 1) // per_page
-            }
+            "pagination": pagination
         }), 200
         
     except Exception as e:
@@ -62,7 +76,9 @@ def get_notifications():
 def mark_notification_read(notification_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = get_current_user_id()
+        if current_user_id is None:
+            return jsonify({"error": "User not found"}), 404
         
         notification = session.query(Notification).filter_by(
             id=notification_id,
@@ -88,19 +104,14 @@ def mark_notification_read(notification_id):
 def mark_all_notifications_read():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        
-        notifications = session.query(Notification).filter_by(
-            user_id=current_user_id,
-            is_read=False
-        ).all()
-        
-        for notification in notifications:
-            notification.is_read = True
+        current_user_id = get_current_user_id()
+        if current_user_id is None:
+            return jsonify({"error": "User not found"}), 404
         
+        updated = mark_read(session, Notification, Notification.user_id == current_user_id)
         session.commit()
         
-        return jsonify({"message": f"Marked {len(notifications)} notifications as read"}), 200
+        return jsonify({"message": f"Marked {updated} notifications as read", "updated": updated}), 200
         
     except Exception as e:
         session.rollback()
@@ -113,7 +124,9 @@ def mark_all_notifications_read():
 def delete_notification(notification_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = get_current_user_id()
+        if current_user_id is None:
+            return jsonify({"error": "User not found"}), 404
         
         notification = session.query(Notification).filter_by(
             id=notification_id,
@@ -139,7 +152,9 @@ def delete_notification(notification_id):
 def get_notification_count():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = get_current_user_id()
+        if current_user_id is None:
+            return jsonify({"error": "User not found"}), 404
         
         total_count = session.query(Notification).filter_by(user_id=current_user_id).count()
         unread_count = session.query(Notification).filter_by(user_id=current_user_id, is_read=False).count()
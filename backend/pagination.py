@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+
+def encode_cursor(created_at, row_id):
+    """Build an opaque cursor from the (created_at, id) of the last row on a page"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Parse a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def keyset_before(created_column, id_column, cursor):
+    """Filter for rows that sort after the cursor in (created_at DESC, id DESC) order"""
+    created_at, row_id = cursor
+    return or_(
+        created_column < created_at,
+        and_(created_column == created_at, id_column < row_id)
+    )
+
+def get_cursor_args():
+    """Read cursor pagination options from the query string.
+
+    Returns (cursor_mode, cursor, include_total). Passing ?cursor= (even
+    empty, for the first page) opts in; the total count is only computed
+    when ?include_total=true is given. Raises ValueError on a bad cursor.
+    """
+    if 'cursor' not in request.args:
+        return False, None, False
+
+    token = request.args.get('cursor', '').strip()
+    cursor = decode_cursor(token) if token else None
+    include_total = request.args.get('include_total', 'false').lower() == 'true'
+    return True, cursor, include_total
+
+def cursor_page(query, created_column, id_column, cursor, per_page, include_total=False):
+    """Fetch one (created_at DESC, id DESC) page after the cursor.
+
+    Returns (items, pagination) where pagination carries the opaque
+    next_cursor, has_more and, if requested, the total.
+    """
+    pagination = {"per_page": per_page}
+
+    if include_total:
+        pagination["total"] = query.order_by(None).count()
+
+    if cursor:
+        query = query.filter(keyset_before(created_column, id_column, cursor))
+
+    # One extra row tells us whether there is a next page
+    items = query.order_by(created_column.desc(), id_column.desc()).limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    pagination["has_more"] = has_more
+    pagination["next_cursor"] = None
+    if has_more:
+        last = items[-1]
+        pagination["next_cursor"] = encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
+
+    return items, pagination
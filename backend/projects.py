@@ -1,8 +1,14 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from datetime import datetime, timezone
 import pytz
-from database import Session, User, Project, Skill, Role, ProjectApplication, Notification, ActivityLog, ProjectMilestone, Report
+from sqlalchemy.orm import joinedload, selectinload
+from pagination import get_cursor_args, cursor_page
+from identity import get_current_user, get_current_user_id
+from matching import project_index, mark_project_changed, get_teammate_candidates
+from fulltext import fulltext_search
+from counters import application_created, application_status_changed, bookmark_added, bookmark_removed, report_created
+from database import Session, User, Project, Skill, Role, ProjectApplication, Notification, ActivityLog, ProjectMilestone, Report, user_skills
 import logging
 
 projects_bp = Blueprint('projects', __name__, url_prefix='/api/projects')
@@ -19,36 +25,66 @@ def get_projects():
         search = request.args.get('search', '').strip()
         skill_id = request.args.get('skill_id', type=int)
         
+        try:
+            cursor_mode, cursor, include_total = get_cursor_args()
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        
         # Base query
         query = session.query(Project).filter(Project.is_active == True)
         
         # Apply filters
         if search:
+            # Substring match, as the list filter always did; ranked
+            # full-text search is /api/projects/search
             query = query.filter(Project.name.ilike(f'%{search}%'))
         
         if skill_id:
             query = query.join(Project.skills).filter(Skill.id == skill_id)
         
-        # Get total count
-        total = query.count()
+        # Owner, skills and roles are loaded up front so serializing the
+        # page does not issue per-row queries
+        query = query.options(
+            joinedload(Project.owner),
+            selectinload(Project.skills),
+            selectinload(Project.roles)
+        )
         
-        # Apply pagination
-        offset = (page - 1) * per_page
-        projects = query.order_by(Project.created_at.desc()).offset(offset).limit(per_page).all()
+        if cursor_mode:
+            projects, pagination = cursor_page(query, Project.created_at, Project.id, cursor, per_page, include_total)
+        else:
+            # Get total count
+            total = query.count()
+            
+            # Apply pagination
+            offset = (page - 1) * per_page
+            projects = query.order_by(Project.created_at.desc()).offset(offset).limit(per_page).all()
+            pagination = {
+                "page": page,
+                "per_page": per_page,
+                "total": total,
+                "pages": (total + per_page - 1) // per_page
+            }
         
         # Get current user for checking applications
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        current_user_id = get_current_user_id()
+        
+        project_ids = [project.id for project in projects]
+        
+        # Projects on this page the current user has applied to
+        applied_project_ids = set()
+        if project_ids:
+            if current_user_id:
+                applied_project_ids = {
+                    row[0] for row in session.query(ProjectApplication.project_id).filter(
+                        ProjectApplication.project_id.in_(project_ids),
+                        ProjectApplication.user_id == current_user_id
+                    ).all()
+                }
         
         # Serialize projects
         projects_data = []
         for project in projects:
-            # Check if current user has applied
-            has_applied = session.query(ProjectApplication).filter_by(
-                project_id=project.id,
-                user_id=user.id if user else None
-            ).first() is not None
-            
             projects_data.append({
                 "id": project.id,
                 "name": project.name,
@@ -65,13 +101,65 @@ def get_projects():
                 },
                 "skills": [{"id": skill.id, "name": skill.name, "category": skill.category} for skill in project.skills],
                 "roles": [{"id": role.id, "name": role.name, "description": role.description, "category": role.category} for role in project.roles],
-                "application_count": len(project.applications),
-                "has_applied": has_applied,
-                "is_owner": project.owner_id == (user.id if user else None)
+                "application_count": project.application_count,
+                "has_applied": project.id in applied_project_ids,
+                "is_owner": project.owner_id == current_user_id
             })
         
         return jsonify({
             "projects": projects_data,
+            "pagination": pagination
+        }), 200
+        
+    except Exception as e:
+        logger.error("Failed to fetch projects: %s", e)
+        return jsonify({"error": "Failed to fetch projects"}), 500
+    finally:
+        session.close()
+
+@projects_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_projects():
+    session = Session()
+    try:
+        search = request.args.get('q', '').strip()
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 10, type=int), 1), 50)
+        
+        if not search:
+            return jsonify({"error": "Search query is required"}), 400
+        
+        total, hits = fulltext_search(session, 'projects', search, offset=(page - 1) * per_page, limit=per_page)
+        
+        projects = session.query(Project).options(
+            joinedload(Project.owner),
+            selectinload(Project.skills)
+        ).filter(Project.id.in_([project_id for project_id, _, _ in hits])).all()
+        projects_by_id = {project.id: project for project in projects}
+        
+        results = []
+        for project_id, score, snippet in hits:
+            project = projects_by_id.get(project_id)
+            if project is None:
+                continue
+            results.append({
+                "id": project.id,
+                "name": project.name,
+                "status": project.status,
+                "created_at": project.created_at.isoformat(),
+                "owner": {
+                    "id": project.owner.id,
+                    "username": project.owner.username,
+                    "full_name": project.owner.full_name,
+                    "avatar_url": project.owner.avatar_url
+                },
+                "skills": [{"id": skill.id, "name": skill.name, "category": skill.category} for skill in project.skills],
+                "score": round(score, 6),
+                "snippet": snippet
+            })
+        
+        return jsonify({
+            "results": results,
             "pagination": {
                 "page": page,
                 "per_page": per_page,
@@ -81,8 +169,8 @@ def get_projects():
         }), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch projects: {str(e)}")
-        return jsonify({"error": "Failed to fetch projects"}), 500
+        logger.error("Failed to search projects: %s", e)
+        return jsonify({"error": "Failed to search projects"}), 500
     finally:
         session.close()
 
@@ -91,33 +179,39 @@ def get_projects():
 def get_project_suggestions():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user_id = get_current_user_id()
         
-        if not user:
+        if not user_id:
             return jsonify({"error": "User not found"}), 404
         
-        limit = request.args.get('limit', 5, type=int)
+        limit = min(request.args.get('limit', 5, type=int), 50)
         
-        # Get recent active projects (excluding user's own projects)
-        recent_projects = session.query(Project).filter(
-            Project.is_active == True,
-            Project.owner_id != user.id
-        ).order_by(Project.created_at.desc()).limit(limit * 2).all()
+        # Score every active project (excluding user's own) against the user's skills and roles
+        ranked = project_index.suggest(session, user_id, limit)
         
-        if not recent_projects:
+        if not ranked:
             return jsonify([]), 200
         
-        suggestions = []
+        projects = session.query(Project).options(
+            joinedload(Project.owner),
+            selectinload(Project.skills)
+        ).filter(Project.id.in_([project_id for project_id, _ in ranked])).all()
+        projects_by_id = {project.id: project for project in projects}
         
-        # Simply return recent projects
-        for project in recent_projects[:limit]:
+        user_skill_ids = {row[0] for row in session.query(user_skills.c.skill_id).filter(user_skills.c.user_id == user_id).all()}
+        
+        suggestions = []
+        for project_id, score in ranked:
+            project = projects_by_id.get(project_id)
+            if project is None:
+                continue
             suggestions.append({
                 "id": project.id,
                 "name": project.name,
                 "description": project.description,
-                "match_score": 75,  # Static score for recent projects
+                "match_score": round(score * 100),
                 "skills": [{"id": skill.id, "name": skill.name} for skill in project.skills],
+                "matched_skills": [{"id": skill.id, "name": skill.name} for skill in project.skills if skill.id in user_skill_ids],
                 "owner": {
                     "id": project.owner.id,
                     "username": project.owner.username,
@@ -128,7 +222,7 @@ def get_project_suggestions():
         return jsonify(suggestions), 200
         
     except Exception as e:
-        logger.error(f"Failed to get recent projects: {str(e)}")
+        logger.error("Failed to get project suggestions: %s", e)
         return jsonify({"error": "Failed to get suggestions"}), 500
     finally:
         session.close()
@@ -144,11 +238,10 @@ def get_project(project_id):
             return jsonify({"error": "Project not found"}), 404
         
         # Check if current user has applied
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        current_user_id = get_current_user_id()
         has_applied = session.query(ProjectApplication).filter_by(
             project_id=project_id,
-            user_id=user.id if user else None
+            user_id=current_user_id
         ).first() is not None
         
         project_data = {
@@ -170,15 +263,15 @@ def get_project(project_id):
             },
             "skills": [{"id": skill.id, "name": skill.name, "category": skill.category} for skill in project.skills],
             "roles": [{"id": role.id, "name": role.name, "description": role.description, "category": role.category} for role in project.roles],
-            "application_count": len(project.applications),
+            "application_count": project.application_count,
             "has_applied": has_applied,
-            "is_owner": project.owner_id == (user.id if user else None)
+            "is_owner": project.owner_id == current_user_id
         }
         
         return jsonify(project_data), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch project: {str(e)}")
+        logger.error("Failed to fetch project: %s", e)
         return jsonify({"error": "Failed to fetch project"}), 500
     finally:
         session.close()
@@ -188,8 +281,7 @@ def get_project(project_id):
 def create_project():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -224,6 +316,7 @@ def create_project():
         
         session.add(project)
         session.commit()
+        mark_project_changed(project.id)
         
         # Log activity
         activity = ActivityLog(
@@ -242,7 +335,7 @@ def create_project():
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to create project: {str(e)}")
+        logger.error("Failed to create project: %s", e)
         return jsonify({"error": "Failed to create project"}), 500
     finally:
         session.close()
@@ -252,8 +345,7 @@ def create_project():
 def apply_to_project(project_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -285,6 +377,7 @@ def apply_to_project(project_id):
         )
         
         session.add(application)
+        application_created(session, Project, project_id)
         
         # Create notification for project owner
         notification = Notification(
@@ -311,18 +404,56 @@ def apply_to_project(project_id):
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to submit application: {str(e)}")
+        logger.error("Failed to submit application: %s", e)
         return jsonify({"error": "Failed to submit application"}), 500
     finally:
         session.close()
 
+@projects_bp.route('/<int:project_id>/candidates', methods=['GET'])
+@jwt_required()
+def get_project_candidates(project_id):
+    session = Session()
+    try:
+        user_id = get_current_user_id()
+        
+        if not user_id:
+            return jsonify({"error": "User not found"}), 404
+        
+        project = session.query(Project).options(
+            selectinload(Project.skills),
+            selectinload(Project.roles)
+        ).filter_by(id=project_id, owner_id=user_id).first()
+        if not project:
+            return jsonify({"error": "Project not found or not owned by you"}), 404
+        
+        # Skip the owner and anyone who already applied
+        applicant_ids = {row[0] for row in session.query(ProjectApplication.user_id).filter_by(project_id=project_id).all()}
+        applicant_ids.add(user_id)
+        
+        candidates, pagination = get_teammate_candidates(
+            session,
+            [skill.id for skill in project.skills],
+            [role.id for role in project.roles],
+            applicant_ids
+        )
+        
+        return jsonify({
+            "candidates": candidates,
+            "pagination": pagination
+        }), 200
+        
+    except Exception as e:
+        logger.error("Failed to find candidates for project: %s", e)
+        return jsonify({"error": "Failed to find candidates"}), 500
+    finally:
+        session.close()
+
 @projects_bp.route('/<int:project_id>/applications', methods=['GET'])
 @jwt_required()
 def get_project_applications(project_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -357,7 +488,7 @@ def get_project_applications(project_id):
         return jsonify(applications_data), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch applications: {str(e)}")
+        logger.error("Failed to fetch applications: %s", e)
         return jsonify({"error": "Failed to fetch applications"}), 500
     finally:
         session.close()
@@ -367,8 +498,7 @@ def get_project_applications(project_id):
 def update_application_status(application_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -387,6 +517,7 @@ def update_application_status(application_id):
         if new_status not in ['accepted', 'rejected']:
             return jsonify({"error": "Invalid status"}), 400
         
+        application_status_changed(session, Project, application.project_id, application.status, new_status)
         application.status = new_status
         
         # Create notification for applicant
@@ -414,7 +545,7 @@ def update_application_status(application_id):
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to update application status: {str(e)}")
+        logger.error("Failed to update application status: %s", e)
         return jsonify({"error": "Failed to update application status"}), 500
     finally:
         session.close()
@@ -424,8 +555,7 @@ def update_application_status(application_id):
 def get_my_projects():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -446,13 +576,15 @@ def get_my_projects():
                 "updated_at": project.updated_at.isoformat(),
                 "skills": [{"id": skill.id, "name": skill.name, "category": skill.category} for skill in project.skills],
                 "roles": [{"id": role.id, "name": role.name, "description": role.description, "category": role.category} for role in project.roles],
-                "application_count": len(project.applications)
+                "application_count": project.application_count,
+                "pending_application_count": project.pending_application_count,
+                "bookmark_count": project.bookmark_count
             })
         
         return jsonify(projects_data), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch your projects: {str(e)}")
+        logger.error("Failed to fetch your projects: %s", e)
         return jsonify({"error": "Failed to fetch your projects"}), 500
     finally:
         session.close()
@@ -462,8 +594,7 @@ def get_my_projects():
 def get_my_applications():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -493,7 +624,7 @@ def get_my_applications():
         return jsonify(applications_data), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch your applications: {str(e)}")
+        logger.error("Failed to fetch your applications: %s", e)
         return jsonify({"error": "Failed to fetch your applications"}), 500
     finally:
         session.close()
@@ -503,8 +634,7 @@ def get_my_applications():
 def bookmark_project(project_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -518,13 +648,14 @@ def bookmark_project(project_id):
             return jsonify({"error": "Project already bookmarked"}), 400
         
         user.bookmarked_projects.append(project)
+        bookmark_added(session, project_id)
         session.commit()
         
         return jsonify({"message": "Project bookmarked successfully"}), 201
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to bookmark project: {str(e)}")
+        logger.error("Failed to bookmark project: %s", e)
         return jsonify({"error": "Failed to bookmark project"}), 500
     finally:
         session.close()
@@ -534,8 +665,7 @@ def bookmark_project(project_id):
 def remove_bookmark(project_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -549,13 +679,14 @@ def remove_bookmark(project_id):
             return jsonify({"error": "Project not bookmarked"}), 400
         
         user.bookmarked_projects.remove(project)
+        bookmark_removed(session, project_id)
         session.commit()
         
         return jsonify({"message": "Bookmark removed successfully"}), 200
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to remove bookmark: {str(e)}")
+        logger.error("Failed to remove bookmark: %s", e)
         return jsonify({"error": "Failed to remove bookmark"}), 500
     finally:
         session.close()
@@ -565,8 +696,7 @@ def remove_bookmark(project_id):
 def get_bookmarked_projects():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -588,13 +718,13 @@ def get_bookmarked_projects():
                     "avatar_url": project.owner.avatar_url
                 },
                 "skills": [{"id": skill.id, "name": skill.name, "category": skill.category} for skill in project.skills],
-                "application_count": len(project.applications)
+                "application_count": project.application_count
             })
         
         return jsonify(projects_data), 200
         
     except Exception as e:
-        logger.error(f"Failed to fetch bookmarked projects: {str(e)}")
+        logger.error("Failed to fetch bookmarked projects: %s", e)
         return jsonify({"error": "Failed to fetch bookmarked projects"}), 500
     finally:
         session.close()
@@ -604,8 +734,7 @@ def get_bookmarked_projects():
 def update_project(project_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -660,6 +789,7 @@ def update_project(project_id):
         
         project.updated_at = datetime.now(pytz.timezone('Asia/Kolkata'))
         session.commit()
+        mark_project_changed(project.id)
         
         # Log activity
         activity = ActivityLog(
@@ -675,7 +805,7 @@ def update_project(project_id):
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to update project: {str(e)}")
+        logger.error("Failed to update project: %s", e)
         return jsonify({"error": "Failed to update project"}), 500
     finally:
         session.close()
@@ -685,8 +815,7 @@ def update_project(project_id):
 def delete_project(project_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -698,6 +827,7 @@ def delete_project(project_id):
         project_name = project.name
         session.delete(project)
         session.commit()
+        mark_project_changed(project_id)
         
         # Log activity
         activity = ActivityLog(
@@ -713,7 +843,7 @@ def delete_project(project_id):
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to delete project: {str(e)}")
+        logger.error("Failed to delete project: %s", e)
         return jsonify({"error": "Failed to delete project"}), 500
     finally:
         session.close()
@@ -723,8 +853,7 @@ def delete_project(project_id):
 def report_project(project_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -759,15 +888,16 @@ def report_project(project_id):
         )
 
         session.add(report)
+        report_created(session, 'project', project_id)
         session.commit()
 
-        logger.info(f"Project reported: {project.name} by user {user.username}")
+        logger.info("Project reported: %s by user %s", project.name, user.username)
 
         return jsonify({"message": "Project reported successfully"}), 201
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to report project: {str(e)}")
+        logger.error("Failed to report project: %s", e)
         return jsonify({"error": "Failed to report project"}), 500
     finally:
         session.close()
\ No newline at end of file
@@ -0,0 +1,80 @@
+from flask import request
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from itsdangerous import URLSafeSerializer, BadSignature
+from database import replica_engine, set_read_routing, consume_write_flag
+import math
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# After a user writes, their reads stay on the primary for this long so
+# they see their own changes despite replication lag. The pin travels with
+# the client as a short-lived signed cookie, so it holds whichever worker
+# serves the next request.
+REPLICA_PIN_SECONDS = float(os.getenv('REPLICA_PIN_SECONDS', 5))
+PIN_COOKIE = 'primary_pin'
+
+READ_METHODS = ('GET', 'HEAD')
+
+def _request_identity():
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        # Bad tokens are rejected by the handler itself; just don't route
+        return None
+
+def _pin_serializer(app):
+    return URLSafeSerializer(app.config['JWT_SECRET_KEY'], salt='primary-pin')
+
+def pin_to_primary(app, response, identity):
+    """Pin identity's reads to the primary by setting the signed pin cookie"""
+    pin = _pin_serializer(app).dumps([identity, time.time() + REPLICA_PIN_SECONDS])
+    response.set_cookie(
+        PIN_COOKIE, pin,
+        max_age=math.ceil(REPLICA_PIN_SECONDS), httponly=True, samesite='Lax'
+    )
+
+def is_pinned(app, identity):
+    """Whether the request carries a live pin cookie for identity"""
+    pin = request.cookies.get(PIN_COOKIE)
+    if not pin:
+        return False
+    try:
+        pinned_identity, expires_at = _pin_serializer(app).loads(pin)
+    except (BadSignature, ValueError, TypeError):
+        # Forged or malformed; read from the replica
+        return False
+    return pinned_identity == identity and expires_at > time.time()
+
+def init_read_routing(app):
+    """Route read-only requests to the read replica when one is configured"""
+    if replica_engine is None:
+        logger.info("No read replica configured, all queries use the primary")
+        return
+
+    logger.info("Read replica routing enabled (pin after write: %ss)", REPLICA_PIN_SECONDS)
+
+    @app.before_request
+    def route_reads():
+        use_replica = False
+        if request.method in READ_METHODS:
+            identity = _request_identity()
+            use_replica = identity is None or not is_pinned(app, identity)
+        set_read_routing(use_replica)
+
+    @app.after_request
+    def pin_writers(response):
+        # Any write on the primary (including from GET handlers such as
+        # marking messages read) pins the user for read-your-writes
+        if consume_write_flag() and response.status_code < 400:
+            identity = _request_identity()
+            if identity is not None:
+                pin_to_primary(app, response, identity)
+        return response
+
+    @app.teardown_request
+    def reset_routing(exc):
+        set_read_routing(False)
@@ -0,0 +1,401 @@
+from sqlalchemy import select, func
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import numpy as np
+import argparse
+import json
+import shutil
+import time
+import zlib
+import re
+import os
+import logging
+from database import Session, init_db, ResearchPaper
+from incremental_index import IncrementalIndex
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# "Related papers" by cosine similarity of hashed TF-IDF vectors over each
+# paper's title, keywords and abstract. The matrix is kept both row-wise
+# (CSR: a paper's vector) and column-wise (CSC: the papers containing a
+# term), so a query only touches the postings of its own terms. Builds are
+# saved as .npy files and opened memory-mapped, so every worker shares one
+# copy and a restart does not recompute it. Papers added or edited since
+# the build are scored from small in-memory deltas using the build's IDF;
+# the periodic full rebuild refreshes the IDF and folds them in.
+#
+# Workers share the directory: whoever rebuilds writes a new build-*
+# directory, then, under a file lock, moves CURRENT forward and removes
+# finished builds older than the one CURRENT names. The others map the new
+# build on their next check. Papers created or edited by other workers are
+# found through updated_at; a paper another worker hard-deletes stays in
+# the index until the next rebuild, so callers filter hits on is_active.
+RELATED_INDEX_DIR = os.getenv('RELATED_INDEX_DIR', 'related_index')
+RELATED_REBUILD_SECONDS = float(os.getenv('RELATED_REBUILD_SECONDS', 3600))
+# How often a request looks for work done by other workers: a newer
+# persisted build, or papers created or edited since the last check
+RELATED_CHECK_SECONDS = float(os.getenv('RELATED_CHECK_SECONDS', 5))
+# Each check looks back this far past the newest updated_at it has seen,
+# for transactions that committed late and clock skew between workers
+RELATED_CHECK_OVERLAP = timedelta(seconds=30)
+# Rebuild early once this many papers are served from the delta
+RELATED_MAX_DELTA = 2000
+HASH_FEATURES = 1 << 18
+# Title and keyword terms say more about a paper than abstract terms
+TITLE_WEIGHT = 3.0
+KEYWORD_WEIGHT = 2.0
+
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers him his
+how i if in into is it its itself just me more most my no nor not now of off on once only or other our ours out over own
+paper propose proposed same she should so some such than that the their theirs them then there these they this those
+through to too under until up using very was we were what when where which while who whom why will with would you your
+""".split())
+
+_TOKEN = re.compile(r'\w{2,}')
+_ARRAYS = ('paper_ids', 'indptr', 'indices', 'data', 'col_indptr', 'col_rows', 'col_data', 'idf')
+_CURRENT_FILE = 'CURRENT'
+_LOCK_FILE = 'build.lock'
+
+def tokenize(text):
+    return [
+        token for token in _TOKEN.findall((text or '').lower())
+        if token not in STOP_WORDS and not token.isdigit()
+    ]
+
+def _hash_tokens(tokens):
+    return np.fromiter(
+        (zlib.crc32(token.encode('utf-8')) & (HASH_FEATURES - 1) for token in tokens),
+        dtype=np.int32,
+        count=len(tokens)
+    )
+
+def term_counts(title, keywords, abstract):
+    """Hashed feature ids (sorted) and their weighted term counts for a paper"""
+    parts = [(tokenize(title), TITLE_WEIGHT), (tokenize(keywords), KEYWORD_WEIGHT), (tokenize(abstract), 1.0)]
+    features = np.concatenate([_hash_tokens(tokens) for tokens, _ in parts])
+    weights = np.concatenate([np.full(len(tokens), weight, dtype=np.float32) for tokens, weight in parts])
+    if not len(features):
+        return features, weights
+
+    unique, inverse = np.unique(features, return_inverse=True)
+    return unique, np.bincount(inverse, weights=weights).astype(np.float32)
+
+def tfidf_row(features, counts, idf):
+    """Sublinear TF times IDF, L2-normalised"""
+    if not len(features):
+        return counts
+    values = (1.0 + np.log(counts)) * idf[features]
+    norm = np.sqrt(np.dot(values, values))
+    return (values / norm).astype(np.float32) if norm else values.astype(np.float32)
+
+class PaperVectorIndex(IncrementalIndex):
+    index_name = 'Related papers index'
+    item_name = 'papers'
+
+    def __init__(self, directory=RELATED_INDEX_DIR):
+        super().__init__()
+        self.directory = directory
+        # Name and wall-clock time of the build being served, which may
+        # have been made by another worker
+        self._build_name = None
+        self._build_time = None
+        self._checked_at = None
+        self._check_due = False
+        # Newest updated_at covered by the build and the delta, from the
+        # database rather than the local clock
+        self._updated_since = None
+
+    def _load_papers(self, session, paper_ids=None):
+        query = select(
+            ResearchPaper.id, ResearchPaper.title, ResearchPaper.keywords, ResearchPaper.abstract
+        ).where(ResearchPaper.is_active == True)
+        if paper_ids is not None:
+            query = query.where(ResearchPaper.id.in_(paper_ids))
+        return session.execute(query.order_by(ResearchPaper.id)).all()
+
+    @staticmethod
+    def _last_update(session):
+        return session.execute(select(func.max(ResearchPaper.updated_at))).scalar()
+
+    def _updated_papers(self, session):
+        """Ids of papers created, edited or deactivated since the last check, by any worker"""
+        query = select(ResearchPaper.id, ResearchPaper.updated_at)
+        if self._updated_since is not None:
+            query = query.where(ResearchPaper.updated_at >= self._updated_since - RELATED_CHECK_OVERLAP)
+        rows = session.execute(query).all()
+        latest = max((row.updated_at for row in rows if row.updated_at is not None), default=None)
+        if latest is not None and (self._updated_since is None or latest > self._updated_since):
+            self._updated_since = latest
+        return {row.id for row in rows}
+
+    @staticmethod
+    def _vectorize(papers):
+        """Build the CSR and CSC arrays for a full corpus"""
+        rows = [term_counts(paper.title, paper.keywords, paper.abstract) for paper in papers]
+        lengths = np.array([len(features) for features, _ in rows], dtype=np.int64)
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+
+        indices = np.concatenate([features for features, _ in rows]) if rows else np.zeros(0, dtype=np.int32)
+        counts = np.concatenate([counts for _, counts in rows]) if rows else np.zeros(0, dtype=np.float32)
+
+        document_frequency = np.bincount(indices, minlength=HASH_FEATURES)
+        idf = (np.log((1.0 + len(rows)) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+
+        # Row-wise normalisation, vectorised over the whole corpus
+        row_of = np.repeat(np.arange(len(rows), dtype=np.int32), lengths)
+        values = (1.0 + np.log(counts)) * idf[indices]
+        norms = np.sqrt(np.bincount(row_of, weights=values * values, minlength=len(rows)))
+        norms[norms == 0] = 1.0
+        data = (values / norms[row_of]).astype(np.float32)
+
+        order = np.argsort(indices, kind='stable')
+        col_indptr = np.zeros(HASH_FEATURES + 1, dtype=np.int64)
+        np.cumsum(document_frequency, out=col_indptr[1:])
+
+        return {
+            "paper_ids": np.array([paper.id for paper in papers], dtype=np.int64),
+            "indptr": indptr,
+            "indices": indices.astype(np.int32),
+            "data": data,
+            "col_indptr": col_indptr,
+            "col_rows": row_of[order],
+            "col_data": data[order],
+            "idf": idf,
+        }
+
+    @contextmanager
+    def _directory_lock(self):
+        """Serialize CURRENT updates and cleanup across processes"""
+        if fcntl is None:
+            yield
+            return
+
+        with open(os.path.join(self.directory, _LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self, arrays, built_at, updated_since):
+        """Write a build to its own directory, then point CURRENT at it"""
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"build-{time.time_ns()}"
+        path = os.path.join(self.directory, name)
+        os.makedirs(path)
+        for key in _ARRAYS:
+            np.save(os.path.join(path, f"{key}.npy"), arrays[key])
+        with open(os.path.join(path, 'meta.json'), 'w') as meta:
+            json.dump({
+                "built_at": built_at,
+                "updated_since": updated_since.isoformat() if updated_since else None,
+                "hash_features": HASH_FEATURES,
+            }, meta)
+
+        with self._directory_lock():
+            # Names sort by build time; never point back at an older build
+            # if another worker finished a newer one meanwhile
+            current = self._current_build()
+            if current is None or current < name:
+                pointer = os.path.join(self.directory, _CURRENT_FILE)
+                with open(f"{pointer}.{name}.tmp", 'w') as pointer_file:
+                    pointer_file.write(name)
+                os.replace(f"{pointer}.{name}.tmp", pointer)
+                current = name
+
+            # Only finished builds older than CURRENT go: one without
+            # meta.json is still being written by another worker. Workers
+            # still mapping an old build keep reading it until they reload;
+            # the unlinked files go away once they are unmapped
+            for entry in os.listdir(self.directory):
+                path = os.path.join(self.directory, entry)
+                if entry.startswith('build-') and entry < current and os.path.exists(os.path.join(path, 'meta.json')):
+                    shutil.rmtree(path, ignore_errors=True)
+        return name
+
+    def _current_build(self):
+        try:
+            with open(os.path.join(self.directory, _CURRENT_FILE)) as current:
+                return current.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _load_build(self, name):
+        path = os.path.join(self.directory, name)
+        with open(os.path.join(path, 'meta.json')) as meta:
+            meta = json.load(meta)
+        # Builds from before updated_since was recorded are rebuilt, not mapped
+        if meta.get('hash_features') != HASH_FEATURES or 'updated_since' not in meta:
+            return None
+        arrays = {key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode='r') for key in _ARRAYS}
+        updated_since = meta.get('updated_since')
+        return arrays, meta['built_at'], datetime.fromisoformat(updated_since) if updated_since else None
+
+    def _swap(self, name, arrays, built_at, updated_since):
+        with self._lock:
+            self._build_name = name
+            self.arrays = arrays
+            self._build_time = built_at
+            # Another worker's build may predate edits this one already
+            # applied, so checks resume from the build's own watermark
+            self._updated_since = updated_since
+            self.row_of = {int(paper_id): row for row, paper_id in enumerate(arrays['paper_ids'])}
+            self.live = np.ones(len(arrays['paper_ids']), dtype=bool)
+            self.delta = {}
+
+    def _build(self, session):
+        """Recompute the whole matrix and persist it"""
+        # Read before the papers, so edits made while they load are caught
+        # by the next check
+        updated_since = self._last_update(session)
+        papers = self._load_papers(session)
+        arrays = self._vectorize(papers)
+        built_at = time.time()
+        name = self._save(arrays, built_at, updated_since)
+        try:
+            # Serve from the mapped files so the pages are shared with other workers
+            arrays = self._load_build(name)[0]
+        except OSError:
+            pass
+        return name, arrays, built_at, updated_since
+
+    def _install(self, state):
+        self._swap(*state)
+
+    def _size(self):
+        return len(self.arrays['paper_ids'])
+
+    def _reload(self):
+        """Map the persisted build if another process wrote a newer one"""
+        name = self._current_build()
+        if name is None or name == self._build_name:
+            return False
+        try:
+            loaded = self._load_build(name)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load related papers index %s: %s: %s", name, type(e).__name__, e)
+            return False
+        if loaded is None:
+            return False
+        self._swap(name, *loaded)
+        logger.info("Related papers index %s loaded: %s papers", name, len(self.arrays['paper_ids']))
+        return True
+
+    def _apply_changes(self, session):
+        changed = set(self._dirty)
+        self._dirty.clear()
+        if self._check_due:
+            changed |= self._updated_papers(session)
+        self._check_due = False
+
+        for paper_id in changed:
+            row = self.row_of.pop(paper_id, None)
+            if row is not None:
+                self.live[row] = False
+            self.delta.pop(paper_id, None)
+
+        if not changed:
+            return
+        idf = self.arrays['idf']
+        for paper in self._load_papers(session, paper_ids=changed):
+            features, counts = term_counts(paper.title, paper.keywords, paper.abstract)
+            self.delta[paper.id] = (features, tfidf_row(features, counts, idf))
+
+    def _is_built(self):
+        return self._build_name is not None
+
+    def _is_stale(self):
+        return time.time() - self._build_time > RELATED_REBUILD_SECONDS or len(self.delta) > RELATED_MAX_DELTA
+
+    def _has_changes(self):
+        # Edits made in this process apply at once; other workers' are
+        # looked for every RELATED_CHECK_SECONDS
+        return self._check_due or super()._has_changes()
+
+    def ensure_fresh(self, session):
+        with self._lock:
+            now = time.monotonic()
+            self._check_due = self._checked_at is None or now - self._checked_at >= RELATED_CHECK_SECONDS
+            if self._check_due:
+                self._checked_at = now
+                self._reload()
+            super().ensure_fresh(session)
+
+    def _vector(self, paper_id):
+        if paper_id in self.delta:
+            return self.delta[paper_id]
+        row = self.row_of.get(paper_id)
+        if row is None:
+            return None
+        start, end = self.arrays['indptr'][row], self.arrays['indptr'][row + 1]
+        return np.asarray(self.arrays['indices'][start:end]), np.asarray(self.arrays['data'][start:end])
+
+    def related(self, session, paper_id, limit=5):
+        """Up to limit (paper_id, cosine) pairs most similar to a paper, best first"""
+        self.ensure_fresh(session)
+
+        with self._lock:
+            vector = self._vector(paper_id)
+            if vector is None or not len(vector[0]):
+                return []
+            features, weights = vector
+            arrays = self.arrays
+
+            # Walk the postings of the query's terms only
+            col_indptr = arrays['col_indptr']
+            starts, ends = col_indptr[features], col_indptr[features + 1]
+            lengths = ends - starts
+            if lengths.sum():
+                positions = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends) if end > start])
+                rows = np.asarray(arrays['col_rows'][positions])
+                products = np.asarray(arrays['col_data'][positions]) * np.repeat(weights, lengths)
+                scores = np.bincount(rows, weights=products, minlength=len(self.live))
+                scores[~self.live] = 0
+                own_row = self.row_of.get(paper_id)
+                if own_row is not None:
+                    scores[own_row] = 0
+
+                count = min(limit, len(scores))
+                top = np.argpartition(-scores, count - 1)[:count]
+                candidates = [(int(arrays['paper_ids'][row]), float(scores[row])) for row in top if scores[row] > 0]
+            else:
+                candidates = []
+
+            if self.delta:
+                query = np.zeros(HASH_FEATURES, dtype=np.float32)
+                query[features] = weights
+                for other_id, (other_features, other_weights) in self.delta.items():
+                    if other_id != paper_id:
+                        score = float(np.dot(query[other_features], other_weights))
+                        if score > 0:
+                            candidates.append((other_id, score))
+
+        candidates.sort(key=lambda item: (-item[1], -item[0]))
+        return candidates[:limit]
+
+paper_index = PaperVectorIndex()
+
+def mark_paper_changed(paper_id):
+    """Re-vectorize a paper after its text changes or it is deleted"""
+    paper_index.mark_changed(paper_id)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build and persist the related papers index")
+    parser.add_argument('--directory', default=RELATED_INDEX_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    session = Session()
+    try:
+        PaperVectorIndex(args.directory).rebuild(session)
+    finally:
+        session.close()
@@ -1,8 +1,17 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from datetime import datetime
 import pytz
 import logging
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+from pagination import get_cursor_args, cursor_page
+from identity import get_current_user
+from fulltext import fulltext_search
+from duplicates import check_paper_duplicates
+from related import paper_index, mark_paper_changed
+from counters import report_created
+from tags import set_paper_tags, release_paper_tags, parse_tag_filter, tag_filter, get_popular_tags
 from database import Session, User, ResearchPaper, Report
 
 research_bp = Blueprint('research', __name__, url_prefix='/api/research')
@@ -10,6 +19,87 @@ logger = logging.getLogger(__name__)
 
 IST = pytz.timezone('Asia/Kolkata')
 
+# Any of these switches the listing to the paginated envelope; without them
+# the endpoint keeps returning the full list for existing clients
+PAGINATION_PARAMS = ('page', 'per_page', 'cursor', 'view', 'facets')
+SUMMARY_ABSTRACT_LENGTH = 280
+
+def serialize_paper(paper):
+    return {
+        "id": paper.id,
+        "title": paper.title,
+        "abstract": paper.abstract,
+        "authors": paper.authors,
+        "category": paper.category,
+        "keywords": paper.keywords,
+        "tags": [tag.name for tag in paper.tags],
+        "status": paper.status,
+        "paper_url": paper.paper_url,
+        "doi": paper.doi,
+        "publication_date": paper.publication_date.isoformat() if paper.publication_date else None,
+        "owner_id": paper.owner_id,
+        "owner": {
+            "id": paper.owner.id,
+            "username": paper.owner.username,
+            "full_name": paper.owner.full_name,
+            "avatar_url": paper.owner.avatar_url
+        },
+        "created_at": paper.created_at.isoformat(),
+        "updated_at": paper.updated_at.isoformat()
+    }
+
+def serialize_paper_summary(row):
+    abstract = row.abstract_preview or ''
+    if (row.abstract_length or 0) > SUMMARY_ABSTRACT_LENGTH:
+        abstract = abstract.rstrip() + '…'
+    return {
+        "id": row.id,
+        "title": row.title,
+        "abstract": abstract,
+        "authors": row.authors,
+        "category": row.category,
+        "status": row.status,
+        "owner": {
+            "id": row.owner_id,
+            "username": row.owner_username,
+            "full_name": row.owner_full_name,
+            "avatar_url": row.owner_avatar_url
+        },
+        "created_at": row.created_at.isoformat()
+    }
+
+def get_paper_facets(session, status_filter=None, category_filter=None, tag_condition=None):
+    """Counts per category and status of active papers, from one grouped query.
+
+    Each facet honours the other facet's filter, so the sidebar shows how
+    many results picking a value would give.
+    """
+    rows = session.query(
+        ResearchPaper.category,
+        ResearchPaper.status,
+        func.count(ResearchPaper.id)
+    ).filter(
+        ResearchPaper.is_active == True
+    )
+
+    if tag_condition is not None:
+        rows = rows.filter(tag_condition)
+
+    rows = rows.group_by(ResearchPaper.category, ResearchPaper.status).all()
+
+    categories, statuses = {}, {}
+    for category, status, count in rows:
+        if not status_filter or status == status_filter:
+            key = category or 'Uncategorized'
+            categories[key] = categories.get(key, 0) + count
+        if not category_filter or category == category_filter:
+            statuses[status] = statuses.get(status, 0) + count
+
+    return {
+        "category": [{"value": key, "count": count} for key, count in sorted(categories.items(), key=lambda item: (-item[1], item[0]))],
+        "status": [{"value": key, "count": count} for key, count in sorted(statuses.items(), key=lambda item: (-item[1], str(item[0])))]
+    }
+
 @research_bp.route('/papers', methods=['GET'])
 @jwt_required()
 def get_papers():
@@ -17,31 +107,133 @@ def get_papers():
     try:
         status_filter = request.args.get('status', None)
         category_filter = request.args.get('category', None)
-
-        query = session.query(ResearchPaper).filter_by(is_active=True)
+        tag_names = parse_tag_filter(request.args.get('tags'))
+        tag_condition = tag_filter(tag_names, request.args.get('tag_match', 'any') == 'all') if tag_names else None
+
+        if not any(param in request.args for param in PAGINATION_PARAMS):
+            query = session.query(ResearchPaper).options(
+                joinedload(ResearchPaper.owner),
+                selectinload(ResearchPaper.tags)
+            ).filter_by(is_active=True)
+
+            if status_filter:
+                query = query.filter_by(status=status_filter)
+
+            if category_filter:
+                query = query.filter_by(category=category_filter)
+
+            if tag_condition is not None:
+                query = query.filter(tag_condition)
+
+            papers = query.order_by(ResearchPaper.created_at.desc()).all()
+
+            return jsonify([serialize_paper(paper) for paper in papers]), 200
+
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 12, type=int), 1), 100)
+        summary = request.args.get('view', 'full') == 'summary'
+        include_facets = request.args.get('facets', 'true').lower() == 'true'
+
+        try:
+            cursor_mode, cursor, include_total = get_cursor_args()
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        if summary:
+            # Only what a card shows, with the abstract cut down in the database
+            query = session.query(
+                ResearchPaper.id,
+                ResearchPaper.title,
+                ResearchPaper.authors,
+                ResearchPaper.category,
+                ResearchPaper.status,
+                ResearchPaper.created_at,
+                ResearchPaper.owner_id,
+                func.substr(ResearchPaper.abstract, 1, SUMMARY_ABSTRACT_LENGTH).label('abstract_preview'),
+                func.length(ResearchPaper.abstract).label('abstract_length'),
+                User.username.label('owner_username'),
+                User.full_name.label('owner_full_name'),
+                User.avatar_url.label('owner_avatar_url')
+            ).join(User, User.id == ResearchPaper.owner_id)
+        else:
+            query = session.query(ResearchPaper).options(
+                joinedload(ResearchPaper.owner),
+                selectinload(ResearchPaper.tags)
+            )
+
+        query = query.filter(ResearchPaper.is_active == True)
 
         if status_filter:
-            query = query.filter_by(status=status_filter)
+            query = query.filter(ResearchPaper.status == status_filter)
 
         if category_filter:
-            query = query.filter_by(category=category_filter)
+            query = query.filter(ResearchPaper.category == category_filter)
+
+        if tag_condition is not None:
+            query = query.filter(tag_condition)
+
+        if cursor_mode:
+            papers, pagination = cursor_page(query, ResearchPaper.created_at, ResearchPaper.id, cursor, per_page, include_total)
+        else:
+            total = query.order_by(None).count()
+            papers = query.order_by(
+                ResearchPaper.created_at.desc(),
+                ResearchPaper.id.desc()
+            ).offset((page - 1) * per_page).limit(per_page).all()
+            pagination = {
+                "page": page,
+                "per_page": per_page,
+                "total": total,
+                "pages": (total + per_page - 1) // per_page
+            }
+
+        response = {
+            "papers": [serialize_paper_summary(row) if summary else serialize_paper(row) for row in papers],
+            "pagination": pagination
+        }
 
-        papers = query.order_by(ResearchPaper.created_at.desc()).all()
+        if include_facets:
+            response["facets"] = get_paper_facets(session, status_filter, category_filter, tag_condition)
 
-        papers_data = []
-        for paper in papers:
-            papers_data.append({
+        return jsonify(response), 200
+
+    except Exception as e:
+        logger.error("Failed to fetch research papers: %s: %s", type(e).__name__, e)
+        return jsonify({"error": "Failed to fetch research papers"}), 500
+    finally:
+        session.close()
+
+@research_bp.route('/papers/search', methods=['GET'])
+@jwt_required()
+def search_papers():
+    session = Session()
+    try:
+        search = request.args.get('q', '').strip()
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 10, type=int), 1), 50)
+
+        if not search:
+            return jsonify({"error": "Search query is required"}), 400
+
+        total, hits = fulltext_search(session, 'papers', search, offset=(page - 1) * per_page, limit=per_page)
+
+        papers = session.query(ResearchPaper).options(
+            joinedload(ResearchPaper.owner)
+        ).filter(ResearchPaper.id.in_([paper_id for paper_id, _, _ in hits])).all()
+        papers_by_id = {paper.id: paper for paper in papers}
+
+        results = []
+        for paper_id, score, snippet in hits:
+            paper = papers_by_id.get(paper_id)
+            if paper is None:
+                continue
+            results.append({
                 "id": paper.id,
                 "title": paper.title,
-                "abstract": paper.abstract,
                 "authors": paper.authors,
                 "category": paper.category,
                 "keywords": paper.keywords,
                 "status": paper.status,
-                "paper_url": paper.paper_url,
-                "doi": paper.doi,
-                "publication_date": paper.publication_date.isoformat() if paper.publication_date else None,
-                "owner_id": paper.owner_id,
                 "owner": {
                     "id": paper.owner.id,
                     "username": paper.owner.username,
@@ -49,14 +241,41 @@ def get_papers():
                     "avatar_url": paper.owner.avatar_url
                 },
                 "created_at": paper.created_at.isoformat(),
-                "updated_at": paper.updated_at.isoformat()
+                "score": round(score, 6),
+                "snippet": snippet
             })
 
-        return jsonify(papers_data), 200
+        return jsonify({
+            "results": results,
+            "pagination": {
+                "page": page,
+                "per_page": per_page,
+                "total": total,
+                "pages": (total + per_page - 1) // per_page
+            }
+        }), 200
 
     except Exception as e:
-        logger.error(f"Failed to fetch research papers: {type(e).__name__}: {str(e)}")
-        return jsonify({"error": "Failed to fetch research papers"}), 500
+        logger.error("Failed to search research papers: %s: %s", type(e).__name__, e)
+        return jsonify({"error": "Failed to search research papers"}), 500
+    finally:
+        session.close()
+
+@research_bp.route('/tags/popular', methods=['GET'])
+@jwt_required()
+def get_popular_paper_tags():
+    session = Session()
+    try:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        prefix = request.args.get('prefix', '').strip()
+
+        tags = get_popular_tags(session, limit=limit, prefix=prefix or None)
+
+        return jsonify([{"name": name, "paper_count": count} for name, count in tags]), 200
+
+    except Exception as e:
+        logger.error("Failed to fetch popular tags: %s: %s", type(e).__name__, e)
+        return jsonify({"error": "Failed to fetch popular tags"}), 500
     finally:
         session.close()
 
@@ -77,6 +296,7 @@ def get_paper(paper_id):
             "authors": paper.authors,
             "category": paper.category,
             "keywords": paper.keywords,
+            "tags": [tag.name for tag in paper.tags],
             "status": paper.status,
             "paper_url": paper.paper_url,
             "doi": paper.doi,
@@ -96,18 +316,71 @@ def get_paper(paper_id):
         return jsonify(paper_data), 200
 
     except Exception as e:
-        logger.error(f"Failed to fetch research paper: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to fetch research paper: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to fetch research paper"}), 500
     finally:
         session.close()
 
+@research_bp.route('/papers/<int:paper_id>/related', methods=['GET'])
+@jwt_required()
+def get_related_papers(paper_id):
+    session = Session()
+    try:
+        limit = min(max(request.args.get('limit', 5, type=int), 1), 20)
+
+        paper = session.query(ResearchPaper.id).filter_by(id=paper_id, is_active=True).first()
+
+        if not paper:
+            return jsonify({"error": "Research paper not found"}), 404
+
+        # A few spare hits in case some were deleted by another worker
+        hits = paper_index.related(session, paper_id, limit=limit + 5)
+
+        papers = session.query(ResearchPaper).options(
+            joinedload(ResearchPaper.owner)
+        ).filter(
+            ResearchPaper.id.in_([related_id for related_id, _ in hits]),
+            ResearchPaper.is_active == True
+        ).all()
+        papers_by_id = {related.id: related for related in papers}
+
+        related_data = []
+        for related_id, score in hits:
+            related = papers_by_id.get(related_id)
+            if related is None:
+                continue
+            related_data.append({
+                "id": related.id,
+                "title": related.title,
+                "authors": related.authors,
+                "category": related.category,
+                "status": related.status,
+                "owner": {
+                    "id": related.owner.id,
+                    "username": related.owner.username,
+                    "full_name": related.owner.full_name,
+                    "avatar_url": related.owner.avatar_url
+                },
+                "created_at": related.created_at.isoformat(),
+                "score": round(score, 6)
+            })
+            if len(related_data) == limit:
+                break
+
+        return jsonify(related_data), 200
+
+    except Exception as e:
+        logger.error("Failed to fetch related research papers: %s: %s", type(e).__name__, e)
+        return jsonify({"error": "Failed to fetch related research papers"}), 500
+    finally:
+        session.close()
+
 @research_bp.route('/papers', methods=['POST'])
 @jwt_required()
 def create_paper():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -136,9 +409,12 @@ def create_paper():
         )
 
         session.add(paper)
+        set_paper_tags(session, paper, paper.keywords)
+        check_paper_duplicates(session, paper)
         session.commit()
+        mark_paper_changed(paper.id)
 
-        logger.info(f"Research paper created: {title} by user {user.username}")
+        logger.info("Research paper created: %s by user %s", title, user.username)
 
         return jsonify({
             "message": "Research paper created successfully",
@@ -147,7 +423,7 @@ def create_paper():
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to create research paper: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to create research paper: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to create research paper"}), 500
     finally:
         session.close()
@@ -157,8 +433,7 @@ def create_paper():
 def update_paper(paper_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -178,14 +453,16 @@ def update_paper(paper_id):
 
         if 'title' in data:
             paper.title = data['title'].strip()
-        if 'abstract' in data:
+        if 'abstract' in data and data['abstract'].strip() != paper.abstract:
             paper.abstract = data['abstract'].strip()
+            check_paper_duplicates(session, paper)
         if 'authors' in data:
             paper.authors = data['authors'].strip()
         if 'category' in data:
             paper.category = data['category'].strip()
         if 'keywords' in data:
             paper.keywords = data['keywords'].strip()
+            set_paper_tags(session, paper, paper.keywords)
         if 'status' in data:
             paper.status = data['status']
         if 'paper_url' in data:
@@ -198,13 +475,16 @@ def update_paper(paper_id):
         paper.updated_at = datetime.now(IST)
         session.commit()
 
-        logger.info(f"Research paper updated: {paper.title} by user {user.username}")
+        if any(field in data for field in ('title', 'abstract', 'keywords')):
+            mark_paper_changed(paper.id)
+
+        logger.info("Research paper updated: %s by user %s", paper.title, user.username)
 
         return jsonify({"message": "Research paper updated successfully"}), 200
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to update research paper: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to update research paper: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to update research paper"}), 500
     finally:
         session.close()
@@ -214,8 +494,7 @@ def update_paper(paper_id):
 def delete_paper(paper_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -228,17 +507,19 @@ def delete_paper(paper_id):
         if paper.owner_id != user.id and not user.is_admin:
             return jsonify({"error": "Unauthorized"}), 403
 
+        release_paper_tags(session, paper)
         paper.is_active = False
         paper.updated_at = datetime.now(IST)
         session.commit()
+        mark_paper_changed(paper.id)
 
-        logger.info(f"Research paper deleted: {paper.title} by user {user.username}")
+        logger.info("Research paper deleted: %s by user %s", paper.title, user.username)
 
         return jsonify({"message": "Research paper deleted successfully"}), 200
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to delete research paper: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to delete research paper: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to delete research paper"}), 500
     finally:
         session.close()
@@ -248,8 +529,7 @@ def delete_paper(paper_id):
 def publish_paper(paper_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -281,13 +561,13 @@ def publish_paper(paper_id):
         paper.updated_at = datetime.now(IST)
         session.commit()
 
-        logger.info(f"Research paper published: {paper.title} by user {user.username}")
+        logger.info("Research paper published: %s by user %s", paper.title, user.username)
 
         return jsonify({"message": "Research paper published successfully"}), 200
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to publish research paper: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to publish research paper: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to publish research paper"}), 500
     finally:
         session.close()
@@ -297,8 +577,7 @@ def publish_paper(paper_id):
 def get_my_papers():
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -325,7 +604,7 @@ def get_my_papers():
         return jsonify(papers_data), 200
 
     except Exception as e:
-        logger.error(f"Failed to fetch user's research papers: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to fetch user's research papers: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to fetch research papers"}), 500
     finally:
         session.close()
@@ -335,8 +614,7 @@ def get_my_papers():
 def report_paper(paper_id):
     session = Session()
     try:
-        current_user_id = get_jwt_identity()
-        user = session.query(User).filter_by(username=current_user_id).first()
+        user = get_current_user(session)
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -371,15 +649,16 @@ def report_paper(paper_id):
         )
 
         session.add(report)
+        report_created(session, 'research_paper', paper_id)
         session.commit()
 
-        logger.info(f"Research paper reported: {paper.title} by user {user.username}")
+        logger.info("Research paper reported: %s by user %s", paper.title, user.username)
 
         return jsonify({"message": "Research paper reported successfully"}), 201
 
     except Exception as e:
         session.rollback()
-        logger.error(f"Failed to report research paper: {type(e).__name__}: {str(e)}")
+        logger.error("Failed to report research paper: %s: %s", type(e).__name__, e)
         return jsonify({"error": "Failed to report research paper"}), 500
     finally:
         session.close()
@@ -0,0 +1,245 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from concurrent.futures import ThreadPoolExecutor, wait
+import time
+import os
+import logging
+from identity import get_current_user_id
+from fulltext import fulltext_search
+from autocomplete import user_autocomplete, normalize
+from database import SessionFactory, Project, HackathonPost, ResearchPaper, User, get_read_routing, set_read_routing
+
+search_bp = Blueprint('search', __name__, url_prefix='/api/search')
+logger = logging.getLogger(__name__)
+
+# One search box for every content type. Each type is searched on its own
+# index in a shared thread pool; whatever has finished when the deadline
+# passes is returned and the rest is reported as timed out. Scores from
+# the different indexes aren't comparable as-is, so every hit is rescored
+# from its rank and its score relative to the best hit of its type.
+SEARCH_TYPES = ('users', 'projects', 'hackathons', 'papers')
+SEARCH_DEADLINE_SECONDS = float(os.getenv('SEARCH_DEADLINE_MS', 300)) / 1000
+SEARCH_MAX_WORKERS = int(os.getenv('SEARCH_MAX_WORKERS', 8))
+SEARCH_QUERY_MAX_LENGTH = 100
+SEARCH_LIMIT_MAX = 20
+# How much the relative score counts against the rank; the rest is 1 / (1 + rank)
+SEARCH_SCORE_WEIGHT = 0.5
+SEARCH_TYPE_WEIGHTS = {
+    'users': 1.0,
+    'projects': 1.0,
+    'hackathons': 0.9,
+    'papers': 0.9,
+}
+
+_executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS, thread_name_prefix='search')
+
+def common_score(kind, rank, relevance):
+    """Rescore a hit onto 0..1 from its rank and its relevance relative to the best hit"""
+    blended = SEARCH_SCORE_WEIGHT * relevance + (1 - SEARCH_SCORE_WEIGHT) / (1 + rank)
+    return round(SEARCH_TYPE_WEIGHTS[kind] * blended, 6)
+
+def _relative(hits):
+    best = max((score for _, score, _ in hits), default=0)
+    if best <= 0:
+        # ilike fallback: no relevance scores, only the order
+        return [1.0] * len(hits)
+    return [max(score, 0) / best for _, score, _ in hits]
+
+def _owner(row):
+    return {
+        "id": row.owner_id,
+        "username": row.owner_username,
+        "full_name": row.owner_full_name,
+        "avatar_url": row.owner_avatar_url
+    }
+
+def _owner_columns():
+    return (
+        User.username.label('owner_username'),
+        User.full_name.label('owner_full_name'),
+        User.avatar_url.label('owner_avatar_url')
+    )
+
+def _search_projects(session, query, limit, current_user_id):
+    total, hits = fulltext_search(session, 'projects', query, limit=limit)
+    rows = session.query(
+        Project.id, Project.name, Project.status, Project.created_at, Project.owner_id, *_owner_columns()
+    ).join(User, User.id == Project.owner_id).filter(Project.id.in_([hit[0] for hit in hits])).all()
+    rows_by_id = {row.id: row for row in rows}
+
+    results = []
+    for rank, (hit, relevance) in enumerate(zip(hits, _relative(hits))):
+        row = rows_by_id.get(hit[0])
+        if row is None:
+            continue
+        results.append({
+            "type": 'project',
+            "id": row.id,
+            "title": row.name,
+            "status": row.status,
+            "owner": _owner(row),
+            "created_at": row.created_at.isoformat(),
+            "snippet": hit[2],
+            "score": common_score('projects', rank, relevance)
+        })
+    return total, results
+
+def _search_hackathons(session, query, limit, current_user_id):
+    total, hits = fulltext_search(session, 'hackathons', query, limit=limit)
+    rows = session.query(
+        HackathonPost.id, HackathonPost.title, HackathonPost.hackathon_name, HackathonPost.hackathon_date,
+        HackathonPost.created_at, HackathonPost.owner_id, *_owner_columns()
+    ).join(User, User.id == HackathonPost.owner_id).filter(HackathonPost.id.in_([hit[0] for hit in hits])).all()
+    rows_by_id = {row.id: row for row in rows}
+
+    results = []
+    for rank, (hit, relevance) in enumerate(zip(hits, _relative(hits))):
+        row = rows_by_id.get(hit[0])
+        if row is None:
+            continue
+        results.append({
+            "type": 'hackathon',
+            "id": row.id,
+            "title": row.title,
+            "hackathon_name": row.hackathon_name,
+            "hackathon_date": row.hackathon_date.isoformat() if row.hackathon_date else None,
+            "owner": _owner(row),
+            "created_at": row.created_at.isoformat(),
+            "snippet": hit[2],
+            "score": common_score('hackathons', rank, relevance)
+        })
+    return total, results
+
+def _search_papers(session, query, limit, current_user_id):
+    total, hits = fulltext_search(session, 'papers', query, limit=limit)
+    rows = session.query(
+        ResearchPaper.id, ResearchPaper.title, ResearchPaper.authors, ResearchPaper.category,
+        ResearchPaper.status, ResearchPaper.created_at, ResearchPaper.owner_id, *_owner_columns()
+    ).join(User, User.id == ResearchPaper.owner_id).filter(ResearchPaper.id.in_([hit[0] for hit in hits])).all()
+    rows_by_id = {row.id: row for row in rows}
+
+    results = []
+    for rank, (hit, relevance) in enumerate(zip(hits, _relative(hits))):
+        row = rows_by_id.get(hit[0])
+        if row is None:
+            continue
+        results.append({
+            "type": 'paper',
+            "id": row.id,
+            "title": row.title,
+            "authors": row.authors,
+            "category": row.category,
+            "status": row.status,
+            "owner": _owner(row),
+            "created_at": row.created_at.isoformat(),
+            "snippet": hit[2],
+            "score": common_score('papers', rank, relevance)
+        })
+    return total, results
+
+def _search_users(session, query, limit, current_user_id):
+    user_ids = user_autocomplete.search(session, query, limit=limit, exclude_user_id=current_user_id)
+    rows = session.query(
+        User.id, User.username, User.full_name, User.avatar_url
+    ).filter(User.id.in_(user_ids)).all()
+    rows_by_id = {row.id: row for row in rows}
+
+    normalized = normalize(query)
+    results = []
+    for rank, user_id in enumerate(user_ids):
+        row = rows_by_id.get(user_id)
+        if row is None:
+            continue
+        # The autocomplete index ranks but doesn't score: name matches
+        # count fully, fuzzy (typo) matches half
+        names = (normalize(row.username), normalize(row.full_name))
+        relevance = 1.0 if any(name.startswith(normalized) for name in names if name) else 0.5
+        results.append({
+            "type": 'user',
+            "id": row.id,
+            "title": row.full_name or row.username,
+            "username": row.username,
+            "full_name": row.full_name,
+            "avatar_url": row.avatar_url,
+            "score": common_score('users', rank, relevance)
+        })
+    return len(results), results
+
+SEARCHERS = {
+    'users': _search_users,
+    'projects': _search_projects,
+    'hackathons': _search_hackathons,
+    'papers': _search_papers,
+}
+
+def _run_search(kind, query, limit, current_user_id, use_replica):
+    # Pool threads don't inherit the request thread's session or routing
+    set_read_routing(use_replica)
+    session = SessionFactory()
+    try:
+        return SEARCHERS[kind](session, query, limit, current_user_id)
+    finally:
+        session.close()
+
+@search_bp.route('', methods=['GET'])
+@jwt_required()
+def unified_search():
+    started = time.perf_counter()
+    try:
+        current_user_id = get_current_user_id()
+        if current_user_id is None:
+            return jsonify({"error": "User not found"}), 404
+
+        query = request.args.get('q', '').strip()[:SEARCH_QUERY_MAX_LENGTH]
+        limit = min(max(request.args.get('limit', 5, type=int), 1), SEARCH_LIMIT_MAX)
+        requested = request.args.get('types')
+        kinds = [kind for kind in requested.split(',') if kind in SEARCHERS] if requested else list(SEARCH_TYPES)
+
+        if not query:
+            return jsonify({"error": "Search query is required"}), 400
+
+        if not kinds:
+            return jsonify({"error": f"types must be one or more of {', '.join(SEARCH_TYPES)}"}), 400
+
+        use_replica = get_read_routing()
+        futures = {
+            _executor.submit(_run_search, kind, query, limit, current_user_id, use_replica): kind
+            for kind in kinds
+        }
+        done, pending = wait(futures, timeout=SEARCH_DEADLINE_SECONDS)
+
+        results, totals, timed_out, failed = {}, {}, [], []
+        for future in pending:
+            # Still running; it finishes (and closes its session) in the background
+            future.cancel()
+            timed_out.append(futures[future])
+        for future in done:
+            kind = futures[future]
+            try:
+                totals[kind], results[kind] = future.result()
+            except Exception as e:
+                logger.error("Search of %s failed: %s: %s", kind, type(e).__name__, e)
+                failed.append(kind)
+
+        if timed_out:
+            logger.warning("Search deadline passed, partial results without %s", ', '.join(sorted(timed_out)))
+
+        top = sorted(
+            (hit for hits in results.values() for hit in hits),
+            key=lambda hit: -hit["score"]
+        )[:limit]
+
+        return jsonify({
+            "query": query,
+            "results": {kind: results[kind] for kind in kinds if kind in results},
+            "totals": {kind: totals[kind] for kind in kinds if kind in totals},
+            "top": [{"type": hit["type"], "id": hit["id"], "title": hit["title"], "score": hit["score"]} for hit in top],
+            "partial": bool(timed_out or failed),
+            "timed_out": sorted(timed_out),
+            "failed": sorted(failed),
+            "took_ms": round((time.perf_counter() - started) * 1000, 1)
+        }), 200
+
+    except Exception as e:
+        logger.error("Failed to search: %s: %s", type(e).__name__, e)
+        return jsonify({"error": "Failed to search"}), 500
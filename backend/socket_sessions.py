@@ -0,0 +1,62 @@
+import threading
+import time
+
+# Socket.IO connections are authenticated once, in the connect handler,
+# from the client's JWT. The resolved identity is kept here per sid, so
+# later events read the sender from this map instead of trusting ids in
+# the payload or querying the database. Rooms are always derived from
+# the authenticated user, so a client can only join its own chats.
+# Entries go on disconnect.
+
+def chat_room(user_id, other_user_id):
+    """Room shared by the two users of a conversation"""
+    return f"chat_{min(user_id, other_user_id)}_{max(user_id, other_user_id)}"
+
+class SocketIdentity:
+    """Who a connected socket belongs to and which chat rooms it joined"""
+
+    def __init__(self, user_id, username, expires_at):
+        self.user_id = user_id
+        self.username = username
+        self.expires_at = expires_at  # JWT expiry, epoch seconds
+        self.rooms = set()
+
+    def is_expired(self):
+        return self.expires_at <= time.time()
+
+class SocketRegistry:
+    """Thread-safe sid -> SocketIdentity map"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._identities = {}
+
+    def add(self, sid, identity):
+        with self._lock:
+            self._identities[sid] = identity
+
+    def get(self, sid):
+        with self._lock:
+            return self._identities.get(sid)
+
+    def remove(self, sid):
+        with self._lock:
+            return self._identities.pop(sid, None)
+
+    def join(self, sid, room):
+        with self._lock:
+            identity = self._identities.get(sid)
+            if identity is not None:
+                identity.rooms.add(room)
+
+    def leave(self, sid, room):
+        with self._lock:
+            identity = self._identities.get(sid)
+            if identity is not None:
+                identity.rooms.discard(room)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._identities)
+
+socket_registry = SocketRegistry()
@@ -0,0 +1,158 @@
+from sqlalchemy import select, insert, delete, update, func
+from sqlalchemy.exc import IntegrityError
+from database import Tag, ResearchPaper, paper_tags
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Research paper keywords are free text ("Machine Learning; NLP, nlp").
+# They are normalized into the tags table so papers can be filtered and
+# grouped by keyword through an indexed join instead of string parsing.
+# Tag.paper_count counts active papers and is adjusted in the same
+# transaction as the paper change.
+MAX_TAG_LENGTH = 50
+MAX_TAGS_PER_PAPER = 20
+
+_KEYWORD_SEPARATORS = re.compile(r'[,;\n|]+')
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_tag(value):
+    """Lowercase, collapse whitespace and trim stray punctuation from a keyword"""
+    value = _WHITESPACE.sub(' ', value or '').strip().strip('#.\'"').strip().lower()
+    return value[:MAX_TAG_LENGTH].rstrip()
+
+def parse_keywords(keywords):
+    """Split a keywords string into distinct tag names, keeping their order"""
+    names = []
+    for part in _KEYWORD_SEPARATORS.split(keywords or ''):
+        name = normalize_tag(part)
+        if name and name not in names:
+            names.append(name)
+            if len(names) == MAX_TAGS_PER_PAPER:
+                break
+    return names
+
+def parse_tag_filter(value):
+    """Tag names from a comma separated query parameter"""
+    return [name for name in (normalize_tag(part) for part in (value or '').split(',')) if name]
+
+def get_or_create_tags(session, names):
+    """Return {name: tag_id} for the given names, creating missing tags"""
+    if not names:
+        return {}
+
+    tag_ids = dict(session.execute(select(Tag.name, Tag.id).where(Tag.name.in_(names))).all())
+    for name in names:
+        if name in tag_ids:
+            continue
+        try:
+            with session.begin_nested():
+                tag = Tag(name=name, paper_count=0)
+                session.add(tag)
+            tag_ids[name] = tag.id
+        except IntegrityError:
+            # Created concurrently by another request
+            tag_ids[name] = session.execute(select(Tag.id).where(Tag.name == name)).scalar_one()
+    return tag_ids
+
+def _adjust_counts(session, tag_ids, delta):
+    if tag_ids:
+        session.execute(
+            update(Tag).where(Tag.id.in_(tag_ids)).values(paper_count=Tag.paper_count + delta)
+        )
+
+def set_paper_tags(session, paper, keywords):
+    """Replace a paper's tags with the ones parsed from keywords.
+
+    Runs inside the caller's transaction; the paper must be in the session.
+    """
+    session.flush()
+
+    wanted = get_or_create_tags(session, parse_keywords(keywords))
+    current = set(session.execute(
+        select(paper_tags.c.tag_id).where(paper_tags.c.paper_id == paper.id)
+    ).scalars())
+
+    added = set(wanted.values()) - current
+    removed = current - set(wanted.values())
+
+    if removed:
+        session.execute(delete(paper_tags).where(
+            paper_tags.c.paper_id == paper.id,
+            paper_tags.c.tag_id.in_(removed)
+        ))
+    if added:
+        session.execute(insert(paper_tags), [{"paper_id": paper.id, "tag_id": tag_id} for tag_id in added])
+
+    if paper.is_active:
+        _adjust_counts(session, added, 1)
+        _adjust_counts(session, removed, -1)
+
+def release_paper_tags(session, paper, remove=False):
+    """Take a paper out of its tags' counts when it is deactivated or deleted"""
+    tag_ids = list(session.execute(
+        select(paper_tags.c.tag_id).where(paper_tags.c.paper_id == paper.id)
+    ).scalars())
+
+    if paper.is_active:
+        _adjust_counts(session, tag_ids, -1)
+    if remove:
+        session.execute(delete(paper_tags).where(paper_tags.c.paper_id == paper.id))
+
+def tag_filter(names, match_all=False):
+    """Filter expression for papers tagged with any (or all) of the names"""
+    tagged = select(paper_tags.c.paper_id).join(Tag, Tag.id == paper_tags.c.tag_id).where(Tag.name.in_(names))
+    if match_all:
+        tagged = tagged.group_by(paper_tags.c.paper_id).having(
+            func.count(paper_tags.c.tag_id) == len(set(names))
+        )
+    return ResearchPaper.id.in_(tagged)
+
+def get_popular_tags(session, limit=20, prefix=None):
+    query = select(Tag.name, Tag.paper_count).where(Tag.paper_count > 0)
+    if prefix:
+        query = query.where(Tag.name.startswith(normalize_tag(prefix), autoescape=True))
+    query = query.order_by(Tag.paper_count.desc(), Tag.name).limit(limit)
+    return session.execute(query).all()
+
+def recount_tags(connection):
+    """Recompute every paper_count from the association table"""
+    active_count = select(func.count()).select_from(
+        paper_tags.join(ResearchPaper, ResearchPaper.id == paper_tags.c.paper_id)
+    ).where(
+        paper_tags.c.tag_id == Tag.id,
+        ResearchPaper.is_active == True
+    ).scalar_subquery()
+    return connection.execute(update(Tag).values(paper_count=active_count)).rowcount
+
+def backfill_paper_tags(connection):
+    """Migration step: tag papers that have keywords but no tags yet"""
+    untagged = connection.execute(
+        select(ResearchPaper.id, ResearchPaper.keywords).where(
+            ResearchPaper.keywords.isnot(None),
+            ResearchPaper.keywords != '',
+            ~ResearchPaper.id.in_(select(paper_tags.c.paper_id))
+        )
+    ).all()
+
+    parsed = [(paper_id, parse_keywords(keywords)) for paper_id, keywords in untagged]
+    parsed = [(paper_id, names) for paper_id, names in parsed if names]
+    if not parsed:
+        return 0
+
+    tag_ids = dict(connection.execute(select(Tag.name, Tag.id)).all())
+    missing = sorted({name for _, names in parsed for name in names} - tag_ids.keys())
+    if missing:
+        connection.execute(insert(Tag), [{"name": name, "paper_count": 0} for name in missing])
+        tag_ids = dict(connection.execute(select(Tag.name, Tag.id)).all())
+
+    connection.execute(insert(paper_tags), [
+        {"paper_id": paper_id, "tag_id": tag_ids[name]}
+        for paper_id, names in parsed
+        for name in names
+    ])
+    recount_tags(connection)
+
+    logger.info("Back-filled tags for %s research papers", len(parsed))
+    return len(parsed)
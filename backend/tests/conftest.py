@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app creates its schema and starts its workers on import, so point it
+# at a throwaway database before anything imports it
+_workdir = tempfile.mkdtemp(prefix='assemble-tests-')
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(_workdir, 'test.db')}",
+    MAIL_DISPATCHER='false',
+    COUNTER_RECONCILE_SECONDS='0',
+    RELATED_INDEX_DIR=os.path.join(_workdir, 'related_index'),
+    LOG_FILE=os.path.join(_workdir, 'app.log'),
+    LOG_LEVEL='WARNING',
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app
+from database import Session, User, engine
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+@pytest.fixture
+def app():
+    return flask_app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def make_user():
+    """Create (or fetch) a verified user by username; returns its id"""
+    def make(username, **fields):
+        session = Session()
+        try:
+            user = session.query(User).filter_by(username=username).first()
+            if user is None:
+                user = User(
+                    username=username,
+                    email=f"{username}@vitstudent.ac.in",
+                    password=generate_password_hash('password123'),
+                    is_email_verified=True,
+                    **fields
+                )
+                session.add(user)
+                session.commit()
+            return user.id
+        finally:
+            session.close()
+    return make
+
+@pytest.fixture
+def auth_headers(app):
+    def headers(username):
+        with app.app_context():
+            return {"Authorization": f"Bearer {create_access_token(identity=username)}"}
+    return headers
+
+@pytest.fixture
+def count_queries():
+    """Context manager collecting the SQL statements run inside it"""
+    class Counter:
+        def __enter__(self):
+            self.statements = []
+            event.listen(engine, 'before_cursor_execute', self._record)
+            return self
+
+        def __exit__(self, *exc):
+            event.remove(engine, 'before_cursor_execute', self._record)
+
+        def _record(self, connection, cursor, statement, *args):
+            self.statements.append(statement)
+
+        def __len__(self):
+            return len(self.statements)
+
+    return Counter
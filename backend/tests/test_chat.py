@@ -0,0 +1,111 @@
+from datetime import timedelta
+import time
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import create_engine, text
+
+from app import socketio
+from conversations import legacy_watermarks, record_message, get_conversation
+from database import Session, Message
+
+def _send(client, headers, receiver_id, content):
+    response = client.post('/api/chat/messages', json={"receiver_id": receiver_id, "content": content}, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+def test_viewing_messages_marks_only_what_was_shown(client, make_user, auth_headers):
+    sender_id = make_user('watermarksender')
+    reader_id = make_user('watermarkreader')
+    sender, reader = auth_headers('watermarksender'), auth_headers('watermarkreader')
+
+    for index in range(3):
+        _send(client, sender, reader_id, f"first {index}")
+    page = client.get(f'/api/chat/messages/{sender_id}', headers=reader).get_json()['messages']
+    assert [message['is_read'] for message in page] == [True, True, True]
+
+    _send(client, sender, reader_id, "arrived after the page")
+    assert client.get('/api/chat/unread-count', headers=reader).get_json()['unread_count'] == 1
+
+def test_conversation_summary_only_moves_forward(make_user):
+    sender_id = make_user('summarysender')
+    receiver_id = make_user('summaryreceiver')
+
+    session = Session()
+    try:
+        # The newer message commits first, as when two senders race
+        for message_id in (900002, 900001):
+            message = Message(id=message_id, sender_id=sender_id, receiver_id=receiver_id, content=str(message_id))
+            session.add(message)
+            record_message(session, message)
+            session.commit()
+
+        assert get_conversation(session, sender_id, receiver_id).last_message_id == 900002
+    finally:
+        session.close()
+
+def test_legacy_watermarks_ignore_messages_without_a_flag():
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE messages (id INTEGER PRIMARY KEY, sender_id INTEGER, receiver_id INTEGER, is_read BOOLEAN)"
+        ))
+        connection.execute(text("INSERT INTO messages VALUES (:id, :sender, :receiver, :is_read)"), [
+            # 1 -> 2: all flagged read, then messages written after the flags were retired
+            {"id": 1, "sender": 1, "receiver": 2, "is_read": True},
+            {"id": 2, "sender": 1, "receiver": 2, "is_read": True},
+            {"id": 3, "sender": 1, "receiver": 2, "is_read": None},
+            # 2 -> 1: unread from message 5 on
+            {"id": 4, "sender": 2, "receiver": 1, "is_read": True},
+            {"id": 5, "sender": 2, "receiver": 1, "is_read": False},
+            {"id": 6, "sender": 2, "receiver": 1, "is_read": None},
+            # 3 -> 1: nothing but unflagged messages
+            {"id": 7, "sender": 3, "receiver": 1, "is_read": None},
+        ])
+
+        watermarks = legacy_watermarks(connection)
+
+    assert watermarks == {(2, 1): 2, (1, 2): 4}
+
+def test_rest_send_rejects_non_integer_receiver(client, make_user, auth_headers):
+    make_user('restsender')
+    response = client.post('/api/chat/messages', json={"receiver_id": "abc", "content": "hi"}, headers=auth_headers('restsender'))
+    assert response.status_code == 400
+
+def test_rest_send_rejects_inactive_receiver(client, make_user, auth_headers):
+    make_user('restsender')
+    inactive_id = make_user('restinactive', is_active=False)
+    response = client.post('/api/chat/messages', json={"receiver_id": inactive_id, "content": "hi"}, headers=auth_headers('restsender'))
+    assert response.status_code == 404
+
+def _socket_client(app, username, expires_delta=None):
+    with app.app_context():
+        token = create_access_token(identity=username, expires_delta=expires_delta)
+    return socketio.test_client(app, auth={"token": token})
+
+def test_socket_send_acks_the_message_or_the_error(app, make_user):
+    make_user('socketsender')
+    receiver_id = make_user('socketreceiver')
+    inactive_id = make_user('socketinactive', is_active=False)
+    sender = _socket_client(app, 'socketsender')
+    assert sender.is_connected()
+
+    ack = sender.emit('send_message', {"receiver_id": receiver_id, "content": "hello"}, callback=True)
+    assert ack['message']['content'] == 'hello'
+
+    for receiver, code in (("abc", 'INVALID_REQUEST'), (2.5, 'INVALID_REQUEST'), (inactive_id, 'NOT_FOUND'), (999999, 'NOT_FOUND')):
+        ack = sender.emit('send_message', {"receiver_id": receiver, "content": "hello"}, callback=True)
+        assert ack['code'] == code, receiver
+    sender.disconnect()
+
+def test_socket_with_expired_token_is_told_why(app, make_user):
+    make_user('socketexpired')
+    assert not _socket_client(app, 'socketexpired', expires_delta=timedelta(seconds=-1)).is_connected()
+
+    sender = _socket_client(app, 'socketexpired', expires_delta=timedelta(seconds=2))
+    assert sender.is_connected()
+    sender.get_received()
+    time.sleep(2.1)
+    sender.emit('send_message', {"receiver_id": 1, "content": "late"})
+    assert not sender.is_connected()
+    # get_received() refuses once disconnected; the queue still has the event
+    assert [packet['args'][0]['code'] for packet in sender.queue if packet['name'] == 'chat_error'] == ['TOKEN_EXPIRED']
@@ -0,0 +1,47 @@
+from sqlalchemy import text
+
+from counters import reconcile_counters
+from database import Session, Project, engine
+
+def _project_counters(project_id):
+    session = Session()
+    try:
+        project = session.get(Project, project_id)
+        return (project.application_count, project.pending_application_count, project.bookmark_count, project.report_count)
+    finally:
+        session.close()
+
+def test_project_counters_follow_writes_and_reconcile(client, make_user, auth_headers):
+    make_user('counterowner')
+    owner = auth_headers('counterowner')
+    applicants = []
+    for name in ('counterapplicant1', 'counterapplicant2'):
+        make_user(name)
+        applicants.append(auth_headers(name))
+
+    # Other tests seed rows without the helpers; start from consistent counters
+    with engine.begin() as connection:
+        reconcile_counters(connection)
+
+    project_id = client.post('/api/projects', json={"name": "Counted", "description": "d"}, headers=owner).get_json()['project_id']
+    for headers in applicants:
+        assert client.post(f'/api/projects/{project_id}/applications', json={"message": "m"}, headers=headers).status_code == 201
+        client.post(f'/api/projects/{project_id}/bookmarks', headers=headers)
+        client.post(f'/api/projects/{project_id}/report', json={"reason": "r"}, headers=headers)
+    client.delete(f'/api/projects/{project_id}/bookmarks', headers=applicants[0])
+
+    applications = client.get(f'/api/projects/{project_id}/applications', headers=owner).get_json()
+    client.put(f"/api/projects/applications/{applications[0]['id']}/status", json={"status": "accepted"}, headers=owner)
+    # Moving between two non-pending states leaves the pending count alone
+    client.put(f"/api/projects/applications/{applications[0]['id']}/status", json={"status": "rejected"}, headers=owner)
+
+    assert _project_counters(project_id) == (2, 1, 1, 2)
+    with engine.begin() as connection:
+        assert reconcile_counters(connection) == 0
+
+    # Drift from a write that bypassed the helpers is repaired from the source tables
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE projects SET application_count = 99, bookmark_count = 0 WHERE id = :id"), {"id": project_id})
+    with engine.begin() as connection:
+        assert reconcile_counters(connection) == 2
+    assert _project_counters(project_id) == (2, 1, 1, 2)
@@ -0,0 +1,66 @@
+from sqlalchemy import delete, or_
+
+from database import Session, PaperDuplicate, PaperSignature, PaperLshBucket, engine
+from duplicates import minhash, similarities, sign_corpus
+
+ABSTRACT = (
+    "We present a lightweight scheduler for campus hackathon teams that balances "
+    "skill coverage against member availability, evaluate it on three semesters of "
+    "event data and show that it halves the time teams spend looking for members"
+)
+# One word changed: nearly all shingles are shared
+NEAR_COPY = ABSTRACT.replace("three semesters", "four semesters")
+UNRELATED = (
+    "This paper measures the thermal behaviour of low cost soil moisture sensors "
+    "buried at different depths across a monsoon season in a teaching farm"
+)
+
+def _create_paper(client, headers, title, abstract):
+    response = client.post('/api/research/papers', json={
+        "title": title, "abstract": abstract, "authors": "Author"
+    }, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['paper_id']
+
+def _flags(paper_ids):
+    session = Session()
+    try:
+        return {
+            (flag.paper_id, flag.duplicate_of_id)
+            for flag in session.query(PaperDuplicate).filter(
+                or_(PaperDuplicate.paper_id.in_(paper_ids), PaperDuplicate.duplicate_of_id.in_(paper_ids))
+            )
+        }
+    finally:
+        session.close()
+
+def test_minhash_estimates_similarity():
+    original = minhash(ABSTRACT)
+    assert similarities(original, minhash(ABSTRACT)[None, :])[0] == 1.0
+    assert similarities(original, minhash(NEAR_COPY)[None, :])[0] >= 0.6
+    assert similarities(original, minhash(UNRELATED)[None, :])[0] < 0.3
+    # Too short to judge
+    assert minhash("a short abstract") is None
+
+def test_near_duplicate_submissions_are_flagged(client, make_user, auth_headers):
+    make_user('duplicateowner')
+    headers = auth_headers('duplicateowner')
+
+    original = _create_paper(client, headers, "Original", ABSTRACT)
+    copy = _create_paper(client, headers, "Copy", NEAR_COPY)
+    unrelated = _create_paper(client, headers, "Unrelated", UNRELATED)
+    paper_ids = [original, copy, unrelated]
+    # The later submission is the suspected copy
+    assert _flags(paper_ids) == {(copy, original)}
+
+    # Rewriting the abstract clears the pending flag; it now matches the
+    # paper submitted after it, which becomes the suspected copy
+    assert client.put(f'/api/research/papers/{copy}', json={"abstract": UNRELATED + " again"}, headers=headers).status_code == 200
+    assert _flags(paper_ids) == {(unrelated, copy)}
+
+    # Re-signing from scratch finds the same pairs as the incremental checks
+    with engine.begin() as connection:
+        for model in (PaperDuplicate, PaperLshBucket, PaperSignature):
+            connection.execute(delete(model).where(model.paper_id.in_(paper_ids)))
+    sign_corpus()
+    assert _flags(paper_ids) == {(unrelated, copy)}
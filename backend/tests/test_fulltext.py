@@ -0,0 +1,54 @@
+from database import Session, Project
+from fulltext import fulltext_search, get_fulltext_mode, render_snippet, _MARK_START, _MARK_END
+
+def _add_projects(owner_id, *projects):
+    session = Session()
+    try:
+        rows = [Project(owner_id=owner_id, **fields) for fields in projects]
+        session.add_all(rows)
+        session.commit()
+        return [row.id for row in rows]
+    finally:
+        session.close()
+
+def _search(search):
+    session = Session()
+    try:
+        return fulltext_search(session, 'projects', search)
+    finally:
+        session.close()
+
+def test_render_snippet_escapes_everything_but_the_marks():
+    raw = f"<b>{_MARK_START}quokka{_MARK_END}</b> & co"
+    assert render_snippet(raw) == "&lt;b&gt;<mark>quokka</mark>&lt;/b&gt; &amp; co"
+
+def test_project_search_ranks_titles_first_and_follows_edits(make_user):
+    assert get_fulltext_mode() == 'sqlite'
+    owner_id = make_user('fulltextowner')
+    # The body match is newer, so only the ranking can put the title match first
+    in_name, in_description, _ = _add_projects(
+        owner_id,
+        {"name": "Quokka tracker", "description": "Follows animals around campus"},
+        {"name": "Description mention", "description": "A <script> tag next to the word quokkas"},
+        {"name": "Retired quokka project", "description": "quokka quokka", "is_active": False},
+    )
+
+    total, hits = _search("quok")
+    assert total == 2
+    # Title matches outweigh body matches; inactive rows never show up
+    assert [hit[0] for hit in hits] == [in_name, in_description]
+    assert hits[0][1] > hits[1][1]
+
+    snippet = hits[1][2]
+    assert "<mark>quokkas</mark>" in snippet
+    assert "&lt;script&gt;" in snippet and "<script>" not in snippet
+
+    # Triggers keep the index in sync with updates
+    session = Session()
+    try:
+        session.get(Project, in_name).name = "Wombat tracker"
+        session.commit()
+    finally:
+        session.close()
+    assert [hit[0] for hit in _search("quokka")[1]] == [in_description]
+    assert [hit[0] for hit in _search("wombat")[1]] == [in_name]
@@ -0,0 +1,157 @@
+import threading
+
+from autocomplete import UserAutocompleteIndex
+from database import SessionFactory, User, Project
+from matching import ProjectMatchIndex
+
+def _rebuild_paused_after_load(index, load_method, patch):
+    """Start index.rebuild() in a thread that pauses once its full load has read the database"""
+    loaded, release = threading.Event(), threading.Event()
+    original = getattr(type(index), load_method)
+
+    def load(self, session, ids=None):
+        rows = original(self, session, ids)
+        if ids is None and not loaded.is_set():
+            loaded.set()
+            release.wait(10)
+        return rows
+
+    patch.setattr(type(index), load_method, load)
+
+    def run():
+        session = SessionFactory()
+        try:
+            index.rebuild(session)
+        finally:
+            session.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert loaded.wait(10)
+    return release, thread
+
+def test_autocomplete_keeps_changes_applied_during_a_rebuild(make_user, monkeypatch):
+    user_id = make_user('racerename', full_name='Before Rename')
+    session = SessionFactory()
+    try:
+        index = UserAutocompleteIndex()
+        index.ensure_fresh(session)
+
+        release, thread = _rebuild_paused_after_load(index, '_load_users', monkeypatch)
+        session.get(User, user_id).full_name = 'Zanzibar Quokka'
+        session.commit()
+        index.mark_changed(user_id)
+        # Applied to the old index while the rebuild is still loading
+        index.ensure_fresh(session)
+        assert user_id in index.search(session, 'zanzibar', limit=5)
+
+        release.set()
+        thread.join(10)
+        index.ensure_fresh(session)
+        assert user_id in index.search(session, 'zanzibar', limit=5)
+    finally:
+        session.close()
+
+def test_project_index_keeps_changes_applied_during_a_rebuild(make_user, monkeypatch):
+    owner_id = make_user('raceprojectowner')
+    viewer_id = make_user('raceprojectviewer')
+    session = SessionFactory()
+    try:
+        index = ProjectMatchIndex()
+        index.ensure_fresh(session)
+
+        release, thread = _rebuild_paused_after_load(index, '_load_projects', monkeypatch)
+        project = Project(name="Created during a rebuild", owner_id=owner_id)
+        session.add(project)
+        session.commit()
+        index.mark_changed(project.id)
+        index.ensure_fresh(session)
+        assert project.id in dict(index.suggest(session, viewer_id, 1000))
+
+        release.set()
+        thread.join(10)
+        assert project.id in dict(index.suggest(session, viewer_id, 1000))
+    finally:
+        session.close()
+
+def test_related_index_checks_for_new_papers_at_most_once_per_interval(make_user, count_queries, monkeypatch, tmp_path):
+    import related
+    from database import ResearchPaper
+
+    owner_id = make_user('relatedthrottleowner')
+    session = SessionFactory()
+    try:
+        session.add(ResearchPaper(title="Graph networks", abstract="Message passing on graphs", authors="A", owner_id=owner_id))
+        session.commit()
+
+        monkeypatch.setattr(related, 'RELATED_CHECK_SECONDS', 3600)
+        index = related.PaperVectorIndex(directory=str(tmp_path))
+        index.ensure_fresh(session)
+
+        with count_queries() as queries:
+            index.ensure_fresh(session)
+        assert len(queries) == 0
+
+        # Written by another worker: no mark, so it waits for the next check
+        paper = ResearchPaper(title="Graph attention", abstract="Attention over graph neighbours", authors="B", owner_id=owner_id)
+        session.add(paper)
+        session.commit()
+        index.ensure_fresh(session)
+        assert paper.id not in index.delta
+
+        monkeypatch.setattr(related, 'RELATED_CHECK_SECONDS', 0)
+        index.ensure_fresh(session)
+        assert paper.id in index.delta
+    finally:
+        session.close()
+
+def test_related_index_picks_up_other_workers_edits(make_user, monkeypatch, tmp_path):
+    import related
+    from database import ResearchPaper
+
+    owner_id = make_user('relatededitowner')
+    session = SessionFactory()
+    try:
+        graphs = ResearchPaper(title="Zyxomorph lattices", abstract="Quillon relays on zyxomorph lattices", authors="A", owner_id=owner_id)
+        soil = ResearchPaper(title="Soil sensors", abstract="Moisture probes in farms", authors="B", owner_id=owner_id)
+        session.add_all([graphs, soil])
+        session.commit()
+
+        monkeypatch.setattr(related, 'RELATED_CHECK_SECONDS', 0)
+        index = related.PaperVectorIndex(directory=str(tmp_path))
+        assert graphs.id not in [paper_id for paper_id, _ in index.related(session, soil.id)]
+
+        # Edited by another worker, so nothing marks it here
+        soil.title, soil.abstract = "Zyxomorph sensors", "Quillon relays between sensors"
+        session.commit()
+        assert graphs.id in [paper_id for paper_id, _ in index.related(session, soil.id)]
+
+        graphs.is_active = False
+        session.commit()
+        assert graphs.id not in [paper_id for paper_id, _ in index.related(session, soil.id)]
+    finally:
+        session.close()
+
+def test_related_index_builds_never_move_current_back_or_remove_live_builds(monkeypatch, tmp_path):
+    import os
+    import related
+
+    def builds():
+        return {entry for entry in os.listdir(tmp_path) if entry.startswith('build-')}
+
+    index = related.PaperVectorIndex(directory=str(tmp_path))
+    arrays = index._vectorize([])
+    older = index._save(arrays, 1.0, None)
+    # Another worker's build, still being written
+    in_progress = f"build-{int(older.split('-')[1]) + 1}"
+    os.makedirs(tmp_path / in_progress)
+    newer = index._save(arrays, 2.0, None)
+    assert index._current_build() == newer
+    assert builds() == {in_progress, newer}
+
+    # A slower worker finishes a build it named before the current one:
+    # CURRENT stays put and the losing build is cleaned up
+    monkeypatch.setattr(related.time, 'time_ns', lambda: int(newer.split('-')[1]) - 1)
+    index._save(arrays, 3.0, None)
+    assert index._current_build() == newer
+    assert builds() == {in_progress, newer}
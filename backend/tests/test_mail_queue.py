@@ -0,0 +1,100 @@
+import smtplib
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+
+import mail_queue
+from database import Session, EmailOutbox, IST
+from debug_smtp import start_debug_smtp
+from mail_queue import MailDispatcher, SMTPConnectionPool, enqueue_email, retry_delay
+
+@pytest.fixture
+def smtp_server():
+    server = start_debug_smtp('localhost', 0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _connector(port):
+    def connect():
+        connect.count += 1
+        return smtplib.SMTP('localhost', port, timeout=5)
+    connect.count = 0
+    return connect
+
+def _unused_port():
+    with socket.socket() as probe:
+        probe.bind(('localhost', 0))
+        return probe.getsockname()[1]
+
+def _drain(dispatcher):
+    while dispatcher.dispatch_once():
+        pass
+    Session.remove()
+
+def _rows(ids):
+    session = Session()
+    try:
+        return session.query(EmailOutbox).filter(EmailOutbox.id.in_(ids)).order_by(EmailOutbox.id).all()
+    finally:
+        session.close()
+
+def test_dispatcher_delivers_pending_mail(smtp_server):
+    ids = [enqueue_email(f"reader{number}@vitstudent.ac.in", "Hello", "Body") for number in range(3)]
+    connect = _connector(smtp_server.server_address[1])
+    dispatcher = MailDispatcher(connect, 'noreply@assemble.test', workers=1)
+
+    _drain(dispatcher)
+    dispatcher.pool.close()
+
+    rows = _rows(ids)
+    assert [row.status for row in rows] == ['sent', 'sent', 'sent']
+    assert all(row.attempts == 1 and row.sent_at is not None for row in rows)
+    assert smtp_server.received >= 3
+    # One pooled connection carries the whole batch
+    assert connect.count == 1
+
+def test_failed_delivery_is_retried_later(monkeypatch):
+    outbox_id = enqueue_email('retry@vitstudent.ac.in', "Hello", "Body")
+    dispatcher = MailDispatcher(_connector(_unused_port()), 'noreply@assemble.test', workers=1)
+    before = datetime.now(IST).replace(tzinfo=None)
+
+    _drain(dispatcher)
+
+    row, = _rows([outbox_id])
+    assert row.status == 'pending'
+    assert row.attempts == 1
+    assert row.last_error.startswith('ConnectionRefusedError')
+    # Backed off by the first retry delay
+    assert row.next_attempt_at.replace(tzinfo=None) >= before + timedelta(seconds=retry_delay(1) - 1)
+    # Not due again until the backoff has passed
+    assert dispatcher.dispatch_once() == 0
+
+    # Out of attempts: the row is given up on
+    monkeypatch.setattr(mail_queue, 'MAIL_MAX_ATTEMPTS', 2)
+    session = Session()
+    session.query(EmailOutbox).filter_by(id=outbox_id).update({EmailOutbox.next_attempt_at: datetime.now(IST)})
+    session.commit()
+    session.close()
+    _drain(dispatcher)
+
+    row, = _rows([outbox_id])
+    assert (row.status, row.attempts) == ('failed', 2)
+
+def test_pool_replaces_a_connection_that_fails_noop(smtp_server, monkeypatch):
+    monkeypatch.setattr(mail_queue, 'SMTP_IDLE_CHECK_SECONDS', 0)
+    connect = _connector(smtp_server.server_address[1])
+    pool = SMTPConnectionPool(connect, size=1)
+
+    stale = pool.acquire()
+    pool.release(stale)
+    # The connection drops while it sits idle
+    stale.sock.shutdown(socket.SHUT_RDWR)
+
+    fresh = pool.acquire()
+    assert fresh is not stale
+    assert fresh.noop()[0] == 250
+    assert connect.count == 2
+    pool.release(fresh)
+    pool.close()
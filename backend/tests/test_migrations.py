@@ -0,0 +1,38 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATE = "import migrations; migrations.migrate()"
+
+def test_concurrent_workers_migrate_an_old_schema_once(tmp_path):
+    database = tmp_path / 'workers.db'
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{database}",
+        LOG_FILE=str(tmp_path / 'app.log'),
+        LOG_LEVEL='WARNING',
+    )
+    subprocess.run([sys.executable, '-c', MIGRATE], cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+
+    # Roll the schema back to before the counter columns existed
+    connection = sqlite3.connect(database)
+    for column in ('application_count', 'pending_application_count', 'bookmark_count', 'report_count'):
+        connection.execute(f"ALTER TABLE projects DROP COLUMN {column}")
+    connection.commit()
+    connection.close()
+
+    # Every worker migrates on start; all of them must come up
+    workers = [
+        subprocess.Popen([sys.executable, '-c', MIGRATE], cwd=BACKEND_DIR, env=env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        for _ in range(6)
+    ]
+    errors = [worker.communicate(timeout=120)[1].decode() for worker in workers]
+    assert [worker.returncode for worker in workers] == [0] * len(workers), errors
+
+    connection = sqlite3.connect(database)
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(projects)")}
+    connection.close()
+    assert 'application_count' in columns
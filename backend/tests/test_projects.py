@@ -0,0 +1,59 @@
+from database import Session, Project, ProjectApplication, Skill, Role
+
+def _seed_projects(owner_id, applicant_id, count):
+    session = Session()
+    try:
+        skills = [Skill(name=f"query-count-skill-{i}", category='test') for i in range(3)]
+        roles = [Role(name=f"query-count-role-{i}", category='test') for i in range(2)]
+        for i in range(count):
+            project = Project(
+                name=f"Query count project {i}",
+                description="Seeded for the query count test",
+                owner_id=owner_id,
+                skills=skills[:1 + i % 3],
+                roles=roles[:1 + i % 2]
+            )
+            session.add(project)
+            if i % 2:
+                session.flush()
+                session.add(ProjectApplication(project_id=project.id, user_id=applicant_id))
+        session.commit()
+    finally:
+        session.close()
+
+def test_get_projects_query_count_does_not_grow_with_page_size(client, make_user, auth_headers, count_queries):
+    owner_id = make_user('querycountowner')
+    applicant_id = make_user('querycountapplicant')
+    _seed_projects(owner_id, applicant_id, 20)
+    headers = auth_headers('querycountapplicant')
+
+    # Warm the identity cache so both measured requests do the same work
+    assert client.get('/api/projects?per_page=1', headers=headers).status_code == 200
+
+    counts = {}
+    for per_page in (2, 20):
+        with count_queries() as queries:
+            response = client.get(f'/api/projects?per_page={per_page}', headers=headers)
+        assert response.status_code == 200
+        assert len(response.get_json()['projects']) == per_page
+        counts[per_page] = len(queries)
+
+    assert counts[2] == counts[20], counts
+
+def test_project_list_search_matches_substrings(client, make_user, auth_headers):
+    owner_id = make_user('substringowner')
+    session = Session()
+    try:
+        session.add(Project(name="Campus Hackathon Toolkit", owner_id=owner_id))
+        session.commit()
+    finally:
+        session.close()
+    headers = auth_headers('substringowner')
+
+    names = [project['name'] for project in client.get('/api/projects?search=ackath', headers=headers).get_json()['projects']]
+    assert "Campus Hackathon Toolkit" in names
+
+    # Punctuation alone is still a plain substring filter, not an error
+    response = client.get('/api/projects?search=%21%3F', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['projects'] == []
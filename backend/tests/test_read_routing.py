@@ -0,0 +1,100 @@
+import time
+
+import pytest
+from flask import Flask, jsonify, request
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+from sqlalchemy import func, select
+
+import database
+import read_routing
+from database import Base, Session, User, create_database_engine
+
+@pytest.fixture
+def routed_app(tmp_path, monkeypatch):
+    """App with read routing between two SQLite files that never replicate.
+
+    Whatever a request writes lands in primary.db only, so a read that
+    sees it was served by the primary and a read that doesn't came from
+    replica.db.
+    """
+    primary, _ = create_database_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica, _ = create_database_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, 'engine', primary)
+    monkeypatch.setattr(database, 'replica_engine', replica)
+    monkeypatch.setattr(read_routing, 'replica_engine', replica)
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'read-routing-test-secret-key-0123456789'
+    JWTManager(app)
+    read_routing.init_read_routing(app)
+
+    @app.route('/users', methods=['GET'])
+    @jwt_required()
+    def count_users():
+        return jsonify({"count": Session().scalar(select(func.count(User.id)))})
+
+    @app.route('/users', methods=['POST'])
+    @jwt_required()
+    def add_user():
+        session = Session()
+        username = request.get_json()['username']
+        session.add(User(username=username, email=f"{username}@vitstudent.ac.in", password='x'))
+        session.commit()
+        return jsonify({}), 201
+
+    @app.teardown_appcontext
+    def remove_session(exc):
+        Session.remove()
+
+    yield app
+    Session.remove()
+    primary.dispose()
+    replica.dispose()
+
+def _headers(app, username):
+    with app.app_context():
+        return {"Authorization": f"Bearer {create_access_token(identity=username)}"}
+
+def _count(client, headers):
+    return client.get('/users', headers=headers).get_json()['count']
+
+def test_reads_go_to_the_replica(routed_app):
+    with routed_app.app_context():
+        session = Session()
+        session.add(User(username='primaryonly', email='primaryonly@vitstudent.ac.in', password='x'))
+        session.commit()
+
+    client = routed_app.test_client()
+    response = client.get('/users', headers=_headers(routed_app, 'alice'))
+    assert response.get_json()['count'] == 0
+    # Reads don't pin
+    assert read_routing.PIN_COOKIE not in response.headers.get('Set-Cookie', '')
+
+def test_a_write_pins_only_the_writer_to_the_primary(routed_app, monkeypatch):
+    monkeypatch.setattr(read_routing, 'REPLICA_PIN_SECONDS', 1)
+    alice, bob = _headers(routed_app, 'alice'), _headers(routed_app, 'bob')
+
+    client = routed_app.test_client()
+    response = client.post('/users', json={"username": 'written'}, headers=alice)
+    assert read_routing.PIN_COOKIE in response.headers['Set-Cookie']
+    pin = client.get_cookie(read_routing.PIN_COOKIE).value
+
+    assert _count(client, alice) == 1
+    # Another user presenting the same cookie stays on the replica
+    assert _count(client, bob) == 0
+
+    # The cookie carries the pin to whichever worker serves the next request
+    other_worker = routed_app.test_client()
+    assert _count(other_worker, alice) == 0
+    other_worker.set_cookie(read_routing.PIN_COOKIE, pin)
+    assert _count(other_worker, alice) == 1
+
+    # A tampered pin is ignored
+    other_worker.set_cookie(read_routing.PIN_COOKIE, pin[:-2] + 'xx')
+    assert _count(other_worker, alice) == 0
+
+    time.sleep(1.1)
+    other_worker.set_cookie(read_routing.PIN_COOKIE, pin)
+    assert _count(other_worker, alice) == 0
@@ -0,0 +1,43 @@
+from sqlalchemy import select
+
+from database import Tag, engine
+from tags import parse_keywords, recount_tags
+
+def _popular(client, headers):
+    tags = client.get('/api/research/tags/popular?prefix=tagtest', headers=headers).get_json()
+    return {tag['name']: tag['paper_count'] for tag in tags}
+
+def _create_paper(client, headers, title, keywords):
+    response = client.post('/api/research/papers', json={
+        "title": title, "abstract": "Abstract", "authors": "Author", "keywords": keywords
+    }, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['paper_id']
+
+def test_parse_keywords_normalizes_and_dedupes():
+    assert parse_keywords("Machine  Learning; NLP, nlp\n#Graphs.") == ['machine learning', 'nlp', 'graphs']
+    assert parse_keywords(None) == []
+
+def test_tag_counts_follow_paper_edits_and_deletes(client, make_user, auth_headers):
+    make_user('tagowner')
+    headers = auth_headers('tagowner')
+
+    first = _create_paper(client, headers, "First", "Tagtest Alpha; tagtest beta, TAGTEST  alpha")
+    second = _create_paper(client, headers, "Second", "tagtest beta, tagtest gamma")
+    assert _popular(client, headers) == {'tagtest alpha': 1, 'tagtest beta': 2, 'tagtest gamma': 1}
+
+    assert client.put(f'/api/research/papers/{first}', json={"keywords": "tagtest gamma"}, headers=headers).status_code == 200
+    # Tags no paper uses any more drop out of the popular list
+    assert _popular(client, headers) == {'tagtest beta': 1, 'tagtest gamma': 2}
+
+    assert client.delete(f'/api/research/papers/{second}', headers=headers).status_code == 200
+    assert _popular(client, headers) == {'tagtest gamma': 1}
+
+    papers = client.get('/api/research/papers?tags=tagtest gamma,tagtest beta', headers=headers).get_json()
+    assert [paper['id'] for paper in papers] == [first]
+
+    # The incremental counts agree with a full recount
+    with engine.begin() as connection:
+        counts = connection.execute(select(Tag.id, Tag.paper_count).order_by(Tag.id)).all()
+        recount_tags(connection)
+        assert connection.execute(select(Tag.id, Tag.paper_count).order_by(Tag.id)).all() == counts
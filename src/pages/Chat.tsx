@@ -2,7 +2,8 @@ import React, { useState, useEffect, useRef } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import { Send, Search, User, MessageCircle, ArrowLeft } from 'lucide-react';
 import { io, Socket } from 'socket.io-client';
-import { api } from '../services/api';
+import toast from 'react-hot-toast';
+import { api, refreshAccessToken } from '../services/api';
 import { useAuth } from '../contexts/AuthContext';
 import LoadingSpinner from '../components/LoadingSpinner';
 
@@ -19,6 +20,8 @@ export default function Chat() {
   const [sending, setSending] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const [socket, setSocket] = useState<Socket | null>(null);
+  // Bumped on every (re)connect so the open chat room is joined again
+  const [socketSession, setSocketSession] = useState(0);
   const [isTyping, setIsTyping] = useState(false);
   const [otherUserTyping, setOtherUserTyping] = useState(false);
   const typingTimeoutRef = useRef<NodeJS.Timeout | null>(null);
@@ -32,9 +35,40 @@ export default function Chat() {
 
   useEffect(() => {
     // Initialize WebSocket connection
-    const newSocket = io('http://localhost:5000');
+    // The server authenticates the socket once from the JWT; auth is a
+    // callback so every reconnect sends the current token
+    const newSocket = io('http://localhost:5000', {
+      auth: (cb) => cb({ token: localStorage.getItem('token') })
+    });
     setSocket(newSocket);
 
+    const reconnectWithFreshToken = async () => {
+      try {
+        await refreshAccessToken();
+        newSocket.connect();
+      } catch (error) {
+        // The next API call sends the user back to login
+        console.error('Failed to refresh chat connection:', error);
+      }
+    };
+
+    newSocket.on('connect', () => setSocketSession(prev => prev + 1));
+
+    // Rejected at connect time, e.g. the stored token has already expired
+    newSocket.on('connect_error', (error: Error) => {
+      if (error.message === 'Token has expired') {
+        reconnectWithFreshToken();
+      }
+    });
+
+    // The server drops sockets whose token expires; socket.io does not
+    // retry those on its own
+    newSocket.on('disconnect', (reason: string) => {
+      if (reason === 'io server disconnect') {
+        reconnectWithFreshToken();
+      }
+    });
+
     // Listen for new messages
     newSocket.on('new_message', (messageData: any) => {
       messageData.is_own = messageData.sender_id === parseInt(user?.id || '0');
@@ -57,27 +91,26 @@ export default function Chat() {
     });
 
     return () => {
+      newSocket.off('disconnect');
       newSocket.disconnect();
     };
   }, [user]);
 
   useEffect(() => {
-    if (socket && selectedUser && user) {
+    if (socket && socketSession && selectedUser && user) {
       // Join chat room
       socket.emit('join_chat', {
-        user_id: parseInt(user.id.toString()),
         other_user_id: selectedUser.id
       });
 
       return () => {
         // Leave chat room
         socket.emit('leave_chat', {
-          user_id: parseInt(user.id.toString()),
           other_user_id: selectedUser.id
         });
       };
     }
-  }, [socket, selectedUser, user]);
+  }, [socket, socketSession, selectedUser, user]);
 
   useEffect(() => {
     scrollToBottom();
@@ -143,27 +176,33 @@ export default function Chat() {
     setNewMessage('');
     setSending(true);
 
+    const payload = {
+      receiver_id: selectedUser.id,
+      content: messageContent
+    };
+
     try {
-      if (socket) {
-        // Send via WebSocket for real-time delivery
-        socket.emit('send_message', {
-          sender_id: parseInt(user?.id || '0'),
-          receiver_id: selectedUser.id,
-          content: messageContent
-        });
-      } else {
-        // Fallback to HTTP API
-        const response = await api.post('/chat/messages', {
-          receiver_id: selectedUser.id,
-          content: messageContent
-        });
+      // Send via WebSocket for real-time delivery; the ack carries the
+      // saved message or the reason it was rejected
+      const ack = socket?.connected
+        ? await socket.timeout(5000).emitWithAck('send_message', payload)
+        : null;
+
+      // A delivered message comes back through the new_message broadcast
+      if (ack?.error && ack.code !== 'UNAUTHORIZED') {
+        toast.error(ack.error);
+      } else if (!ack?.message) {
+        // Fallback to HTTP API, which also refreshes an expired token
+        const response = await api.post('/chat/messages', payload);
         setMessages(prev => [...prev, response.data]);
       }
 
       // Update conversations list
       fetchConversations();
     } catch (error) {
+      // No ack (timed out or the socket dropped): keep the text for a retry
       console.error('Failed to send message:', error);
+      setNewMessage(prev => prev || messageContent);
     } finally {
       setSending(false);
     }
@@ -176,7 +215,6 @@ export default function Chat() {
       if (!isTyping) {
         setIsTyping(true);
         socket.emit('typing', {
-          user_id: parseInt(user.id.toString()),
           other_user_id: selectedUser.id,
           is_typing: true
         });
@@ -191,7 +229,6 @@ export default function Chat() {
       typingTimeoutRef.current = setTimeout(() => {
         setIsTyping(false);
         socket.emit('typing', {
-          user_id: parseInt(user.id.toString()),
           other_user_id: selectedUser.id,
           is_typing: false
         });
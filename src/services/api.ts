@@ -6,6 +6,8 @@ const API_BASE_URL = 'http://localhost:5000/api';
 export const api = axios.create({
   baseURL: API_BASE_URL,
   timeout: 10000,
+  // Carries the backend's short-lived read-your-writes cookie
+  withCredentials: true,
   headers: {
     'Content-Type': 'application/json',
   },
@@ -25,6 +27,26 @@ api.interceptors.request.use(
   }
 );
 
+// Swap the refresh token for a new access token and store it.
+// Also used by the chat socket, which can't go through the interceptor.
+export const refreshAccessToken = async (): Promise<string> => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) {
+    throw new Error('No refresh token');
+  }
+
+  const response = await axios.post(`${API_BASE_URL}/auth/refresh`, {}, {
+    headers: {
+      Authorization: `Bearer ${refreshToken}`,
+    },
+  });
+
+  const { access_token } = response.data;
+  localStorage.setItem('token', access_token);
+  api.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
+  return access_token;
+};
+
 // Response interceptor to handle errors and token refresh
 api.interceptors.response.use(
   (response) => response,
@@ -35,18 +57,8 @@ api.interceptors.response.use(
       originalRequest._retry = true;
 
       try {
-        const refreshToken = localStorage.getItem('refreshToken');
-        if (refreshToken) {
-          const response = await axios.post(`${API_BASE_URL}/auth/refresh`, {}, {
-            headers: {
-              Authorization: `Bearer ${refreshToken}`,
-            },
-          });
-
-          const { access_token } = response.data;
-          localStorage.setItem('token', access_token);
-          api.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
-
+        if (localStorage.getItem('refreshToken')) {
+          await refreshAccessToken();
           return api(originalRequest);
         }
       } catch (refreshError) {